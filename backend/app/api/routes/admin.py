@@ -16,7 +16,9 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, case, literal_column
 from sqlalchemy.sql import text
+from redis.exceptions import RedisError
 from api.deps import get_db
+from db.pool import pool_stats
 from api.admin_auth import get_current_admin
 from models.admin_user import AdminUser, AdminRoleEnum
 from models.admin_activity_log import AdminActivityLog
@@ -28,7 +30,7 @@ from models.sender_id_propagation import SenderIdPropagation
 from models.network import Network
 from models.enums import (
     SenderIdRequestStatusEnum, SenderStatusEnum, PropagationStatusEnum,
-    PaymentStatusEnum, SubscriptionStatusEnum
+    PaymentStatusEnum, SubscriptionStatusEnum, SmsDeliveryStatusEnum
 )
 from models.user_subscription import UserSubscription
 from models.subscription_order import SubscriptionOrder
@@ -38,6 +40,8 @@ from models.sms_callback import SmsCallback
 from models.sms_package import SmsPackage
 from models.contact import Contact
 from models.contact_group import ContactGroup
+from services import dlr_dedup
+from services.user_cache import user_id_cache
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -200,8 +204,11 @@ async def delete_user(
 
     log_activity(db, admin.id, "delete_user", "user", user.id,
                  {"email": user.email}, request.client.host if request.client else None)
+    # Read before the delete: the instance is expired by the commit and cannot be reloaded
+    deleted_uuid = str(user.uuid)
     db.delete(user)
     db.commit()
+    user_id_cache.invalidate(deleted_uuid)
 
     return {"success": True, "message": "User deleted successfully"}
 
@@ -622,6 +629,7 @@ async def list_sms_logs(
     sender_alias: str = Query(None),
     start_date: str = Query(None),
     end_date: str = Query(None),
+    status: str = Query(None),
     admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -638,6 +646,10 @@ async def list_sms_logs(
         query = query.filter(SentMessage.sent_at >= start_date)
     if end_date:
         query = query.filter(SentMessage.sent_at <= end_date)
+    if status:
+        query = query.filter(
+            func.coalesce(SentMessage.delivery_status, SmsDeliveryStatusEnum.pending) == status.lower()
+        )
 
     total = query.count()
     results = query.order_by(desc(SentMessage.sent_at)).offset((page - 1) * limit).limit(limit).all()
@@ -649,6 +661,8 @@ async def list_sms_logs(
             "phone_number": m.phone_number, "message": m.message,
             "message_id": m.message_id, "number_of_parts": m.number_of_parts,
             "sent_at": str(m.sent_at),
+            "delivery_status": m.delivery_status.value if m.delivery_status else SmsDeliveryStatusEnum.pending.value,
+            "delivered_at": str(m.delivered_at) if m.delivered_at else None,
             "user": {"uuid": str(u.uuid), "email": u.email, "username": u.username}
         } for m, u in results],
         "pagination": {"page": page, "limit": limit, "total": total, "pages": (total + limit - 1) // limit}
@@ -876,3 +890,34 @@ async def list_activity_logs(
         } for log, a in results],
         "pagination": {"page": page, "limit": limit, "total": total, "pages": (total + limit - 1) // limit}
     }
+
+
+# ========== SYSTEM METRICS ==========
+
+@router.get("/system/db-pool")
+async def db_pool_metrics(admin: AdminUser = Depends(get_current_admin)):
+    """
+    Connection pool metrics for this process: checkout wait times, timeouts and
+    saturation (checked-out / capacity). Sustained saturation near 1.0 with
+    rising wait times means the pool, not Postgres, is the bottleneck.
+    """
+    return {"success": True, "data": pool_stats()}
+
+
+@router.get("/system/user-cache")
+async def user_cache_metrics(admin: AdminUser = Depends(get_current_admin)):
+    """
+    User uuid -> id cache of delivery report ingestion in this process: size,
+    hits (local and Redis), misses that went to the database and evictions.
+    """
+    return {"success": True, "data": user_id_cache.stats()}
+
+
+@router.get("/system/dlr-dedup")
+async def dlr_dedup_metrics(admin: AdminUser = Depends(get_current_admin)):
+    """Repeated delivery reports dropped by /sms/webhook before reaching Postgres (all processes)."""
+    try:
+        data = dlr_dedup.stats()
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Redis unavailable: {e}")
+    return {"success": True, "data": data}
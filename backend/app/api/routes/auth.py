@@ -19,15 +19,13 @@ from api.user_auth import get_current_user
 from core.config import COOKIE_DOMAIN, IS_PRODUCTION, MAX_COOKIE_AGE
 from models.api_access_tokens import ApiAccessToken
 from models.contact import Contact
-from models.enums import SmsDeliveryStatusEnum
+from models.enums import ScheduleStatusEnum
 from models.password_reset_tokens import PasswordResetToken
 from models.scheduled_message import SmsScheduledMessage
-from models.sent_messages import SentMessage
-from models.sms_callback import SmsCallback
 from models.sms_schedule import SmsSchedule
 from models.user import User
 from models.user_outage_notification import UserOutageNotification
-from models.user_subscription import UserSubscription
+from services import credit_service, stats_service
 from schemas.auth import (
     GenerateApiTokenRequest,
     OutageNotificationRequest,
@@ -321,9 +319,7 @@ async def generate_api_token(
 
 @router.get("/me")
 async def get_current_user_endpoint(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    total_remaining_sms = db.query(
-        func.coalesce(func.sum(UserSubscription.remaining_sms), 0)
-    ).filter(UserSubscription.user_id == current_user.id).scalar()
+    _, _, _, total_remaining_sms = credit_service.user_credit_totals(db, current_user.id, active_only=False)
 
     return ok("User authenticated", {
         "id": current_user.id,
@@ -396,20 +392,17 @@ async def delete_api_token(
     return ok("Token deleted successfully")
 
 
-# Constants for delivery status checks
-DELIVERED_STATUSES = [
-    SmsDeliveryStatusEnum.delivered.value,
-    SmsDeliveryStatusEnum.acknowledged.value,
-    SmsDeliveryStatusEnum.accepted.value,
-]
-
-
 def _percent_change(current: float, previous: float) -> float:
     if previous == 0:
         return 100.0 if current > 0 else 0.0
     return round(((current - previous) / previous) * 100, 2)
 
 
+def _delivery_rate(day: dict) -> float:
+    """Delivered share of the delivery reports received on a day."""
+    return round((day["delivered"] / max(day["callbacks"], 1)) * 100, 2)
+
+
 @router.get("/dashboard/stats")
 def dashboard_stats(
     db: Session = Depends(get_db),
@@ -417,61 +410,32 @@ def dashboard_stats(
 ):
     now = now_eat()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    yesterday_start = today_start - timedelta(days=1)
-    yesterday_end = today_start - timedelta(seconds=1)
+    today = today_start.date()
+    yesterday = today - timedelta(days=1)
+
+    # Messages and delivery reports come from the daily rollup
+    days = stats_service.day_stats(db, current_user.id, [today, yesterday])
 
     # Messages Sent
-    messages_today = db.query(func.count(SentMessage.id)).filter(
-        SentMessage.user_id == current_user.id,
-        SentMessage.sent_at >= today_start,
-    ).scalar() or 0
-    messages_yesterday = db.query(func.count(SentMessage.id)).filter(
-        SentMessage.user_id == current_user.id,
-        SentMessage.sent_at.between(yesterday_start, yesterday_end),
-    ).scalar() or 0
+    messages_today = days[today]["messages"]
+    messages_yesterday = days[yesterday]["messages"]
     messages_change = _percent_change(messages_today, messages_yesterday)
 
     # Delivery Rate
-    delivered_today = db.query(func.count(SmsCallback.id)).filter(
-        SmsCallback.user_id == current_user.id,
-        SmsCallback.received_at >= today_start,
-        SmsCallback.status.in_(DELIVERED_STATUSES),
-    ).scalar() or 0
-    total_callbacks_today = db.query(func.count(SmsCallback.id)).filter(
-        SmsCallback.user_id == current_user.id,
-        SmsCallback.received_at >= today_start,
-    ).scalar() or 0
-    delivery_rate_today = round((delivered_today / max(total_callbacks_today, 1)) * 100, 2)
-
-    delivered_yesterday = db.query(func.count(SmsCallback.id)).filter(
-        SmsCallback.user_id == current_user.id,
-        SmsCallback.received_at.between(yesterday_start, yesterday_end),
-        SmsCallback.status.in_(DELIVERED_STATUSES),
-    ).scalar() or 0
-    total_callbacks_yesterday = db.query(func.count(SmsCallback.id)).filter(
-        SmsCallback.user_id == current_user.id,
-        SmsCallback.received_at.between(yesterday_start, yesterday_end),
-    ).scalar() or 0
-    delivery_rate_yesterday = round((delivered_yesterday / max(total_callbacks_yesterday, 1)) * 100, 2)
+    delivery_rate_today = _delivery_rate(days[today])
+    delivery_rate_yesterday = _delivery_rate(days[yesterday])
     delivery_change = _percent_change(delivery_rate_today, delivery_rate_yesterday)
 
     # Contacts
-    total_contacts = db.query(func.count(Contact.id)).filter(Contact.user_id == current_user.id).scalar() or 0
-    contacts_yesterday = db.query(func.count(Contact.id)).filter(
-        Contact.user_id == current_user.id,
-        Contact.created_at < today_start,
-    ).scalar() or 0
+    total_contacts, contacts_yesterday = db.query(
+        func.count(Contact.id),
+        func.count(Contact.id).filter(Contact.created_at < today_start),
+    ).filter(Contact.user_id == current_user.id).one()
     contacts_change = _percent_change(total_contacts, contacts_yesterday)
 
     # Credits Remaining
-    credits_today = db.query(func.coalesce(func.sum(UserSubscription.remaining_sms), 0)).filter(
-        UserSubscription.user_id == current_user.id
-    ).scalar() or 0
-    used_since_yesterday = db.query(func.coalesce(func.sum(SentMessage.number_of_parts), 0)).filter(
-        SentMessage.user_id == current_user.id,
-        SentMessage.sent_at >= yesterday_start,
-    ).scalar() or 0
-    credits_yesterday = credits_today + used_since_yesterday
+    _, _, _, credits_today = credit_service.user_credit_totals(db, current_user.id, active_only=False)
+    credits_yesterday = credits_today + days[today]["parts"] + days[yesterday]["parts"]
     credits_change = _percent_change(credits_today, credits_yesterday)
 
     return {
@@ -493,7 +457,7 @@ def recent_messages(
 ):
     schedules = (
         db.query(SmsSchedule)
-        .filter(SmsSchedule.user_id == current_user.id)
+        .filter(SmsSchedule.user_id == current_user.id, SmsSchedule.status != ScheduleStatusEnum.draft)
         .order_by(SmsSchedule.created_at.desc())
         .limit(limit)
         .all()
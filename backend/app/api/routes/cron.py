@@ -1,221 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 import pytz
 from api.deps import get_db
 from models.user_outage_notification import UserOutageNotification
 from models.user import User
-from core.config import CRON_AUTH_TOKEN, SMS_CALLBACK_URL
+from core.config import CRON_AUTH_TOKEN, SMS_CALLBACK_COMPACT_TIMEOUT, SMS_SCHEDULE_WORKERS, SMS_STATS_BACKFILL_TIMEOUT
+from core.worker_config import redis_conn
 from models.sent_messages import SentMessage
 from services.sms_gateway_service import SmsGatewayService
+from services import credit_service, partition_service, stats_service
 from utils.validation import validate_phone
 from models.sms_schedule import SmsSchedule
-from models.scheduled_message import SmsScheduledMessage
 from models.user_subscription import UserSubscription
 from models.sender_id import SenderId
-from models.enums import ScheduleStatusEnum, MessageStatusEnum
+from models.enums import ScheduleStatusEnum
+from tasks.send_scheduled_task import send_scheduled_batch_task
+from tasks.compact_callbacks_task import compact_callback_payloads_task
+from tasks.backfill_stats_task import backfill_daily_stats_task
+from tasks.send_campaign_task import reap_expired_chunks
+from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
 
 router = APIRouter()
+q = Queue("sms_queue", connection=redis_conn)
 
 @router.post("/scheduled-messages/send")
-async def run_scheduled_sends(
+def run_scheduled_sends(
     db: Session = Depends(get_db),
     x_cron_auth: str = Header(None)
 ):
-    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
     """
-    Cron endpoint (no auth) to process pending schedules whose scheduled_for <= now (EAT).
-    Returns a short summary.
+    Cron endpoint: hand due schedules (scheduled_for <= now, EAT) to
+    SMS_SCHEDULE_WORKERS queued workers, which claim and send their messages
+    in parallel. Returns as soon as the workers are queued.
     """
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
     now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
     now_str = now.strftime("%Y-%m-%d %H:%M:%S")
 
-    processed_schedules = 0
-    total_sent = 0
-    total_failed = 0
-    errors = []
-
-    # Fetch pending schedules that are due (scheduled_for <= now)
-    schedules = db.query(SmsSchedule).filter(
+    due_schedules = db.query(SmsSchedule).filter(
         SmsSchedule.status.in_([
             ScheduleStatusEnum.pending.value,
             ScheduleStatusEnum.partial.value,
             ScheduleStatusEnum.failed.value
         ]),
         SmsSchedule.scheduled_for <= now
-    ).all()
-
-    for sched in schedules:
-        processed_schedules += 1
-
-        # Load pending or failed scheduled messages
-        pending_msgs = db.query(SmsScheduledMessage).filter(
-            SmsScheduledMessage.schedule_id == sched.id,
-            SmsScheduledMessage.status.in_([
-                MessageStatusEnum.pending.value,
-                MessageStatusEnum.failed.value
-            ])
-        ).all()
-
-        # Load sender alias and user subscription
-        sender = db.query(SenderId).filter(SenderId.id == sched.sender_id).first()
-        subscription = db.query(UserSubscription).filter(
-            UserSubscription.user_id == sched.user_id,
-            UserSubscription.status == "active"
-        ).first()
-
-        sms_service = SmsGatewayService(sender.alias) if sender else None
-
-        # Get user UUID from User table
-        user = db.query(User).filter(User.id == sched.user_id).first()
-        user_uuid = str(user.uuid) if user else None
-
-        # Build callback URL with user UUID
-        callback_url_with_user = f"{SMS_CALLBACK_URL}?id={user_uuid}"
-
-        schedule_sent_count = 0
-        schedule_failed_count = 0
-
-        for sm in pending_msgs:
-            try:
-                # refetch subscription freshness (optional)
-                if not subscription or subscription.remaining_sms <= 0:
-                    # mark failed due to insufficient balance
-                    sm.status = MessageStatusEnum.failed.value
-                    sm.remarks = "Insufficient SMS balance or no active subscription"
-                    sm.updated_at = now
-                    db.add(sm)
-                    schedule_failed_count += 1
-                    total_failed += 1
-                    continue
-
-                # Validate phone quickly (optional)
-                if not validate_phone(sm.phone_number):
-                    sm.status = MessageStatusEnum.failed.value
-                    sm.remarks = "Invalid phone number format"
-                    sm.updated_at = now
-                    db.add(sm)
-                    schedule_failed_count += 1
-                    total_failed += 1
-                    continue
-
-                # compute parts
-                parts_needed, _, _ = sms_service.get_sms_parts_and_length(sm.message)
-
-                if parts_needed > subscription.remaining_sms:
-                    sm.status = MessageStatusEnum.failed.value
-                    sm.remarks = "Insufficient SMS balance for message parts"
-                    sm.updated_at = now
-                    db.add(sm)
-                    schedule_failed_count += 1
-                    total_failed += 1
-                    continue
-
-                # send
-                send_result = await sms_service.send_sms_with_parts_check(sm.phone_number, sm.message, callback_url=callback_url_with_user)
-                success = send_result.get("success", False)
-                gateway_data = send_result.get("data", {}) or {}
-
-                if not success:
-                    sm.status = MessageStatusEnum.failed.value
-                    sm.remarks = f"Gateway error: {gateway_data.get('message', 'Unknown')}" if isinstance(gateway_data, dict) else "Gateway error"
-                    sm.updated_at = now
-                    db.add(sm)
-                    schedule_failed_count += 1
-                    total_failed += 1
-                    continue
-
-                # mark sent
-                sm.status = MessageStatusEnum.sent.value
-                sm.sent_at = now
-                sm.updated_at = now
-                sm.remarks = None
-                db.add(sm)
-
-                # record gateway response in SentMessage table
-                message_id = gateway_data.get("message_id") if isinstance(gateway_data, dict) else None
-                db.add(SentMessage(
-                    sender_alias=sender.alias if sender else None,
-                    user_id=sched.user_id,
-                    phone_number=sm.phone_number,
-                    number_of_parts=parts_needed,
-                    message=sm.message,
-                    message_id=str(message_id) if message_id else None,
-                    sent_at=now
-                ))
-
-                # update subscription counts
-                subscription.used_sms = (subscription.used_sms or 0) + parts_needed
-                db.add(subscription)
+    ).count()
 
-                schedule_sent_count += 1
-                total_sent += 1
-
-            except Exception as e:
-                sm.status = MessageStatusEnum.failed.value
-                sm.remarks = f"Unexpected error: {str(e)}"
-                sm.updated_at = now
-                db.add(sm)
-                schedule_failed_count += 1
-                total_failed += 1
-                errors.append({"schedule_id": sched.id, "message_id": sm.id, "error": str(e)})
-
-        # After processing pending_msgs (and adding sm updates to session),
-        # flush pending changes so subsequent counts are accurate.
-        db.flush()
-
-        # Aggregate counts for this schedule (rely only on DB values)
-        total_count = db.query(SmsScheduledMessage).filter(
-            SmsScheduledMessage.schedule_id == sched.id
-        ).count()
-
-        sent_count_db = db.query(SmsScheduledMessage).filter(
-            SmsScheduledMessage.schedule_id == sched.id,
-            SmsScheduledMessage.status == MessageStatusEnum.sent.value
-        ).count()
-
-        failed_count_db = db.query(SmsScheduledMessage).filter(
-            SmsScheduledMessage.schedule_id == sched.id,
-            SmsScheduledMessage.status == MessageStatusEnum.failed.value
-        ).count()
-
-        pending_count_db = db.query(SmsScheduledMessage).filter(
-            SmsScheduledMessage.schedule_id == sched.id,
-            SmsScheduledMessage.status == MessageStatusEnum.pending.value
-        ).count()
-
-        # Decide schedule status using clear rules
-        if pending_count_db == 0:
-            if sent_count_db == total_count:
-                sched.status = ScheduleStatusEnum.sent.value
-            elif failed_count_db == total_count:
-                sched.status = ScheduleStatusEnum.failed.value
-            else:
-                # some sent, some failed
-                sched.status = ScheduleStatusEnum.partial.value
-        else:
-            # There are still pending messages
-            if sent_count_db > 0 or failed_count_db > 0:
-                # some progress was made
-                sched.status = ScheduleStatusEnum.partial.value
-            else:
-                sched.status = ScheduleStatusEnum.pending.value
-
-        sched.updated_at = now
-        db.add(sched)
-        db.commit()
+    workers = max(1, SMS_SCHEDULE_WORKERS) if due_schedules else 0
+    if workers:
+        q.enqueue_many([
+            Queue.prepare_data(send_scheduled_batch_task, args=(now,), timeout=3600)
+            for _ in range(workers)
+        ])
 
     return {
         "success": True,
-        "message": "Scheduled send process completed.",
+        "message": "Scheduled send workers queued." if workers else "No schedules due.",
         "data": {
             "now": now_str,
-            "processed_schedules": processed_schedules,
-            "total_sent": total_sent,
-            "total_failed": total_failed,
-            "errors": errors
+            "due_schedules": due_schedules,
+            "workers_enqueued": workers
         }
     }
 
@@ -236,6 +86,7 @@ async def send_outage_notifications(
     errors = []
 
     for notif in notifications:
+        reserved_parts = 0
         try:
             user = db.query(User).filter(User.id == notif.user_id).first()
             if not user:
@@ -265,15 +116,17 @@ async def send_outage_notifications(
                 total_failed += 1
                 continue
 
+            balance = credit_service.balance(db, subscription.id)
+
             # Notify only if balance just went under their threshold
-            if subscription.remaining_sms > notif.notify_before_messages:
+            if balance > notif.notify_before_messages:
                 # Still has enough SMS, skip
                 continue
 
-            if notif.last_notified_at is None and subscription.remaining_sms <= notif.notify_before_messages:
+            if notif.last_notified_at is None and balance <= notif.notify_before_messages:
                 # First time crossing the threshold → allow sending
                 pass
-            elif notif.last_notified_at and subscription.remaining_sms <= notif.notify_before_messages:
+            elif notif.last_notified_at and balance <= notif.notify_before_messages:
                 # Already notified before while still under threshold → skip
                 continue
             
@@ -286,16 +139,16 @@ async def send_outage_notifications(
                 continue
 
             # Build preliminary message in Swahili
-            temp_message = f"Habari {user.first_name}, meseji zako zinakaribia kuisha. Salio lako ni {subscription.remaining_sms}. Tafadhali nunua meseji za ziada kuepuka kukosekana kwa huduma."
+            temp_message = f"Habari {user.first_name}, meseji zako zinakaribia kuisha. Salio lako ni {balance}. Tafadhali nunua meseji za ziada kuepuka kukosekana kwa huduma."
 
-            # Compute SMS parts
+            # Compute SMS parts and reserve them; the reservation returns the new balance
             parts_needed, _, _ = sms_service.get_sms_parts_and_length(temp_message)
-            if parts_needed > subscription.remaining_sms:
+            remaining_after_send = credit_service.reserve(db, subscription.id, parts_needed)
+            if remaining_after_send is None:
                 total_failed += 1
                 continue
-
-            # Compute new remaining SMS after this notification
-            remaining_after_send = subscription.remaining_sms - parts_needed
+            reserved_parts = parts_needed
+            db.commit()
 
             # Build final message including updated balance
             message = (
@@ -320,10 +173,7 @@ async def send_outage_notifications(
                     message_id=str(gateway_data.get("message_id")) if gateway_data.get("message_id") else None,
                     sent_at=now
                 ))
-
-                # Deduct SMS from subscription
-                subscription.used_sms = (subscription.used_sms or 0) + parts_needed
-                db.add(subscription)
+                stats_service.record_sent(db, user.id, 1, parts_needed, now.date())
 
                 # Update last_notified_at
                 notif.last_notified_at = now
@@ -335,9 +185,12 @@ async def send_outage_notifications(
 
                 total_sent += 1
             else:
+                credit_service.refund(db, subscription.id, reserved_parts)
                 total_failed += 1
 
         except Exception as e:
+            if reserved_parts:
+                credit_service.refund(db, subscription.id, reserved_parts)
             errors.append({"user_id": notif.user_id, "error": str(e)})
             total_failed += 1
 
@@ -353,3 +206,127 @@ async def send_outage_notifications(
         }
     }
 
+
+@router.post("/partitions/maintain")
+def maintain_partitions(
+    db: Session = Depends(get_db),
+    x_cron_auth: str = Header(None)
+):
+    """Pre-create monthly partitions of sent_messages / sms_callbacks and apply the retention."""
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    created = partition_service.ensure_partitions(db)
+    retired = partition_service.apply_retention(db)
+    return {
+        "success": True,
+        "message": "Partitions maintained.",
+        "data": {"created": created, "retired": retired}
+    }
+
+
+@router.post("/campaigns/reap")
+def reap_campaign_chunks(
+    db: Session = Depends(get_db),
+    x_cron_auth: str = Header(None)
+):
+    """
+    Refund campaign chunks whose worker died or timed out before recording them
+    (lease older than SMS_CAMPAIGN_CHUNK_LEASE_SECONDS), so their campaigns complete.
+    """
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    reaped = reap_expired_chunks(db)
+    return {
+        "success": True,
+        "message": "Expired campaign chunks reaped.",
+        "data": {"chunks_reaped": reaped}
+    }
+
+
+@router.post("/daily-stats/backfill")
+def backfill_daily_stats(
+    since: Optional[date] = Query(None),
+    until: Optional[date] = Query(None),
+    x_cron_auth: str = Header(None)
+):
+    """
+    Queue a worker job that rebuilds the per-user daily stats rollup from
+    sent_messages and sms_callbacks, one EAT day per transaction. Defaults to
+    the day of the oldest sent message through today; pass `since` / `until`
+    to rebuild a shorter range. Returns the job id; the job's result is
+    available from GET /cron/daily-stats/backfill/{job_id}.
+    """
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    job = q.enqueue(
+        backfill_daily_stats_task, since, until,
+        job_timeout=SMS_STATS_BACKFILL_TIMEOUT, result_ttl=86400,
+    )
+    return {
+        "success": True,
+        "message": "Daily stats backfill queued.",
+        "data": {"job_id": job.id}
+    }
+
+
+@router.get("/daily-stats/backfill/{job_id}")
+def backfill_daily_stats_status(job_id: str, x_cron_auth: str = Header(None)):
+    """Status of a backfill job, with the first day and number of days rebuilt once finished."""
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "success": True,
+        "message": "Daily stats backfill status.",
+        "data": {"job_id": job.id, "status": job.get_status(), "result": job.return_value()}
+    }
+
+
+@router.post("/callback-payloads/compact")
+def compact_callback_payloads(
+    older_than_days: Optional[int] = Query(None, ge=0),
+    x_cron_auth: str = Header(None)
+):
+    """
+    Queue a worker job that strips the keys already stored in their own columns
+    from stored delivery report payloads (all, or those older than
+    `older_than_days`) and then measures sms_callbacks. Returns the job id; the
+    job's result is available from GET /cron/callback-payloads/compact/{job_id}.
+    Table bytes only drop once the space is vacuumed.
+    """
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    job = q.enqueue(
+        compact_callback_payloads_task, older_than_days,
+        job_timeout=SMS_CALLBACK_COMPACT_TIMEOUT, result_ttl=86400,
+    )
+    return {
+        "success": True,
+        "message": "Callback payload compaction queued.",
+        "data": {"job_id": job.id}
+    }
+
+
+@router.get("/callback-payloads/compact/{job_id}")
+def compact_callback_payloads_status(job_id: str, x_cron_auth: str = Header(None)):
+    """Status of a compaction job, with rows compacted and sms_callbacks sizes once finished."""
+    if not CRON_AUTH_TOKEN or x_cron_auth != CRON_AUTH_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "success": True,
+        "message": "Callback payload compaction status.",
+        "data": {"job_id": job.id, "status": job.get_status(), "result": job.return_value()}
+    }
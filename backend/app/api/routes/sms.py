@@ -1,48 +1,154 @@
 # backend/app/api/messaging.py
+import asyncio
 import re
 import traceback
-from typing import Optional
+from typing import Optional, Union
 import uuid
 from fastapi import APIRouter, File, Form, Request, Depends, HTTPException, Header, Query, UploadFile
-from sqlalchemy import and_, insert, func, desc
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, func, desc, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 import pytz
-from api.deps import get_db
+from api.deps import get_async_db, get_db
 from api.user_auth import get_current_user, get_current_user_optional
 from tasks.send_sms_task import send_sms_task
-from models.sms_callback import SmsCallback
+from tasks.send_campaign_task import send_campaign_chunk_task
 from models.sms_template import SmsTemplate
-from core.config import SMS_CALLBACK_URL
+from core.config import SMS_CALLBACK_URL, SMS_CAMPAIGN_CHUNK_SIZE, SMS_DLR_BUFFERED
 from models.contact import Contact
 from models.contact_group import ContactGroup
 from models.template_column import TemplateColumn
-from utils.helpers import generate_messages, parse_excel_or_csv
+from utils.helpers import decode_cursor, encode_cursor, generate_messages, parse_excel_or_csv
 from models.sent_messages import SentMessage
-from models.enums import MessageStatusEnum, ScheduleStatusEnum, SmsDeliveryStatusEnum
-from models.scheduled_message import SmsScheduledMessage
-from models.sms_schedule import SmsSchedule
-from utils.security import verify_api_token
+from models.enums import CampaignStatusEnum, MessageStatusEnum, SmsDeliveryStatusEnum
+from utils.security import verify_api_token, verify_api_token_async
 from utils.validation import validate_phone
 from models.user import User
 from models.sender_id import SenderId
 from models.user_subscription import UserSubscription
 from services.sms_gateway_service import SmsGatewayService
+from services.sms_dispatch_service import SmsDispatcher
+from services import callback_ingest_service, credit_service, dlr_dedup, live_events, schedule_service, stats_service
+from redis.exceptions import RedisError
 from rq import Queue
 from core.worker_config import redis_conn
 from models.sms_job import SMSJob
+from models.sms_campaign import SmsCampaign
 
 PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
 
 router = APIRouter()
 q = Queue("sms_queue", connection=redis_conn)
+ENQUEUE_CHUNK_SIZE = 1000
+
+
+async def _db_run(db: Union[Session, AsyncSession], fn, *args):
+    """Call a sync `fn(session, *args)` (e.g. credit_service) with either session kind."""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return fn(db, *args)
+
+
+async def _db_commit(db: Union[Session, AsyncSession]):
+    if isinstance(db, AsyncSession):
+        await db.commit()
+    else:
+        db.commit()
+
+
+async def _send_immediate(
+    db: Union[Session, AsyncSession],
+    sms_service: SmsGatewayService,
+    user: User,
+    sender: SenderId,
+    subscription: UserSubscription,
+    messages: list,
+    errors: list,
+    callback_url: Optional[str] = None,
+) -> dict:
+    """
+    Reserve credits for (phone, message) pairs in input order, send them
+    concurrently and record the sent messages. The reservation is committed
+    before sending and failed sends are refunded. Per-recipient errors are
+    appended to `errors` in input order; the caller commits the session.
+    """
+    failures = {}
+    parts_info = sms_service.get_sms_parts_for_many(msg for _, msg in messages)
+    parts_list = [parts_needed for parts_needed, _, _ in parts_info]
+
+    accepted, remaining_sms = await _db_run(db, credit_service.reserve_many, subscription.id, parts_list)
+    await _db_commit(db)
+
+    planned = []
+    for idx, ((phone, msg), parts_needed, ok) in enumerate(zip(messages, parts_list, accepted)):
+        if not ok:
+            failures[idx] = {"recipient": phone, "error": "Insufficient SMS balance for message parts"}
+        else:
+            planned.append((idx, phone, msg, parts_needed))
+
+    results = await SmsDispatcher(sms_service).send_many(
+        [(phone, msg) for _, phone, msg, _ in planned],
+        callback_url=callback_url,
+    )
+
+    now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
+    sent_count = 0
+    total_parts_used = 0
+    refund_parts = 0
+    sent_messages = []
+
+    for (idx, phone, msg, parts_needed), send_result in zip(planned, results):
+        if isinstance(send_result, BaseException):
+            refund_parts += parts_needed
+            failures[idx] = {"recipient": phone, "error": str(send_result)}
+            continue
+        if not send_result.get("success"):
+            refund_parts += parts_needed
+            failures[idx] = {"recipient": phone, "error": f"Failed to send SMS: {send_result.get('message', 'Unknown error')}"}
+            continue
+
+        total_parts_used += parts_needed
+        sent_count += 1
+
+        gateway_data = send_result.get("data", {}) or {}
+        message_id = gateway_data.get("message_id")
+
+        sent_messages.append({
+            "recipient": phone,
+            "sms_gateway_response": gateway_data
+        })
+
+        db.add(SentMessage(
+            sender_alias=sender.alias,
+            user_id=user.id,
+            phone_number=phone,
+            number_of_parts=parts_needed,
+            message=msg,
+            message_id=str(message_id) if message_id else None,
+            sent_at=now
+        ))
+
+    if refund_parts:
+        remaining_sms = await _db_run(db, credit_service.refund, subscription.id, refund_parts)
+    await _db_run(db, stats_service.record_sent, user.id, sent_count, total_parts_used, now.date())
+    errors.extend(failures[idx] for idx in sorted(failures))
+
+    return {
+        "sent_count": sent_count,
+        "total_parts_used": total_parts_used,
+        "remaining_sms": remaining_sms,
+        "sent_messages": sent_messages,
+    }
+
 
 @router.post("/send")
 async def send_sms(
     request: Request,
     current_user: Optional[User] = Depends(get_current_user_optional),
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Send SMS endpoint supporting:
@@ -79,43 +185,46 @@ async def send_sms(
         if not authorization or not authorization.lower().startswith("bearer "):
             raise HTTPException(status_code=401, detail="Missing authorization. Provide JWT or API token.")
         raw_token = authorization.split(" ", 1)[1].strip()
-        user = verify_api_token(db, raw_token)
+        user = await verify_api_token_async(db, raw_token)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid or expired API token")
 
     # Lookup sender by alias + user_id
-    sender = db.query(SenderId).filter(
+    sender = (await db.execute(select(SenderId).where(
         SenderId.alias == sender_alias,
         SenderId.user_id == user.id,
-    ).first()
+    ))).scalars().first()
     if not sender:
         raise HTTPException(status_code=404, detail="Sender ID alias not found for this user")
 
     # Check user subscription SMS balance
-    subscription = db.query(UserSubscription).filter(
+    subscription = (await db.execute(select(UserSubscription).where(
         UserSubscription.user_id == user.id,
         # If you have Enum objects, use SubscriptionStatusEnum.active.value or compare to enum
         UserSubscription.status == "active"
-    ).first()
-    if not subscription or subscription.remaining_sms <= 0:
+    ))).scalars().first()
+    if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
         raise HTTPException(status_code=403, detail="Insufficient SMS balance or no active subscription")
 
     # Initialize SMS gateway service
     sms_service = SmsGatewayService(sender_alias)
 
+    parts_used, _, _ = sms_service.get_sms_parts_and_length(message)
+
+    # Reserve the parts atomically and release the row before calling the gateway
+    if await db.run_sync(credit_service.reserve, subscription.id, parts_used) is None:
+        raise HTTPException(status_code=403, detail="Insufficient SMS balance for message parts")
+    await db.commit()
+
     # Send SMS with parts check
     send_result = await sms_service.send_sms_with_parts_check(phone_number, message)
 
     if not send_result.get("success"):
+        await db.run_sync(credit_service.refund, subscription.id, parts_used)
+        await db.commit()
         # forward the gateway message
         raise HTTPException(status_code=500, detail="Failed to send SMS: " + send_result.get("message", "Unknown error"))
 
-    # Deduct used SMS parts from subscription
-    parts_used = send_result["data"].get("num_parts", 1)
-    subscription.used_sms += parts_used
-    db.add(subscription)
-    db.commit()
-
     now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
 
     return {
@@ -136,7 +245,7 @@ async def quick_send_sms(
     request: Request,
     current_user: Optional[User] = Depends(get_current_user_optional),
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         # Validate content type
@@ -199,21 +308,21 @@ async def quick_send_sms(
             if not authorization or not authorization.lower().startswith("bearer "):
                 raise HTTPException(status_code=401, detail="Missing authorization. Provide JWT or API token.")
             raw_token = authorization.split(" ", 1)[1].strip()
-            user = verify_api_token(db, raw_token)
+            user = await verify_api_token_async(db, raw_token)
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid or expired API token")
 
         # Lookup sender by UUID (if parsed as UUID) OR by alias (if not a UUID) and user_id
         if is_sender_uuid:
-            sender = db.query(SenderId).filter(
+            sender = (await db.execute(select(SenderId).where(
                 SenderId.uuid == sender_uuid,
                 SenderId.user_id == user.id
-            ).first()
+            ))).scalars().first()
         else:
-            sender = db.query(SenderId).filter(
+            sender = (await db.execute(select(SenderId).where(
                 SenderId.alias == sender_alias,
                 SenderId.user_id == user.id
-            ).first()
+            ))).scalars().first()
 
         if not sender:
             raise HTTPException(status_code=404, detail="Sender ID not found or not owned by user")
@@ -243,36 +352,17 @@ async def quick_send_sms(
             if not schedule_name:
                 schedule_name = (message[:50] + "...") if len(message) > 50 else message
 
-            sms_schedule = SmsSchedule(
-                user_id=user.id,
-                sender_id=sender.id,
-                title=schedule_name,
-                scheduled_for=scheduled_for,
-                status=ScheduleStatusEnum.pending.value,
-                created_at=now,
-                updated_at=now
+            schedule_uuid, _ = await _db_run(
+                db, schedule_service.create_schedule, user.id, sender.id, schedule_name, scheduled_for,
+                [(phone, message) for phone in valid_recipients], now,
             )
-            db.add(sms_schedule)
-            db.flush()
-
-            for phone in valid_recipients:
-                sched_msg = SmsScheduledMessage(
-                    schedule_id=sms_schedule.id,
-                    phone_number=phone,
-                    message=message,
-                    status=MessageStatusEnum.pending.value,
-                    created_at=now,
-                    updated_at=now
-                )
-                db.add(sched_msg)
-                db.commit()
 
             return {
                 "success": True,
                 "message": f"Scheduled SMS to {len(valid_recipients)} recipients.",
                 "errors": errors,
                 "data": {
-                    "schedule_uuid": str(sms_schedule.uuid),
+                    "schedule_uuid": str(schedule_uuid),
                     "scheduled_for": scheduled_for.isoformat(),
                     "total_recipients": len(valid_recipients),
                     "failed_recipients": len(errors)
@@ -280,66 +370,28 @@ async def quick_send_sms(
             }
 
         # Immediate send path
-        subscription = db.query(UserSubscription).filter(
+        subscription = (await db.execute(select(UserSubscription).where(
             UserSubscription.user_id == user.id,
             UserSubscription.status == "active"
-        ).first()
-        if not subscription or subscription.remaining_sms <= 0:
+        ))).scalars().first()
+        if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
             raise HTTPException(status_code=403, detail="Insufficient SMS balance or no active subscription")
 
         sms_service = SmsGatewayService(sender.alias)
-
-        sent_count = 0
-        total_parts_used = 0
-        remaining_sms = subscription.remaining_sms
-        sent_messages = []
-
         callback_url_with_user = f"{SMS_CALLBACK_URL}?id={user.uuid}"
 
-        for phone in valid_recipients:
-            try:
-                parts_needed, _, _ = sms_service.get_sms_parts_and_length(message)
-
-                if parts_needed > remaining_sms:
-                    errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
-                    continue
-
-                now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
-                send_result = await sms_service.send_sms_with_parts_check(phone, message, callback_url=callback_url_with_user)
-
-                if not send_result.get("success"):
-                    errors.append({"recipient": phone, "error": f"Failed to send SMS: {send_result.get('message', 'Unknown error')}"})
-                    continue
-
-                remaining_sms -= parts_needed
-                subscription.used_sms += parts_needed
-                total_parts_used += parts_needed
-                sent_count += 1
-
-                gateway_data = send_result.get("data", {}) or {}
-                message_id = gateway_data.get("message_id")
-
-                sent_messages.append({
-                    "recipient": phone,
-                    "sms_gateway_response": gateway_data
-                })
-
-                db.add(SentMessage(
-                    sender_alias=sender.alias,
-                    user_id=user.id,
-                    phone_number=phone,
-                    number_of_parts=parts_needed,
-                    message=message,
-                    message_id=str(message_id) if message_id else None,
-                    sent_at=now
-                ))
-
-            except Exception as e:
-                print(f"Exception sending SMS to {phone}: {e}")
-                errors.append({"recipient": phone, "error": str(e)})
-
-        db.add(subscription)
-        db.commit()
+        dispatch = await _send_immediate(
+            db, sms_service, user, sender, subscription,
+            [(phone, message) for phone in valid_recipients],
+            errors,
+            callback_url=callback_url_with_user,
+        )
+        await db.commit()
+
+        sent_count = dispatch["sent_count"]
+        total_parts_used = dispatch["total_parts_used"]
+        remaining_sms = dispatch["remaining_sms"]
+        sent_messages = dispatch["sent_messages"]
 
         return {
             "success": sent_count > 0,
@@ -459,37 +511,17 @@ async def quick_send_sms(
             if not schedule_name:
                 schedule_name = (message[:50] + "...") if len(message) > 50 else message
 
-            sms_schedule = SmsSchedule(
-                user_id=user.id,
-                sender_id=sender.id,
-                title=schedule_name,
-                scheduled_for=scheduled_for,
-                status=ScheduleStatusEnum.pending.value,
-                created_at=now,
-                updated_at=now
+            schedule_uuid, _ = schedule_service.create_schedule(
+                db, user.id, sender.id, schedule_name, scheduled_for,
+                [(phone, message) for phone in valid_recipients], now,
             )
-            db.add(sms_schedule)
-            db.flush()
-
-            for phone in valid_recipients:
-                sched_msg = SmsScheduledMessage(
-                    schedule_id=sms_schedule.id,
-                    phone_number=phone,
-                    message=message,
-                    status=MessageStatusEnum.pending.value,
-                    created_at=now,
-                    updated_at=now
-                )
-                db.add(sched_msg)
-
-            db.commit()
 
             return {
                 "success": True,
                 "message": f"Scheduled SMS to {len(valid_recipients)} recipients.",
                 "errors": errors,
                 "data": {
-                    "schedule_uuid": str(sms_schedule.uuid),
+                    "schedule_uuid": str(schedule_uuid),
                     "scheduled_for": scheduled_for.isoformat(),
                     "total_recipients": len(valid_recipients),
                     "failed_recipients": len(errors)
@@ -502,62 +534,60 @@ async def quick_send_sms(
             UserSubscription.user_id == user.id,
             UserSubscription.status == "active"
         ).first()
-        if not subscription or subscription.remaining_sms <= 0:
+        if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
             raise HTTPException(status_code=403, detail="Insufficient SMS balance or no active subscription")
 
-        sent_count = 0
-        total_parts_used = 0
-        remaining_sms = subscription.remaining_sms
-        queued_messages = []
-
         # Compute parts once
         sms_service = SmsGatewayService(sender.alias)
         parts_needed, _, _ = sms_service.get_sms_parts_and_length(message)
 
-        for phone in valid_recipients:
-            if parts_needed > remaining_sms:
-                errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
-                continue
+        # Reserve credits for every affordable recipient in one atomic update
+        affordable, remaining_sms = credit_service.reserve_batch(db, subscription.id, parts_needed, len(valid_recipients))
+        for phone in valid_recipients[affordable:]:
+            errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
+        recipients_to_queue = valid_recipients[:affordable]
 
+        # Create all SMSJob rows with multi-row INSERT ... RETURNING id
+        job_ids = []
+        if recipients_to_queue:
             now = datetime.utcnow()
+            job_ids = db.execute(
+                insert(SMSJob).returning(SMSJob.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "uuid": uuid.uuid4(),
+                        "user_id": user.id,
+                        "sender_id": sender.id,
+                        "phone_number": phone,
+                        "message": message,
+                        "status": MessageStatusEnum.pending.value,
+                        "retries": 0,
+                        "max_retries": 3,
+                        "reserved_parts": parts_needed,
+                        "scheduled_for": None,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for phone in recipients_to_queue
+                ],
+            ).scalars().all()
+
+        # Commit jobs + reservation before workers can pick them up
+        db.commit()
 
-            # Create SMSJob row in DB
-            new_job = SMSJob(
-                user_id=user.id,
-                sender_id=sender.id,
-                phone_number=phone,
-                message=message,
-                status=MessageStatusEnum.pending.value,
-                retries=0,
-                max_retries=3,
-                scheduled_for=None,
-                created_at=now,
-                updated_at=now
-            )
-            db.add(new_job)
-
-            # Reserve parts immediately
-            subscription.used_sms = (subscription.used_sms or 0) + parts_needed
-            db.add(subscription)
-
-            # Flush to get job.id
-            db.flush()
-            job_id = new_job.id
-
-            # Enqueue the job
-            q.enqueue(send_sms_task, job_id, job_timeout=300)
-
-            sent_count += 1
-            total_parts_used += parts_needed
-            remaining_sms -= parts_needed
+        # Enqueue through pipelined enqueue_many calls
+        for i in range(0, len(job_ids), ENQUEUE_CHUNK_SIZE):
+            q.enqueue_many([
+                Queue.prepare_data(send_sms_task, args=(job_id,), timeout=300)
+                for job_id in job_ids[i:i + ENQUEUE_CHUNK_SIZE]
+            ])
 
-            queued_messages.append({
-                "recipient": phone,
-                "queued_job_id": job_id
-            })
-
-        # Commit DB for all jobs + subscription update
-        db.commit()
+        sent_count = len(job_ids)
+        total_parts_used = sent_count * parts_needed
+        queued_messages = [
+            {"recipient": phone, "queued_job_id": job_id}
+            for phone, job_id in zip(recipients_to_queue, job_ids)
+        ]
 
         return {
             "success": sent_count > 0,
@@ -699,37 +729,16 @@ async def quick_send_group_sms(
         if not schedule_name:
             schedule_name = (message_template[:50] + "...") if len(message_template) > 50 else message_template
 
-        sms_schedule = SmsSchedule(
-            user_id=user.id,
-            sender_id=sender.id,
-            title=schedule_name,
-            scheduled_for=scheduled_for,
-            status=ScheduleStatusEnum.pending.value,
-            created_at=now,
-            updated_at=now
+        schedule_uuid, _ = schedule_service.create_schedule(
+            db, user.id, sender.id, schedule_name, scheduled_for, personalized_messages, now,
         )
-        db.add(sms_schedule)
-        db.flush()
-
-        for phone, msg in personalized_messages:
-            sched_msg = SmsScheduledMessage(
-                schedule_id=sms_schedule.id,
-                phone_number=phone,
-                message=msg,
-                status=MessageStatusEnum.pending.value,
-                created_at=now,
-                updated_at=now
-            )
-            db.add(sched_msg)
-            db.commit()
 
-        
         return {
             "success": True,
             "message": f"Scheduled SMS to {len(personalized_messages)} recipients.",
             "errors": errors,
             "data": {
-                "schedule_uuid": str(sms_schedule.uuid),
+                "schedule_uuid": str(schedule_uuid),
                 "scheduled_for": scheduled_for.isoformat(),
                 "total_recipients": len(personalized_messages),
                 "failed_recipients": len(errors)
@@ -741,54 +750,26 @@ async def quick_send_group_sms(
         UserSubscription.user_id == user.id,
         UserSubscription.status == "active"
     ).first()
-    if not subscription or subscription.remaining_sms <= 0:
+    if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
         raise HTTPException(status_code=403, detail="Insufficient SMS balance or no active subscription")
 
     sms_service = SmsGatewayService(sender.alias)
-    sent_count = 0
-    total_parts_used = 0
-    remaining_sms = subscription.remaining_sms
-    sent_messages = []
     # Build callback URL with user UUID
     callback_url_with_user = f"{SMS_CALLBACK_URL}?id={user.uuid}"
-    for phone, msg in personalized_messages:
-        parts_needed, _, _ = sms_service.get_sms_parts_and_length(msg)
-        if parts_needed > remaining_sms:
-            errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
-            continue
-
-        now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
-        send_result = await sms_service.send_sms_with_parts_check(phone, msg, callback_url=callback_url_with_user)
-        if not send_result.get("success"):
-            errors.append({"recipient": phone, "error": f"Failed to send SMS: {send_result.get('message', 'Unknown error')}"})
-            continue
-
-        remaining_sms -= parts_needed
-        subscription.used_sms += parts_needed
-        total_parts_used += parts_needed
-        sent_count += 1
-
-        gateway_data = send_result.get("data", {}) or {}
-        message_id = gateway_data.get("message_id")
-
-        sent_messages.append({
-            "recipient": phone,
-            "sms_gateway_response": gateway_data
-        })
-
-        db.add(SentMessage(
-            sender_alias=sender.alias,
-            user_id=user.id,
-            phone_number=phone,
-            number_of_parts=parts_needed,
-            message=msg,
-            message_id=str(message_id) if message_id else None,
-            sent_at=now
-        ))
 
-    db.add(subscription)
+    dispatch = await _send_immediate(
+        db, sms_service, user, sender, subscription,
+        personalized_messages,
+        errors,
+        callback_url=callback_url_with_user,
+    )
     db.commit()
 
+    sent_count = dispatch["sent_count"]
+    total_parts_used = dispatch["total_parts_used"]
+    remaining_sms = dispatch["remaining_sms"]
+    sent_messages = dispatch["sent_messages"]
+
     return {
         "success": sent_count > 0,
         "message": f"Sent SMS to {sent_count} recipients. {len(errors)} errors.",
@@ -913,36 +894,18 @@ async def quick_send_sms(
             if not schedule_name:
                 schedule_name = (message_template[:50] + "...") if len(message_template) > 50 else message_template
 
-            sms_schedule = SmsSchedule(
-                user_id=user.id,
-                sender_id=sender.id,
-                title=schedule_name,
-                scheduled_for=datetime.strptime(scheduled_for, "%Y-%m-%d %H:%M:%S") if scheduled_for else None,
-                status=ScheduleStatusEnum.pending.value,
-                created_at=now,
-                updated_at=now
+            schedule_uuid, _ = schedule_service.create_schedule(
+                db, user.id, sender.id, schedule_name,
+                datetime.strptime(scheduled_for, "%Y-%m-%d %H:%M:%S") if scheduled_for else None,
+                personalized_messages, now,
             )
-            db.add(sms_schedule)
-            db.flush()
-
-            for phone, msg in personalized_messages:
-                sched_msg = SmsScheduledMessage(
-                    schedule_id=sms_schedule.id,
-                    phone_number=phone,
-                    message=msg,
-                    status=MessageStatusEnum.pending.value,
-                    created_at=now,
-                    updated_at=now
-                )
-                db.add(sched_msg)
-                db.commit()
 
             return {
                 "success": True,
                 "message": f"Scheduled {len(personalized_messages)} personalized SMS messages.",
                 "errors": errors,
                 "data": {
-                    "schedule_uuid": str(sms_schedule.uuid),
+                    "schedule_uuid": str(schedule_uuid),
                     "scheduled_for": scheduled_for,
                     "total_recipients": len(personalized_messages),
                     "failed_recipients": len(errors)
@@ -954,54 +917,25 @@ async def quick_send_sms(
             UserSubscription.user_id == user.id,
             UserSubscription.status == "active"
         ).first()
-        if not subscription or subscription.remaining_sms <= 0:
+        if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
             raise HTTPException(status_code=403, detail="No active subscription or insufficient SMS balance")
 
         sms_service = SmsGatewayService(sender.alias)
-        sent_count = 0
-        total_parts_used = 0
-        remaining_sms = subscription.remaining_sms
-        sent_messages = []
         callback_url_with_user = f"{SMS_CALLBACK_URL}?id={user.uuid}"
 
-        for phone, msg in personalized_messages:
-            parts_needed, _, _ = sms_service.get_sms_parts_and_length(msg)
-
-            if parts_needed > remaining_sms:
-                errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
-                continue
-
-            send_result = await sms_service.send_sms_with_parts_check(phone, msg, callback_url=callback_url_with_user)
-            if not send_result.get("success"):
-                errors.append({"recipient": phone, "error": f"Failed to send SMS: {send_result.get('message', 'Unknown error')}"} )
-                continue
-
-            remaining_sms -= parts_needed
-            subscription.used_sms += parts_needed
-            total_parts_used += parts_needed
-            sent_count += 1
-
-            gateway_data = send_result.get("data", {}) or {}
-            message_id = gateway_data.get("message_id")
-
-            sent_messages.append({
-                "recipient": phone,
-                "sms_gateway_response": gateway_data
-            })
-
-            db.add(SentMessage(
-                sender_alias=sender.alias,
-                user_id=user.id,
-                phone_number=phone,
-                number_of_parts=parts_needed,
-                message=msg,
-                message_id=str(message_id) if message_id else None,
-                sent_at=now
-            ))
-
-        db.add(subscription)
+        dispatch = await _send_immediate(
+            db, sms_service, user, sender, subscription,
+            personalized_messages,
+            errors,
+            callback_url=callback_url_with_user,
+        )
         db.commit()
 
+        sent_count = dispatch["sent_count"]
+        total_parts_used = dispatch["total_parts_used"]
+        remaining_sms = dispatch["remaining_sms"]
+        sent_messages = dispatch["sent_messages"]
+
         return {
             "success": sent_count > 0,
             "message": f"Sent {sent_count} SMS messages. {len(errors)} errors.",
@@ -1019,62 +953,197 @@ async def quick_send_sms(
         traceback.print_exc()
         raise
 
+@router.post("/campaigns")
+async def create_campaign(
+    request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue one message to many recipients as a campaign. Recipients are stored
+    on the campaign row and sent by workers in chunks of SMS_CAMPAIGN_CHUNK_SIZE.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "application/json" not in content_type.lower():
+        raise HTTPException(status_code=415, detail="Invalid content type. Expected application/json")
+
+    data = await request.json()
+    sender_id_value = data.get("sender_id")
+    message = data.get("message")
+    recipients_text = data.get("recipients")
+    title = (data.get("title") or "").strip()
+
+    if not sender_id_value:
+        raise HTTPException(status_code=400, detail="sender_id is required")
+    if not message or not message.strip():
+        raise HTTPException(status_code=400, detail="message is required")
+    if not recipients_text or not recipients_text.strip():
+        raise HTTPException(status_code=400, detail="recipients is required")
+
+    user = current_user
+    if user is None:
+        if not authorization or not authorization.lower().startswith("bearer "):
+            raise HTTPException(status_code=401, detail="Missing authorization. Provide JWT or API token.")
+        raw_token = authorization.split(" ", 1)[1].strip()
+        user = verify_api_token(db, raw_token)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid or expired API token")
+
+    # Lookup sender by UUID or alias, scoped to the user
+    try:
+        sender_filter = SenderId.uuid == uuid.UUID(str(sender_id_value))
+    except ValueError:
+        sender_filter = SenderId.alias == str(sender_id_value).strip()
+    sender = db.query(SenderId).filter(sender_filter, SenderId.user_id == user.id).first()
+    if not sender:
+        raise HTTPException(status_code=404, detail="Sender ID not found or not owned by user")
+
+    errors = []
+    valid_recipients = []
+    for phone in (line.strip() for line in recipients_text.splitlines()):
+        if not phone:
+            continue
+        if not validate_phone(phone):
+            errors.append({"recipient": phone, "error": "Invalid phone number format"})
+            continue
+        valid_recipients.append(phone)
+
+    if not valid_recipients:
+        return {"success": False, "message": "No valid recipients to send SMS", "errors": errors, "data": None}
+
+    subscription = db.query(UserSubscription).filter(
+        UserSubscription.user_id == user.id,
+        UserSubscription.status == "active"
+    ).first()
+    if not subscription or await _db_run(db, credit_service.balance, subscription.id) <= 0:
+        raise HTTPException(status_code=403, detail="Insufficient SMS balance or no active subscription")
+
+    parts_needed, _, _ = SmsGatewayService.get_sms_parts_and_length(message)
+    affordable, remaining_sms = credit_service.reserve_batch(db, subscription.id, parts_needed, len(valid_recipients))
+    for phone in valid_recipients[affordable:]:
+        errors.append({"recipient": phone, "error": "Insufficient SMS balance for message parts"})
+    recipients = valid_recipients[:affordable]
+
+    if not recipients:
+        db.rollback()
+        return {"success": False, "message": "Insufficient SMS balance for any recipient", "errors": errors, "data": None}
+
+    chunk_size = max(1, SMS_CAMPAIGN_CHUNK_SIZE)
+    campaign = SmsCampaign(
+        user_id=user.id,
+        sender_id=sender.id,
+        subscription_id=subscription.id,
+        title=title or ((message[:50] + "...") if len(message) > 50 else message),
+        message=message,
+        phone_numbers=recipients,
+        parts_per_message=parts_needed,
+        chunk_size=chunk_size,
+        status=CampaignStatusEnum.pending,
+        total_recipients=len(recipients),
+        parts_reserved=len(recipients) * parts_needed,
+    )
+    db.add(campaign)
+    db.commit()
+
+    q.enqueue_many([
+        Queue.prepare_data(send_campaign_chunk_task, args=(campaign.id, offset, chunk_size), timeout=900)
+        for offset in range(0, len(recipients), chunk_size)
+    ])
+
+    return {
+        "success": True,
+        "message": f"Queued campaign to {len(recipients)} recipients. {len(errors)} errors.",
+        "errors": errors,
+        "data": {
+            "campaign_uuid": str(campaign.uuid),
+            "total_recipients": len(recipients),
+            "chunks": (len(recipients) + chunk_size - 1) // chunk_size,
+            "total_parts_reserved": campaign.parts_reserved,
+            "remaining_sms": remaining_sms,
+        }
+    }
+
+
+@router.get("/campaigns/{campaign_uuid}")
+def get_campaign(
+    campaign_uuid: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Campaign progress, read from the counters maintained by the workers."""
+    try:
+        parsed_uuid = uuid.UUID(campaign_uuid)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid campaign UUID")
+
+    campaign = db.execute(
+        select(
+            SmsCampaign.uuid, SmsCampaign.title, SmsCampaign.message, SmsCampaign.status,
+            SmsCampaign.total_recipients, SmsCampaign.processed_count, SmsCampaign.sent_count,
+            SmsCampaign.failed_count, SmsCampaign.parts_per_message, SmsCampaign.last_error,
+            SmsCampaign.created_at, SmsCampaign.completed_at,
+        ).where(SmsCampaign.uuid == parsed_uuid, SmsCampaign.user_id == current_user.id)
+    ).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    return {
+        "success": True,
+        "message": "Campaign fetched",
+        "data": {
+            "campaign_uuid": str(campaign.uuid),
+            "title": campaign.title,
+            "message": campaign.message,
+            "status": campaign.status.value,
+            "total_recipients": campaign.total_recipients,
+            "processed": campaign.processed_count,
+            "sent": campaign.sent_count,
+            "failed": campaign.failed_count,
+            "parts_per_message": campaign.parts_per_message,
+            "last_error": campaign.last_error,
+            "created_at": campaign.created_at.isoformat(),
+            "completed_at": campaign.completed_at.isoformat() if campaign.completed_at else None,
+        }
+    }
+
 @router.post("/webhook")
-async def sms_callback(request: Request, db: Session = Depends(get_db)):
+async def sms_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Gateway delivery report. Repeats of a report are dropped first (see
+    services.dlr_dedup). With SMS_DLR_BUFFERED the report is only appended
+    to a Redis stream and written in batches by the DLR flusher; it is written
+    here directly when buffering is off or Redis is unavailable.
+    """
     try:
         # get all query params
         user_uuid = request.query_params.get("id")
         data = await request.json()
 
-        message_id = data.get("message_id")
-        phone = data.get("PhoneNumber") or data.get("phone")
-        status = data.get("DLRStatus", "").lower()
-        uid = data.get("uid")
-        remarks = data.get("Remarks")
-        sender_alias = data.get("SenderId")
-        full_payload = data
-
-        if not message_id or not phone:
+        received_at = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
+        report = callback_ingest_service.parse_report(data, user_uuid, received_at)
+        if report is None:
             return {"success": False, "message": "message_id and phone are required", "data": None}
 
-        # Lookup user by UUID
-        user_id = None
-        if user_uuid:
-            user = db.query(User).filter(User.uuid == user_uuid).first()
-            if user:
-                user_id = user.id
-
-        eat = pytz.timezone("Africa/Nairobi")
-        received_at = datetime.now(eat).replace(tzinfo=None)
-
-        stmt = insert(SmsCallback).values(
-            message_id=message_id,
-            phone=phone,
-            status=status,
-            uid=uid,
-            remarks=remarks,
-            sender_alias=sender_alias,
-            payload=full_payload,
-            user_id=user_id,
-            received_at=received_at
-        )
+        # Gateway retries of a report already taken in are acknowledged without a write.
+        # The Redis calls below are blocking, so they run off the event loop
+        if not await asyncio.to_thread(dlr_dedup.first_seen, report):
+            return {"success": True, "message": "Duplicate callback ignored", "data": data}
 
-        if uid:
-            stmt = stmt.on_conflict_do_update(
-                index_elements=['uid'],
-                set_={
-                    'status': stmt.excluded.status,
-                    'remarks': stmt.excluded.remarks,
-                    'sender_alias': stmt.excluded.sender_alias,
-                    'phone': stmt.excluded.phone,
-                    'payload': stmt.excluded.payload,
-                    'user_id': stmt.excluded.user_id,
-                    'received_at': stmt.excluded.received_at
-                }
-            )
+        if SMS_DLR_BUFFERED:
+            try:
+                await asyncio.to_thread(callback_ingest_service.enqueue, report)
+                return {"success": True, "message": "Callback received", "data": data}
+            except RedisError as e:
+                print(f"DLR stream unavailable, writing callback directly: {e}")
 
-        db.execute(stmt)
-        db.commit()
+        try:
+            rows = await db.run_sync(callback_ingest_service.write_reports, [report])
+            await db.commit()
+        except Exception:
+            await asyncio.to_thread(dlr_dedup.forget, report)
+            raise
+        await asyncio.to_thread(live_events.publish_deliveries, rows)
 
         return {"success": True, "message": "Callback received", "data": data}
 
@@ -1082,90 +1151,98 @@ async def sms_callback(request: Request, db: Session = Depends(get_db)):
         print("Error processing SMS callback:", e)
         return {"success": False, "message": "Internal server error", "data": None}
 
+@router.get("/events")
+async def live_delivery_events(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Server-Sent Events stream of the user's delivery status changes ("delivery")
+    and campaign progress ("campaign"), pushed as reports are ingested and
+    chunks are sent instead of polling /history or the dashboard stats.
+    """
+    user_id = current_user.id
+    # The stream stays open for as long as the page does; give the pooled connection back now
+    await db.close()
+    return StreamingResponse(
+        live_events.stream(user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history")
-def get_message_history(
+async def get_message_history(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
     status: Optional[str] = Query(None),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
 ):
     """
-    Returns paginated SMS message history with server-side filtering.
-    Uses a LEFT JOIN subquery instead of N+1 queries.
+    Returns SMS message history, newest first, with server-side filtering.
+    Pages are fetched by keyset on (sent_at, id): pass `next_cursor` from the
+    previous response as `cursor`. `page` (OFFSET) is still honoured when no
+    cursor is given. The exact total is only counted when `include_total` is
+    set. Statuses come from sent_messages.delivery_status, kept by /sms/webhook.
     """
+    after = decode_cursor(cursor) if cursor else None
     try:
-        # Subquery: latest callback status per message_id
-        latest_cb = (
-            db.query(
-                SmsCallback.message_id,
-                func.max(SmsCallback.received_at).label("max_received")
-            )
-            .filter(SmsCallback.user_id == current_user.id)
-            .group_by(SmsCallback.message_id)
-            .subquery()
-        )
-
-        # Main query with LEFT JOIN
-        query = (
-            db.query(SentMessage, SmsCallback.status)
-            .outerjoin(
-                latest_cb,
-                SentMessage.message_id == latest_cb.c.message_id
-            )
-            .outerjoin(
-                SmsCallback,
-                and_(
-                    SmsCallback.message_id == latest_cb.c.message_id,
-                    SmsCallback.received_at == latest_cb.c.max_received,
-                    SmsCallback.user_id == current_user.id
-                )
-            )
-            .filter(SentMessage.user_id == current_user.id)
-        )
+        query = select(SentMessage).where(SentMessage.user_id == current_user.id)
 
         # Server-side date filters
         if start_date:
             try:
                 sd = datetime.fromisoformat(start_date)
-                query = query.filter(SentMessage.sent_at >= sd)
+                query = query.where(SentMessage.sent_at >= sd)
             except ValueError:
                 pass
 
         if end_date:
             try:
                 ed = datetime.fromisoformat(end_date)
-                query = query.filter(SentMessage.sent_at <= ed)
+                query = query.where(SentMessage.sent_at <= ed)
             except ValueError:
                 pass
 
-        # Server-side status filter
+        # Server-side status filter on the denormalized delivery status
         if status:
-            query = query.filter(
-                func.coalesce(
-                    SmsCallback.status,
-                    SmsDeliveryStatusEnum.pending
-                ) == status.lower()
+            query = query.where(
+                func.coalesce(SentMessage.delivery_status, SmsDeliveryStatusEnum.pending) == status.lower()
             )
 
-        # Get total count before pagination
-        total_count = query.count()
-        total_pages = max(1, (total_count + limit - 1) // limit)
+        total_count = None
+        total_pages = None
+        if include_total:
+            total_count = (await db.execute(
+                select(func.count()).select_from(query.subquery())
+            )).scalar() or 0
+            total_pages = max(1, (total_count + limit - 1) // limit)
+
+        query = query.order_by(desc(SentMessage.sent_at), desc(SentMessage.id))
+        if after:
+            # The plain sent_at bound lets Postgres prune newer partitions
+            query = query.where(
+                SentMessage.sent_at <= after[0],
+                tuple_(SentMessage.sent_at, SentMessage.id) < tuple_(*after)
+            )
+        elif page > 1:
+            query = query.offset((page - 1) * limit)
 
-        # Apply ordering and pagination
-        results = (
-            query.order_by(desc(SentMessage.sent_at))
-            .offset((page - 1) * limit)
-            .limit(limit)
-            .all()
-        )
+        # One extra row tells whether another page follows
+        rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
         history = []
-        for msg, cb_status in results:
+        for msg in rows:
             status_value = (
-                cb_status.value.upper() if cb_status
+                msg.delivery_status.value.upper() if msg.delivery_status
                 else SmsDeliveryStatusEnum.pending.value.upper()
             )
             history.append({
@@ -1187,6 +1264,8 @@ def get_message_history(
             "pagination": {
                 "page": page,
                 "limit": limit,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1].sent_at, rows[-1].id) if has_more else None,
                 "total_count": total_count,
                 "total_pages": total_pages
             }
@@ -1212,20 +1291,16 @@ async def get_remaining_sms(
         raise HTTPException(status_code=401, detail="User not authenticated")
     print(f"Stage 3: current_user found: {current_user.id}, {current_user.uuid}")
 
-    # Fetch all active subscriptions for the current user
-    subscriptions = db.query(UserSubscription).filter(
-        UserSubscription.user_id == current_user.id,
-        UserSubscription.status == "active"
-    ).all()
-    print(f"Stage 4: Subscriptions fetched: {subscriptions}")
+    # Totals across active subscriptions
+    subscription_count, total_purchased, total_used, total_balance = credit_service.user_credit_totals(
+        db, current_user.id
+    )
+    print(f"Stage 4: Active subscriptions: {subscription_count}")
 
-    if not subscriptions:
+    if not subscription_count:
         print("Stage 5: No active subscriptions found")
         raise HTTPException(status_code=404, detail="No active subscriptions found")
 
-    total_purchased = sum(sub.total_sms for sub in subscriptions)
-    total_used = sum(sub.used_sms for sub in subscriptions)
-    total_balance = sum(sub.remaining_sms for sub in subscriptions)
     print(f"Stage 6: Computed totals - purchased: {total_purchased}, used: {total_used}, balance: {total_balance}")
 
     return {
@@ -1,14 +1,15 @@
 from typing import Optional
 from fastapi import Cookie, Header, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from api.deps import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.deps import get_async_db
 from models.user import User
 from utils.security import verify_access_token
 
 async def get_current_user(
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     token = None
 
@@ -35,7 +36,7 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token payload missing user identifier"
             )
-        user = db.query(User).filter(User.uuid == user_uuid).first()
+        user = (await db.execute(select(User).where(User.uuid == user_uuid))).scalars().first()
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,7 +52,7 @@ async def get_current_user(
 async def get_current_user_optional(
     session_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Optional[User]:
     """
     Try to authenticate user via JWT bearer token.
@@ -74,7 +75,7 @@ async def get_current_user_optional(
         payload = verify_access_token(token)
         user_uuid = payload.get("sub")
         if user_uuid:
-            user = db.query(User).filter(User.uuid == user_uuid).first()
+            user = (await db.execute(select(User).where(User.uuid == user_uuid))).scalars().first()
             return user
     except Exception:
         pass  # JWT invalid or expired, continue to API token
@@ -87,19 +88,18 @@ async def get_current_user_optional(
         from models.api_access_tokens import ApiAccessToken
 
         token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
-        api_token = db.query(ApiAccessToken).filter(
+        api_token = (await db.execute(select(ApiAccessToken).where(
             ApiAccessToken.token_hash == token_hash,
             ApiAccessToken.revoked == False
-        ).first()
+        ))).scalars().first()
 
         if api_token and (not api_token.expires_at or api_token.expires_at > datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)):
             # update last_used in Nairobi timezone
             tz = pytz.timezone("Africa/Nairobi")
             api_token.last_used = datetime.now(tz).replace(tzinfo=None)
-            db.commit()
-            db.refresh(api_token)
+            await db.commit()
 
-            user = db.query(User).filter(User.id == api_token.user_id).first()
+            user = (await db.execute(select(User).where(User.id == api_token.user_id))).scalars().first()
             return user
     except Exception:
         return None
@@ -0,0 +1,159 @@
+# backend/app/benchmarks/credit_reservation_benchmark.py
+"""
+Concurrency benchmark: SMS credit debits against one subscription.
+
+Many threads try to spend the same balance at once, first with the old
+read-modify-write pattern (read remaining_sms, check in Python, write
+used_sms + parts) and then with credit_service.reserve (one conditional
+UPDATE that only debits if the balance covers it). For each it reports
+throughput, how many credits the callers believe they spent versus what was
+recorded (lost updates), and whether the balance was overspent.
+
+Rewrites balances, so it needs a throwaway database with the schema
+applied, passed explicitly with --dsn (it refuses core.config.DATABASE_URL).
+A scratch user and subscription are created for the run and deleted
+afterwards. Run from backend/app:
+
+    python -m benchmarks.credit_reservation_benchmark --dsn postgresql+psycopg2://bench@localhost/sms_bench
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from core.config import DATABASE_URL
+from models.user import User
+from models.user_subscription import UserSubscription
+from services import credit_service
+
+SessionLocal = None
+
+
+def legacy_debit(db, subscription_id: int, parts: int) -> bool:
+    subscription = db.query(UserSubscription).filter(UserSubscription.id == subscription_id).first()
+    if subscription.remaining_sms < parts:
+        return False
+    subscription.used_sms = (subscription.used_sms or 0) + parts
+    db.add(subscription)
+    db.commit()
+    return True
+
+
+def reserve_debit(db, subscription_id: int, parts: int) -> bool:
+    ok = credit_service.reserve(db, subscription_id, parts) is not None
+    db.commit()
+    return ok
+
+
+def run(debit, subscription_id: int, budget: int, threads: int, attempts: int, parts: int) -> dict:
+    """Give the subscription exactly `budget` credits, then hammer it from `threads` threads."""
+    with SessionLocal() as db:
+        total = db.execute(select(UserSubscription.total_sms).where(UserSubscription.id == subscription_id)).scalar()
+        db.execute(update(UserSubscription).where(UserSubscription.id == subscription_id).values(used_sms=total - budget))
+        db.commit()
+
+    spent = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker():
+        mine = 0
+        with SessionLocal() as db:
+            start_barrier.wait()
+            for _ in range(attempts):
+                if debit(db, subscription_id, parts):
+                    mine += parts
+        with lock:
+            spent.append(mine)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        remaining = credit_service.balance(db, subscription_id)
+
+    claimed = sum(spent)
+    recorded = budget - remaining
+    return {
+        "debits_per_s": threads * attempts / elapsed,
+        "claimed": claimed,
+        "recorded": recorded,
+        "lost_updates": claimed - recorded,
+        "overspent": claimed > budget or remaining < 0,
+    }
+
+
+def create_scratch_subscription(total_sms: int) -> tuple:
+    """A user and an active subscription that exist only for this run; returns (user id, subscription id)."""
+    tag = f"credit-bench-{uuid.uuid4().hex[:12]}"
+    with SessionLocal() as db:
+        user_id = db.execute(
+            insert(User)
+            .values(
+                uuid=uuid.uuid4(),
+                email=f"{tag}@example.invalid",
+                username=tag,
+                password_hash="!",
+                first_name="Credit",
+                last_name="Benchmark",
+            )
+            .returning(User.id)
+        ).scalar()
+        subscription_id = db.execute(
+            insert(UserSubscription)
+            .values(uuid=uuid.uuid4(), user_id=user_id, total_sms=total_sms, used_sms=0)
+            .returning(UserSubscription.id)
+        ).scalar()
+        db.commit()
+    return user_id, subscription_id
+
+
+def drop_scratch_user(user_id: int) -> None:
+    # The subscription goes with the user (ON DELETE CASCADE)
+    with SessionLocal() as db:
+        db.execute(delete(User).where(User.id == user_id))
+        db.commit()
+
+
+def main():
+    global SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="SQLAlchemy URL of a throwaway database")
+    parser.add_argument("--budget", type=int, default=1000, help="credits available during each run")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--attempts", type=int, default=100, help="debits attempted per thread")
+    parser.add_argument("--parts", type=int, default=1, help="credits per debit")
+    args = parser.parse_args()
+
+    if args.dsn == DATABASE_URL:
+        raise SystemExit("--dsn is the application database; use a throwaway one")
+    engine = create_engine(args.dsn, future=True, pool_size=args.threads, max_overflow=0)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # Each run sets used_sms so that exactly `budget` credits are left
+    user_id, subscription_id = create_scratch_subscription(args.budget * 10)
+    print(f"{args.threads} threads x {args.attempts} debits of {args.parts} credit(s), budget {args.budget}")
+    try:
+        for name, debit in (("read-modify-write", legacy_debit), ("credit_service.reserve", reserve_debit)):
+            result = run(debit, subscription_id, args.budget, args.threads, args.attempts, args.parts)
+            print(
+                f"{name:>24}: {result['debits_per_s']:8.0f} debits/s  claimed {result['claimed']:>6}  "
+                f"recorded {result['recorded']:>6}  lost {result['lost_updates']:>5}  "
+                f"overspent {'YES' if result['overspent'] else 'no'}"
+            )
+    finally:
+        drop_scratch_user(user_id)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# backend/app/benchmarks/dlr_ingest_benchmark.py
+"""
+Load test: sustained delivery reports (DLRs) per second, before and after
+buffering them through the Redis stream.
+
+- direct (before): the per-report /sms/webhook path as it was before the
+  stream, one transaction per report on the async engine with
+  `--concurrency` reports in flight: a user lookup by uuid (no cache), a
+  single-row sms_callbacks insert with the raw payload, the sent_messages
+  update and the daily stats upsert.
+- buffered (after): `--concurrency` producers append the reports to a
+  scratch stream as the webhook does, while `--flushers` flusher threads
+  write them in batches. Reports the rate at which the webhook side accepts
+  them and the end-to-end rate until the last one is in Postgres.
+
+Runs against the configured database and Redis (core.config). The reports
+use message ids prefixed with "dlr-bench-", which are deleted afterwards
+together with the scratch stream. With --user-uuid the reports are
+attributed to that user, so its user_daily_stats callback counters for
+today grow; rebuild them with /cron/daily-stats/backfill. Run from
+backend/app:
+
+    python -m benchmarks.dlr_ingest_benchmark --reports 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from api.deps import AsyncSessionLocal, SessionLocal, async_engine
+from core.config import SMS_DELIVERY_REPORT_WINDOW_DAYS
+from core.worker_config import redis_conn
+from models.sent_messages import SentMessage
+from models.sms_callback import SmsCallback
+from models.user import User
+from services import callback_ingest_service, stats_service
+from utils.timezone import now_eat
+
+STREAM = "sms:dlr:benchmark"
+STATUSES = ("delivered", "delivered", "delivered", "accepted", "undeliverable", "expired")
+
+
+def make_reports(count: int, user_uuid) -> list:
+    received_at = now_eat()
+    return [
+        callback_ingest_service.parse_report(
+            {
+                "message_id": f"dlr-bench-{i}",
+                "PhoneNumber": f"2557{i % 100000000:08d}",
+                "DLRStatus": STATUSES[i % len(STATUSES)],
+                "uid": f"dlr-bench-uid-{i}",
+                "Remarks": "benchmark",
+                "SenderId": "SEWMR",
+            },
+            user_uuid,
+            received_at,
+        )
+        for i in range(count)
+    ]
+
+
+async def write_report_per_request(db, report: dict) -> None:
+    """The statements the webhook issued for one report before the stream existed."""
+    user_id = None
+    if report["user_uuid"]:
+        user_id = (await db.execute(select(User.id).where(User.uuid == report["user_uuid"]))).scalar()
+    received_at = report["received_at"]
+    await db.execute(insert(SmsCallback).values(
+        message_id=report["message_id"],
+        phone=report["phone"],
+        status=report["status"],
+        uid=report["uid"],
+        remarks=report["remarks"],
+        sender_alias=report["sender_alias"],
+        payload=report["payload"],
+        user_id=user_id,
+        received_at=received_at,
+    ))
+    sent_update = (
+        update(SentMessage)
+        .where(
+            SentMessage.message_id == report["message_id"],
+            SentMessage.sent_at >= received_at - timedelta(days=SMS_DELIVERY_REPORT_WINDOW_DAYS),
+        )
+        .values(delivery_status=report["status"], delivered_at=received_at)
+    )
+    if user_id:
+        sent_update = sent_update.where(SentMessage.user_id == user_id)
+        await db.run_sync(stats_service.record_callback, user_id, report["status"], received_at.date())
+    await db.execute(sent_update)
+    await db.commit()
+
+
+async def run_direct(reports: list, concurrency: int) -> float:
+    pending = iter(reports)
+
+    async def writer():
+        for report in pending:
+            async with AsyncSessionLocal() as db:
+                await write_report_per_request(db, report)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return len(reports) / elapsed
+
+
+def run_buffered(reports: list, concurrency: int, flushers: int, batch_size: int, interval_ms: int, timeout: float):
+    redis_conn.delete(STREAM)
+    stop = threading.Event()
+    flusher_threads = [
+        threading.Thread(
+            target=callback_ingest_service.run_flusher,
+            args=(stop, redis_conn, STREAM, batch_size, interval_ms),
+        )
+        for _ in range(flushers)
+    ]
+    for t in flusher_threads:
+        t.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda report: callback_ingest_service.enqueue(report, stream=STREAM), reports))
+    accepted = time.perf_counter() - started
+
+    # Flushers delete entries once written, so an empty stream means everything is in Postgres
+    deadline = started + timeout
+    while redis_conn.xlen(STREAM) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    drained = not redis_conn.xlen(STREAM)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    for t in flusher_threads:
+        t.join()
+    redis_conn.delete(STREAM)
+    return len(reports) / accepted, len(reports) / elapsed, drained
+
+
+def cleanup():
+    with SessionLocal() as db:
+        db.execute(delete(SmsCallback).where(SmsCallback.message_id.like("dlr-bench-%")))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50, help="reports in flight at the webhook side")
+    parser.add_argument("--flushers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=500, help="max reports per flush")
+    parser.add_argument("--interval-ms", type=int, default=200, help="max wait before a flush")
+    parser.add_argument("--user-uuid", help="attribute the reports to this user (exercises the user lookup)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the flushers to drain")
+    args = parser.parse_args()
+
+    reports = make_reports(args.reports, args.user_uuid)
+    print(f"{args.reports} delivery reports, concurrency {args.concurrency}")
+    try:
+        direct = asyncio.run(run_direct(reports, args.concurrency))
+        print(f"{'before':>8} (direct):   {direct:8.0f} DLRs/s written")
+        cleanup()
+
+        accept_rate, write_rate, drained = run_buffered(
+            reports, args.concurrency, args.flushers, args.batch_size, args.interval_ms, args.timeout
+        )
+        print(
+            f"{'after':>8} (buffered): {accept_rate:8.0f} DLRs/s accepted  {write_rate:8.0f} DLRs/s written "
+            f"({args.flushers} flusher(s), batches of {args.batch_size} / {args.interval_ms} ms)"
+            + ("" if drained else "  TIMED OUT before the stream drained")
+        )
+        print(f"{'speedup':>8}:            {write_rate / direct:8.1f}x written, {accept_rate / direct:.1f}x accepted")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
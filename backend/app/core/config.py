@@ -19,6 +19,19 @@ API_PASSWORD = os.getenv("API_PASSWORD")
 SMS_CALLBACK_URL = os.getenv("SMS_CALLBACK_URL")
 JWT_SECRET = os.getenv("JWT_SECRET")
 DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?ssl=require"
+# Engine profile: server (uvicorn), worker (RQ / async SMS worker) or serverless (Vercel, NullPool)
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "serverless" if os.getenv("VERCEL") else "server").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Worker pools hold at least two connections per SMS_WORKER_CONCURRENCY job (see db/pool.py)
+DB_WORKER_POOL_SIZE = int(os.getenv("DB_WORKER_POOL_SIZE", "2"))
+DB_WORKER_MAX_OVERFLOW = int(os.getenv("DB_WORKER_MAX_OVERFLOW", "2"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", "100"))
+# Connecting through PgBouncer in transaction mode (disables asyncpg statement caching)
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
 UPLOAD_SERVICE_URL = "https://data.sewmrtechnologies.com/handle-file-uploads"
 MAX_FILE_SIZE = 0.5 * 1024 * 1024  # 0.5 MB
 MAX_COOKIE_AGE = 60 * 60 * 24
@@ -37,4 +50,85 @@ else:
     COOKIE_DOMAIN = None 
 UPSTASH_REDIS_REST_URL = os.getenv("UPSTASH_REDIS_REST_URL")
 UPSTASH_REDIS_REST_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
-REDIS_URL = os.getenv("REDIS_URL")
\ No newline at end of file
+REDIS_URL = os.getenv("REDIS_URL")
+# Outbound SMS gateway HTTP client (shared, pooled)
+SMS_HTTP_MAX_CONNECTIONS = int(os.getenv("SMS_HTTP_MAX_CONNECTIONS", "100"))
+SMS_HTTP_MAX_KEEPALIVE = int(os.getenv("SMS_HTTP_MAX_KEEPALIVE", "20"))
+SMS_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SMS_HTTP_KEEPALIVE_EXPIRY", "30"))
+SMS_HTTP_TIMEOUT = float(os.getenv("SMS_HTTP_TIMEOUT", "10"))
+SMS_HTTP2_ENABLED = os.getenv("SMS_HTTP2_ENABLED", "false").lower() == "true"
+# Max in-flight gateway requests per immediate send request
+SMS_DISPATCH_CONCURRENCY = int(os.getenv("SMS_DISPATCH_CONCURRENCY", "20"))
+# Multi-recipient gateway submissions for identical message bodies (off until the
+# gateway's multi-recipient response format is confirmed)
+SMS_BULK_SEND_ENABLED = os.getenv("SMS_BULK_SEND_ENABLED", "false").lower() == "true"
+SMS_BULK_CHUNK_SIZE = int(os.getenv("SMS_BULK_CHUNK_SIZE", "100"))
+# SMS worker: "rq" (one job at a time, in-process), "async" (one event loop, batched concurrent jobs)
+# or "dlr" (delivery report flusher, see SMS_DLR_BUFFERED)
+SMS_WORKER_MODE = os.getenv("SMS_WORKER_MODE", "rq").lower()
+SMS_WORKER_BATCH_SIZE = int(os.getenv("SMS_WORKER_BATCH_SIZE", "50"))
+SMS_WORKER_CONCURRENCY = int(os.getenv("SMS_WORKER_CONCURRENCY", "20"))
+SMS_WORKER_POLL_INTERVAL = float(os.getenv("SMS_WORKER_POLL_INTERVAL", "1"))
+# Recipients processed per worker job for campaigns
+SMS_CAMPAIGN_CHUNK_SIZE = int(os.getenv("SMS_CAMPAIGN_CHUNK_SIZE", "500"))
+# A claimed chunk not recorded within this many seconds (well above the 900 s chunk job
+# timeout) is refunded by POST /cron/campaigns/reap
+SMS_CAMPAIGN_CHUNK_LEASE_SECONDS = int(os.getenv("SMS_CAMPAIGN_CHUNK_LEASE_SECONDS", "1800"))
+# Gateway throughput limits (messages/second, 0 disables); enforced via Redis token buckets
+SMS_GATEWAY_RATE_LIMIT = float(os.getenv("SMS_GATEWAY_RATE_LIMIT", "0"))
+SMS_GATEWAY_RATE_BURST = int(os.getenv("SMS_GATEWAY_RATE_BURST", "0"))
+SMS_SENDER_RATE_LIMIT = float(os.getenv("SMS_SENDER_RATE_LIMIT", "0"))
+SMS_SENDER_RATE_BURST = int(os.getenv("SMS_SENDER_RATE_BURST", "0"))
+# Failed sms_jobs retry after SMS_RETRY_BASE_DELAY * 2^(retries-1) seconds (with jitter), capped
+SMS_RETRY_BASE_DELAY = float(os.getenv("SMS_RETRY_BASE_DELAY", "10"))
+SMS_RETRY_MAX_DELAY = float(os.getenv("SMS_RETRY_MAX_DELAY", "900"))
+# Gateway circuit breaker: open for SMS_CIRCUIT_OPEN_SECONDS once the failure rate in a window
+# reaches SMS_CIRCUIT_FAILURE_RATE over at least SMS_CIRCUIT_MIN_REQUESTS calls (0 rate disables)
+SMS_CIRCUIT_FAILURE_RATE = float(os.getenv("SMS_CIRCUIT_FAILURE_RATE", "0.5"))
+SMS_CIRCUIT_MIN_REQUESTS = int(os.getenv("SMS_CIRCUIT_MIN_REQUESTS", "20"))
+SMS_CIRCUIT_WINDOW_SECONDS = int(os.getenv("SMS_CIRCUIT_WINDOW_SECONDS", "60"))
+SMS_CIRCUIT_OPEN_SECONDS = float(os.getenv("SMS_CIRCUIT_OPEN_SECONDS", "30"))
+# Scheduled recipients written per multi-row INSERT (and transaction) when creating a schedule
+SMS_SCHEDULE_INSERT_CHUNK_SIZE = int(os.getenv("SMS_SCHEDULE_INSERT_CHUNK_SIZE", "1000"))
+# Scheduled sends: workers enqueued per cron run, each claiming batches of due messages
+SMS_SCHEDULE_WORKERS = int(os.getenv("SMS_SCHEDULE_WORKERS", "4"))
+SMS_SCHEDULE_CLAIM_BATCH_SIZE = int(os.getenv("SMS_SCHEDULE_CLAIM_BATCH_SIZE", "200"))
+# Monthly partitions of sent_messages / sms_callbacks: created this many months ahead, and
+# partitions older than the retention (0 keeps everything) are detached or dropped
+SMS_PARTITION_MONTHS_AHEAD = int(os.getenv("SMS_PARTITION_MONTHS_AHEAD", "3"))
+SMS_PARTITION_RETENTION_MONTHS = int(os.getenv("SMS_PARTITION_RETENTION_MONTHS", "0"))
+SMS_PARTITION_RETENTION_ACTION = os.getenv("SMS_PARTITION_RETENTION_ACTION", "detach").lower()
+# Delivery reports only look for the sent message this far back, so they touch recent partitions
+SMS_DELIVERY_REPORT_WINDOW_DAYS = int(os.getenv("SMS_DELIVERY_REPORT_WINDOW_DAYS", "7"))
+# Delivery reports: with SMS_DLR_BUFFERED the webhook only appends them to a Redis stream and
+# `python -m utils.worker --dlr` writes them in batches of up to SMS_DLR_BATCH_SIZE reports, at
+# least every SMS_DLR_FLUSH_INTERVAL_MS; batches left unacknowledged this long are retried
+SMS_DLR_BUFFERED = os.getenv("SMS_DLR_BUFFERED", "false").lower() == "true"
+SMS_DLR_STREAM = os.getenv("SMS_DLR_STREAM", "sms:dlr")
+SMS_DLR_BATCH_SIZE = int(os.getenv("SMS_DLR_BATCH_SIZE", "500"))
+SMS_DLR_FLUSH_INTERVAL_MS = int(os.getenv("SMS_DLR_FLUSH_INTERVAL_MS", "200"))
+SMS_DLR_RETRY_IDLE_MS = int(os.getenv("SMS_DLR_RETRY_IDLE_MS", "60000"))
+# A report delivered to flushers this many times without being stored is moved to the dead-letter
+# stream (XRANGE it to inspect, re-add it to SMS_DLR_STREAM to replay); 0 retries forever
+SMS_DLR_MAX_DELIVERIES = int(os.getenv("SMS_DLR_MAX_DELIVERIES", "5"))
+SMS_DLR_DEAD_LETTER_STREAM = os.getenv("SMS_DLR_DEAD_LETTER_STREAM", "sms:dlr:dead")
+# User uuid -> id cache of delivery report ingestion: USER_CACHE_SIZE entries kept USER_CACHE_TTL
+# seconds in each process; with USER_CACHE_REDIS also shared through Redis for USER_CACHE_REDIS_TTL.
+# Invalidations reach every process through Redis either way
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_REDIS = os.getenv("USER_CACHE_REDIS", "false").lower() == "true"
+USER_CACHE_REDIS_TTL = int(os.getenv("USER_CACHE_REDIS_TTL", "3600"))
+# sms_callbacks.payload: "full" keeps the gateway's raw JSON, "compact" only the keys not already
+# stored in their own columns; existing rows are compacted this many ids per statement, by a
+# worker job allowed SMS_CALLBACK_COMPACT_TIMEOUT seconds
+SMS_CALLBACK_PAYLOAD_MODE = os.getenv("SMS_CALLBACK_PAYLOAD_MODE", "full").lower()
+SMS_CALLBACK_COMPACT_BATCH_SIZE = int(os.getenv("SMS_CALLBACK_COMPACT_BATCH_SIZE", "10000"))
+SMS_CALLBACK_COMPACT_TIMEOUT = int(os.getenv("SMS_CALLBACK_COMPACT_TIMEOUT", "21600"))
+# /cron/daily-stats/backfill rebuilds the rollup in a worker job allowed this many seconds
+SMS_STATS_BACKFILL_TIMEOUT = int(os.getenv("SMS_STATS_BACKFILL_TIMEOUT", "21600"))
+# Repeated delivery reports (same message_id, status and phone) within this many seconds are
+# dropped before they reach Postgres (0 disables)
+SMS_DLR_DEDUP_TTL = int(os.getenv("SMS_DLR_DEDUP_TTL", "86400"))
+# Live delivery/campaign event stream (GET /sms/events): comment sent when idle this long
+SMS_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("SMS_EVENTS_KEEPALIVE_SECONDS", "15"))
@@ -2,6 +2,7 @@
 
 import os
 import redis
+import redis.asyncio
 
 from core.config import REDIS_URL, UPSTASH_REDIS_REST_URL, UPSTASH_REDIS_REST_TOKEN
 
@@ -9,3 +10,8 @@ from core.config import REDIS_URL, UPSTASH_REDIS_REST_URL, UPSTASH_REDIS_REST_TO
 redis_conn = redis.from_url(
     REDIS_URL
 )
+
+# Async client for handlers that wait on Redis (e.g. pub/sub of the live event stream)
+async_redis_conn = redis.asyncio.from_url(
+    REDIS_URL
+)
@@ -0,0 +1,3 @@
+-- Retry state for sms_jobs: failed sends are retried with exponential backoff
+ALTER TABLE sms_jobs ADD COLUMN IF NOT EXISTS next_retry_at TIMESTAMP NULL;
+ALTER TABLE sms_jobs ADD COLUMN IF NOT EXISTS last_error_at TIMESTAMP NULL;
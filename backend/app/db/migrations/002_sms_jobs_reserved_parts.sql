@@ -0,0 +1,2 @@
+-- Credits reserved for a queued sms_job; spent when it is sent, refunded when it finally fails
+ALTER TABLE sms_jobs ADD COLUMN IF NOT EXISTS reserved_parts INT NOT NULL DEFAULT 0;
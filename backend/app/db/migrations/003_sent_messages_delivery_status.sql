@@ -0,0 +1,20 @@
+-- Latest delivery report per sent message, kept on sent_messages by /sms/webhook
+ALTER TABLE sent_messages ADD COLUMN IF NOT EXISTS delivery_status sms_delivery_status_enum NULL;
+ALTER TABLE sent_messages ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMP NULL;
+
+CREATE INDEX IF NOT EXISTS idx_sent_messages_message_id ON sent_messages(message_id);
+
+-- Backfill from the latest callback of each message of the same user
+-- (a message id alone may match another user's message)
+UPDATE sent_messages s
+SET delivery_status = c.status::text::sms_delivery_status_enum,
+    delivered_at = c.received_at
+FROM (
+    SELECT DISTINCT ON (message_id, user_id) message_id, user_id, status, received_at
+    FROM sms_callbacks
+    WHERE user_id IS NOT NULL
+    ORDER BY message_id, user_id, received_at DESC
+) c
+WHERE s.message_id = c.message_id
+  AND s.user_id = c.user_id
+  AND s.delivery_status IS NULL;
@@ -0,0 +1,17 @@
+-- Composite indexes for the hot read paths. CONCURRENTLY keeps the tables writable
+-- while they build, so run each statement on its own (outside a transaction block).
+
+-- /sms/history keyset pages and dashboard windows: WHERE user_id = ? ORDER BY sent_at DESC, id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sent_messages_user_id_sent_at ON sent_messages(user_id, sent_at, id);
+
+-- Latest callback of a user's message: WHERE user_id = ? AND message_id = ? ORDER BY received_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sms_callbacks_user_id_message_id ON sms_callbacks(user_id, message_id, received_at);
+
+-- Group listings and duplicate checks on contact import
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_user_id_group_id_phone ON contacts(user_id, group_id, phone);
+
+-- Claiming due messages and per-schedule status counts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scheduled_messages_schedule_id_status ON scheduled_messages(schedule_id, status);
+
+-- Due schedule lookups: WHERE status IN (...) AND scheduled_for <= now
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sms_schedules_status_scheduled_for ON sms_schedules(status, scheduled_for);
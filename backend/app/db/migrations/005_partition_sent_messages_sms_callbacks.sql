@@ -0,0 +1,119 @@
+-- Monthly range partitioning of sent_messages (by sent_at) and sms_callbacks (by received_at).
+-- Run in one transaction. The old tables are kept as *_legacy; drop them once the copy is verified.
+-- Partition keys have to be part of every unique constraint, so the primary keys become
+-- (id, sent_at) / (id, received_at) and uuid / uid are indexed but no longer unique.
+
+-- Creates <parent>_yYYYYmMM covering the calendar month of `month`; used by partition_service too
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    partition_name TEXT := parent || '_' || to_char(start_date, '"y"YYYY"m"MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, start_date, (start_date + INTERVAL '1 month')::date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- sent_messages
+ALTER TABLE sent_messages RENAME TO sent_messages_legacy;
+ALTER TABLE sent_messages_legacy RENAME CONSTRAINT sent_messages_pkey TO sent_messages_legacy_pkey;
+ALTER TABLE sent_messages_legacy RENAME CONSTRAINT sent_messages_uuid_key TO sent_messages_legacy_uuid_key;
+ALTER INDEX IF EXISTS idx_sent_messages_message_id RENAME TO idx_sent_messages_legacy_message_id;
+ALTER INDEX IF EXISTS idx_sent_messages_user_id_sent_at RENAME TO idx_sent_messages_legacy_user_id_sent_at;
+
+CREATE TABLE sent_messages (
+  id INT NOT NULL DEFAULT nextval('sent_messages_id_seq'),
+  uuid UUID NOT NULL DEFAULT uuid_generate_v4(),
+  sender_alias VARCHAR(11) NOT NULL,
+  user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  phone_number VARCHAR(15) NOT NULL,
+  message TEXT NOT NULL,
+  message_id VARCHAR(100),
+  remarks TEXT,
+  number_of_parts INT NOT NULL DEFAULT 1,
+  sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  delivery_status sms_delivery_status_enum NULL,
+  delivered_at TIMESTAMP NULL,
+  PRIMARY KEY (id, sent_at)
+) PARTITION BY RANGE (sent_at);
+ALTER SEQUENCE sent_messages_id_seq OWNED BY sent_messages.id;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT min(sent_at) FROM sent_messages_legacy), now())),
+            date_trunc('month', now()) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM create_monthly_partition('sent_messages', month);
+    END LOOP;
+END $$;
+
+INSERT INTO sent_messages (
+  id, uuid, sender_alias, user_id, phone_number, message, message_id, remarks,
+  number_of_parts, sent_at, delivery_status, delivered_at
+)
+SELECT
+  id, uuid, sender_alias, user_id, phone_number, message, message_id, remarks,
+  number_of_parts, sent_at, delivery_status, delivered_at
+FROM sent_messages_legacy;
+
+CREATE INDEX idx_sent_messages_uuid ON sent_messages(uuid);
+CREATE INDEX idx_sent_messages_message_id ON sent_messages(message_id);
+CREATE INDEX idx_sent_messages_user_id_sent_at ON sent_messages(user_id, sent_at, id);
+
+-- sms_callbacks
+ALTER TABLE sms_callbacks RENAME TO sms_callbacks_legacy;
+ALTER TABLE sms_callbacks_legacy RENAME CONSTRAINT sms_callbacks_pkey TO sms_callbacks_legacy_pkey;
+ALTER TABLE sms_callbacks_legacy RENAME CONSTRAINT sms_callbacks_uuid_key TO sms_callbacks_legacy_uuid_key;
+ALTER INDEX IF EXISTS idx_sms_callbacks_user_id_message_id RENAME TO idx_sms_callbacks_legacy_user_id_message_id;
+
+CREATE TABLE sms_callbacks (
+  id INT NOT NULL DEFAULT nextval('sms_callbacks_id_seq'),
+  uuid UUID NOT NULL DEFAULT uuid_generate_v4(),
+  message_id TEXT NOT NULL,
+  phone VARCHAR(15) NOT NULL,
+  status sms_delivery_status_enum NOT NULL DEFAULT 'pending',
+  uid TEXT,
+  remarks TEXT,
+  payload JSONB,
+  received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  sender_alias TEXT,
+  user_uuid VARCHAR(36),
+  user_id INT REFERENCES users(id) ON DELETE SET NULL,
+  PRIMARY KEY (id, received_at)
+) PARTITION BY RANGE (received_at);
+ALTER SEQUENCE sms_callbacks_id_seq OWNED BY sms_callbacks.id;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT min(received_at) FROM sms_callbacks_legacy), now())),
+            date_trunc('month', now()) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM create_monthly_partition('sms_callbacks', month);
+    END LOOP;
+END $$;
+
+INSERT INTO sms_callbacks (
+  id, uuid, message_id, phone, status, uid, remarks, payload, received_at, sender_alias, user_uuid, user_id
+)
+SELECT
+  id, uuid, message_id, phone, status, uid, remarks, payload, received_at, sender_alias, user_uuid, user_id
+FROM sms_callbacks_legacy;
+
+CREATE INDEX idx_sms_callbacks_uuid ON sms_callbacks(uuid);
+CREATE INDEX idx_sms_callbacks_uid ON sms_callbacks(uid);
+CREATE INDEX idx_sms_callbacks_user_id_message_id ON sms_callbacks(user_id, message_id, received_at);
@@ -0,0 +1,12 @@
+-- Per-user daily rollup of sent messages and delivery reports, maintained incrementally;
+-- fill it from existing data with POST /cron/daily-stats/backfill
+CREATE TABLE IF NOT EXISTS user_daily_stats (
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    messages INT NOT NULL DEFAULT 0,
+    parts INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    callbacks INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
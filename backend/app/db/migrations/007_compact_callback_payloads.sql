@@ -0,0 +1,21 @@
+-- Compact sms_callbacks.payload: the gateway keys whose values are already stored verbatim in
+-- their own columns are dropped (an empty payload becomes NULL). New reports are stored this way
+-- with SMS_CALLBACK_PAYLOAD_MODE=compact; existing rows are rewritten in batches by
+-- POST /cron/callback-payloads/compact, which reports the sizes before and after.
+-- Same rules as services/callback_payload_service.extra_payload.
+CREATE OR REPLACE FUNCTION sms_callback_extra_payload(
+    payload JSONB, message_id TEXT, phone TEXT, status TEXT, uid TEXT, remarks TEXT, sender_alias TEXT
+) RETURNS JSONB AS $$
+    SELECT CASE WHEN jsonb_typeof(payload) IS DISTINCT FROM 'object' THEN payload ELSE NULLIF(
+        payload - array_remove(ARRAY[
+            CASE WHEN jsonb_typeof(payload -> 'message_id') = 'string' AND payload ->> 'message_id' = message_id THEN 'message_id' END,
+            CASE WHEN jsonb_typeof(payload -> 'PhoneNumber') = 'string' AND payload ->> 'PhoneNumber' = phone THEN 'PhoneNumber' END,
+            CASE WHEN jsonb_typeof(payload -> 'phone') = 'string' AND payload ->> 'phone' = phone THEN 'phone' END,
+            CASE WHEN jsonb_typeof(payload -> 'DLRStatus') = 'string' AND lower(payload ->> 'DLRStatus') = status THEN 'DLRStatus' END,
+            CASE WHEN jsonb_typeof(payload -> 'uid') = 'string' AND payload ->> 'uid' = uid THEN 'uid' END,
+            CASE WHEN jsonb_typeof(payload -> 'Remarks') = 'string' AND payload ->> 'Remarks' = remarks THEN 'Remarks' END,
+            CASE WHEN jsonb_typeof(payload -> 'SenderId') = 'string' AND payload ->> 'SenderId' = sender_alias THEN 'SenderId' END
+        ], NULL),
+        '{}'::jsonb
+    ) END
+$$ LANGUAGE sql IMMUTABLE;
@@ -0,0 +1,38 @@
+-- SMS campaigns: recipients stored on the campaign row and sent by workers in chunks;
+-- claimed_chunks holds the offsets of the chunks a worker has taken, so a retried
+-- or duplicated chunk job is not sent twice
+DO $$
+BEGIN
+    CREATE TYPE campaign_status_enum AS ENUM ('pending', 'processing', 'completed', 'partial', 'failed');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE TABLE IF NOT EXISTS sms_campaigns (
+    id SERIAL PRIMARY KEY,
+    uuid UUID NOT NULL DEFAULT uuid_generate_v4() UNIQUE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    sender_id INT NOT NULL REFERENCES sender_ids(id) ON DELETE CASCADE,
+    subscription_id INT REFERENCES user_subscriptions(id) ON DELETE SET NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    phone_numbers VARCHAR(15)[] NOT NULL,
+    parts_per_message INT NOT NULL DEFAULT 1,
+    chunk_size INT NOT NULL DEFAULT 500,
+    status campaign_status_enum NOT NULL DEFAULT 'pending',
+    total_recipients INT NOT NULL DEFAULT 0,
+    processed_count INT NOT NULL DEFAULT 0,
+    sent_count INT NOT NULL DEFAULT 0,
+    failed_count INT NOT NULL DEFAULT 0,
+    parts_reserved INT NOT NULL DEFAULT 0,
+    claimed_chunks INT[] NOT NULL DEFAULT '{}',
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- Databases created from an earlier schema.sql already have the table
+ALTER TABLE sms_campaigns ADD COLUMN IF NOT EXISTS claimed_chunks INT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_sms_campaigns_user_id ON sms_campaigns(user_id);
@@ -0,0 +1,3 @@
+-- Schedules are created as drafts (skipped by the scheduled-send claimers) and only
+-- become pending once all their messages are stored; run outside a transaction block
+ALTER TYPE schedule_status_enum ADD VALUE IF NOT EXISTS 'draft';
@@ -0,0 +1,54 @@
+-- DEFAULT partitions of sent_messages and sms_callbacks, so an insert for a month whose
+-- partition was not created in time (missed /cron/partitions/maintain) still succeeds.
+-- create_monthly_partition() now moves such rows out of the default partition when the
+-- month's partition is created later.
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    end_date DATE := (start_date + INTERVAL '1 month')::date;
+    partition_name TEXT := parent || '_' || to_char(start_date, '"y"YYYY"m"MM');
+    default_name TEXT := parent || '_default';
+    key_column TEXT;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    IF to_regclass(default_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, parent, start_date, end_date
+        );
+        RETURN partition_name;
+    END IF;
+
+    -- Block inserts routed to the default partition until the transaction ends, so none land
+    -- there between the move and the attach; a concurrent caller waits here and then finds
+    -- the partition already created
+    EXECUTE format('LOCK TABLE %I IN SHARE ROW EXCLUSIVE MODE', default_name);
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Rows of this month that already landed in the default partition move into the new one;
+    -- attaching fails while the default partition still holds rows of the range
+    SELECT a.attname INTO key_column
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = parent::regclass;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+        default_name, key_column, start_date, key_column, end_date, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, start_date, end_date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TABLE IF NOT EXISTS sent_messages_default PARTITION OF sent_messages DEFAULT;
+CREATE TABLE IF NOT EXISTS sms_callbacks_default PARTITION OF sms_callbacks DEFAULT;
@@ -0,0 +1,19 @@
+-- sms_callbacks.status holds the gateway's DLRStatus lower-cased, so dropping DLRStatus from
+-- the payload on a case-insensitive match lost the gateway's spelling. Only an exact match is
+-- dropped now; payloads already compacted by the old function keep their lower-cased status only.
+CREATE OR REPLACE FUNCTION sms_callback_extra_payload(
+    payload JSONB, message_id TEXT, phone TEXT, status TEXT, uid TEXT, remarks TEXT, sender_alias TEXT
+) RETURNS JSONB AS $$
+    SELECT CASE WHEN jsonb_typeof(payload) IS DISTINCT FROM 'object' THEN payload ELSE NULLIF(
+        payload - array_remove(ARRAY[
+            CASE WHEN jsonb_typeof(payload -> 'message_id') = 'string' AND payload ->> 'message_id' = message_id THEN 'message_id' END,
+            CASE WHEN jsonb_typeof(payload -> 'PhoneNumber') = 'string' AND payload ->> 'PhoneNumber' = phone THEN 'PhoneNumber' END,
+            CASE WHEN jsonb_typeof(payload -> 'phone') = 'string' AND payload ->> 'phone' = phone THEN 'phone' END,
+            CASE WHEN jsonb_typeof(payload -> 'DLRStatus') = 'string' AND payload ->> 'DLRStatus' = status THEN 'DLRStatus' END,
+            CASE WHEN jsonb_typeof(payload -> 'uid') = 'string' AND payload ->> 'uid' = uid THEN 'uid' END,
+            CASE WHEN jsonb_typeof(payload -> 'Remarks') = 'string' AND payload ->> 'Remarks' = remarks THEN 'Remarks' END,
+            CASE WHEN jsonb_typeof(payload -> 'SenderId') = 'string' AND payload ->> 'SenderId' = sender_alias THEN 'SenderId' END
+        ], NULL),
+        '{}'::jsonb
+    ) END
+$$ LANGUAGE sql IMMUTABLE;
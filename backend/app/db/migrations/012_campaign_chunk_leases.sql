@@ -0,0 +1,5 @@
+-- Leases on campaign chunks being sent. A chunk whose worker died or timed out before
+-- recording it kept its credits reserved and left the campaign processing forever;
+-- POST /cron/campaigns/reap now refunds chunks whose lease expired
+-- (SMS_CAMPAIGN_CHUNK_LEASE_SECONDS) and completes their campaign.
+ALTER TABLE sms_campaigns ADD COLUMN IF NOT EXISTS chunk_leases JSONB NOT NULL DEFAULT '{}';
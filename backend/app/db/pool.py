@@ -0,0 +1,179 @@
+# backend/app/db/pool.py
+"""
+Engine profiles and connection-pool instrumentation.
+
+Profiles (DB_ENGINE_PROFILE):
+- server: sized QueuePool with pre-ping and recycle, for uvicorn hosts
+- worker: the same, sized for SMS_WORKER_CONCURRENCY jobs, for RQ / async SMS workers
+- serverless: NullPool, one short-lived connection per checkout (Vercel);
+  pair with PgBouncer in transaction mode (DB_PGBOUNCER=true)
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from core.config import (
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_SLOW_CHECKOUT_MS,
+    DB_POOL_TIMEOUT,
+    DB_WORKER_MAX_OVERFLOW,
+    DB_WORKER_POOL_SIZE,
+    SMS_WORKER_CONCURRENCY,
+)
+
+PROFILES = ("server", "worker", "serverless")
+
+# Connections one worker job can hold at once: a scheduled batch keeps its claim
+# (FOR UPDATE SKIP LOCKED) open while it reserves credits in a second session
+CONNECTIONS_PER_WORKER_JOB = 2
+
+
+class PoolMetrics:
+    """Checkout wait times and timeouts for one pool, in this process."""
+
+    def __init__(self, name: str, profile: str):
+        self.name = name
+        self.profile = profile
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent = deque(maxlen=1000)
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += wait
+                self._recent.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+            if wait * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, timeouts, slow = self.checkouts, self.timeouts, self.slow_checkouts
+            total_wait, max_wait = self.total_wait, self.max_wait
+
+        data = {
+            "name": self.name,
+            "profile": self.profile,
+            "pool_class": type(pool).__name__,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "slow_checkouts": slow,
+            "avg_wait_ms": round(total_wait / checkouts * 1000, 3) if checkouts else 0.0,
+            "p95_wait_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 3) if recent else 0.0,
+            "max_wait_ms": round(max_wait * 1000, 3),
+        }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(0, pool._max_overflow)
+            in_use = pool.checkedout()
+            data.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": in_use,
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                # 1.0 means every connection is in use and new checkouts wait
+                "saturation": round(in_use / capacity, 3) if capacity else None,
+            })
+        return data
+
+
+class _InstrumentedPoolMixin:
+    """Times every connection checkout (queue wait plus any new connect)."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    pass
+
+
+def engine_options(profile: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments for a profile."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE '{profile}', expected one of {PROFILES}")
+
+    options = {}
+    if profile == "serverless":
+        options["poolclass"] = InstrumentedNullPool
+    else:
+        if profile == "worker":
+            # Enough for SMS_WORKER_CONCURRENCY jobs of the async worker; connections
+            # are opened on demand, so a one-job-at-a-time worker still uses two
+            pool_size = max(DB_WORKER_POOL_SIZE, CONNECTIONS_PER_WORKER_JOB * max(1, SMS_WORKER_CONCURRENCY))
+            max_overflow = DB_WORKER_MAX_OVERFLOW
+        else:
+            pool_size, max_overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    if DB_PGBOUNCER and is_async:
+        # PgBouncer transaction mode cannot keep asyncpg's prepared statements
+        options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    return options
+
+
+_instrumented = []
+
+
+def instrument(engine, name: str, profile: str):
+    """Attach PoolMetrics to a sync engine's pool (use async_engine.sync_engine)."""
+    engine.pool.metrics = PoolMetrics(name, profile)
+    _instrumented.append(engine)
+    return engine
+
+
+def pool_stats() -> list:
+    """Snapshot of every instrumented engine's pool in this process."""
+    return [
+        engine.pool.metrics.snapshot(engine.pool)
+        for engine in _instrumented
+        if getattr(engine.pool, "metrics", None) is not None
+    ]
@@ -14,7 +14,7 @@ CREATE TYPE propagation_status_enum AS ENUM ('pending', 'propagated', 'failed');
 
 CREATE TYPE subscription_status_enum AS ENUM ('active', 'inactive', 'cancelled', 'expired');
 
-CREATE TYPE schedule_status_enum AS ENUM ('pending', 'sent', 'failed', 'cancelled', 'partial');
+CREATE TYPE schedule_status_enum AS ENUM ('pending', 'sent', 'failed', 'cancelled', 'partial', 'draft');
 
 CREATE TYPE message_status_enum AS ENUM ('pending', 'sent', 'failed');
 
@@ -91,6 +91,8 @@ CREATE TABLE contacts (
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX idx_contacts_user_id_group_id_phone ON contacts(user_id, group_id, phone);
+
 -- Networks
 CREATE TABLE networks (
   id SERIAL PRIMARY KEY,
@@ -260,10 +262,59 @@ CREATE TABLE template_columns (
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
--- Sent messages (logs)
+-- Creates <parent>_yYYYYmMM covering the calendar month of `month` (see services/partition_service.py)
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::date;
+    end_date DATE := (start_date + INTERVAL '1 month')::date;
+    partition_name TEXT := parent || '_' || to_char(start_date, '"y"YYYY"m"MM');
+    default_name TEXT := parent || '_default';
+    key_column TEXT;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    IF to_regclass(default_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, parent, start_date, end_date
+        );
+        RETURN partition_name;
+    END IF;
+
+    -- Block inserts routed to the default partition until the transaction ends, so none land
+    -- there between the move and the attach; a concurrent caller waits here and then finds
+    -- the partition already created
+    EXECUTE format('LOCK TABLE %I IN SHARE ROW EXCLUSIVE MODE', default_name);
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Rows of this month that already landed in the default partition move into the new one;
+    -- attaching fails while the default partition still holds rows of the range
+    SELECT a.attname INTO key_column
+    FROM pg_partitioned_table pt
+    JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = parent::regclass;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+        default_name, key_column, start_date, key_column, end_date, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        parent, partition_name, start_date, end_date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Sent messages (logs), partitioned by month of sent_at
 CREATE TABLE sent_messages (
-  id SERIAL PRIMARY KEY,
-  uuid UUID NOT NULL DEFAULT uuid_generate_v4() UNIQUE,
+  id SERIAL,
+  uuid UUID NOT NULL DEFAULT uuid_generate_v4(),
   sender_alias VARCHAR(11) NOT NULL,
   user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
   phone_number VARCHAR(15) NOT NULL,
@@ -271,25 +322,65 @@ CREATE TABLE sent_messages (
   message_id VARCHAR(100), 
   remarks TEXT,
   number_of_parts INT NOT NULL DEFAULT 1,
-  sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
+  sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  delivery_status sms_delivery_status_enum NULL,  -- latest delivery report, set by /sms/webhook
+  delivered_at TIMESTAMP NULL,                    -- when that report was received
+  PRIMARY KEY (id, sent_at)
+) PARTITION BY RANGE (sent_at);
+
+CREATE INDEX idx_sent_messages_uuid ON sent_messages(uuid);
+CREATE INDEX idx_sent_messages_message_id ON sent_messages(message_id);
+CREATE INDEX idx_sent_messages_user_id_sent_at ON sent_messages(user_id, sent_at, id);
 
 
--- SMS callbacks
+-- SMS callbacks, partitioned by month of received_at
 CREATE TABLE sms_callbacks (
-  id SERIAL PRIMARY KEY,
-  uuid UUID NOT NULL DEFAULT uuid_generate_v4() UNIQUE,
+  id SERIAL,
+  uuid UUID NOT NULL DEFAULT uuid_generate_v4(),
   message_id TEXT NOT NULL,
   phone VARCHAR(15) NOT NULL,
-  status sms_delivery_status_enum NOT NULL DEFAULT 'Pending',
+  status sms_delivery_status_enum NOT NULL DEFAULT 'pending',
   uid TEXT,
   remarks TEXT,
   payload JSONB,
   received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   sender_alias TEXT,
   user_uuid VARCHAR(36),
-  user_id INT REFERENCES users(id) ON DELETE SET NULL
-);
+  user_id INT REFERENCES users(id) ON DELETE SET NULL,
+  PRIMARY KEY (id, received_at)
+) PARTITION BY RANGE (received_at);
+
+CREATE INDEX idx_sms_callbacks_uuid ON sms_callbacks(uuid);
+CREATE INDEX idx_sms_callbacks_uid ON sms_callbacks(uid);
+CREATE INDEX idx_sms_callbacks_user_id_message_id ON sms_callbacks(user_id, message_id, received_at);
+
+-- Payload without the keys already stored in their own columns (SMS_CALLBACK_PAYLOAD_MODE=compact)
+CREATE OR REPLACE FUNCTION sms_callback_extra_payload(
+    payload JSONB, message_id TEXT, phone TEXT, status TEXT, uid TEXT, remarks TEXT, sender_alias TEXT
+) RETURNS JSONB AS $$
+    SELECT CASE WHEN jsonb_typeof(payload) IS DISTINCT FROM 'object' THEN payload ELSE NULLIF(
+        payload - array_remove(ARRAY[
+            CASE WHEN jsonb_typeof(payload -> 'message_id') = 'string' AND payload ->> 'message_id' = message_id THEN 'message_id' END,
+            CASE WHEN jsonb_typeof(payload -> 'PhoneNumber') = 'string' AND payload ->> 'PhoneNumber' = phone THEN 'PhoneNumber' END,
+            CASE WHEN jsonb_typeof(payload -> 'phone') = 'string' AND payload ->> 'phone' = phone THEN 'phone' END,
+            CASE WHEN jsonb_typeof(payload -> 'DLRStatus') = 'string' AND payload ->> 'DLRStatus' = status THEN 'DLRStatus' END,
+            CASE WHEN jsonb_typeof(payload -> 'uid') = 'string' AND payload ->> 'uid' = uid THEN 'uid' END,
+            CASE WHEN jsonb_typeof(payload -> 'Remarks') = 'string' AND payload ->> 'Remarks' = remarks THEN 'Remarks' END,
+            CASE WHEN jsonb_typeof(payload -> 'SenderId') = 'string' AND payload ->> 'SenderId' = sender_alias THEN 'SenderId' END
+        ], NULL),
+        '{}'::jsonb
+    ) END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Current month and the next three; POST /cron/partitions/maintain keeps creating them
+SELECT create_monthly_partition(parent, month::date)
+FROM unnest(ARRAY['sent_messages', 'sms_callbacks']) AS parent,
+     generate_series(date_trunc('month', now()), date_trunc('month', now()) + INTERVAL '3 months', INTERVAL '1 month') AS month;
+
+-- Catch-all for months whose partition is missing; create_monthly_partition() moves
+-- their rows out when the partition is created
+CREATE TABLE sent_messages_default PARTITION OF sent_messages DEFAULT;
+CREATE TABLE sms_callbacks_default PARTITION OF sms_callbacks DEFAULT;
 
 -- SMS schedules metadata
 CREATE TABLE sms_schedules (
@@ -304,6 +395,8 @@ CREATE TABLE sms_schedules (
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX idx_sms_schedules_status_scheduled_for ON sms_schedules(status, scheduled_for);
+
 -- SMS scheduled messages (actual messages to send)
 CREATE TABLE scheduled_messages (
   id SERIAL PRIMARY KEY,
@@ -317,6 +410,8 @@ CREATE TABLE scheduled_messages (
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX idx_scheduled_messages_schedule_id_status ON scheduled_messages(schedule_id, status);
+
 -- Insert benefits
 INSERT INTO benefits (id, description) VALUES
 (1, '1 or more SMS'),
@@ -391,6 +486,9 @@ CREATE TABLE sms_jobs (
   status message_status_enum DEFAULT 'pending',   -- pending, sent, failed
   retries INT NOT NULL DEFAULT 0,
   max_retries INT NOT NULL DEFAULT 3,
+  next_retry_at TIMESTAMP NULL,  -- set while a backoff retry is scheduled
+  last_error_at TIMESTAMP NULL,
+  reserved_parts INT NOT NULL DEFAULT 0,  -- credits held until sent (spent) or failed (refunded)
   
   -- scheduling (optional, for campaigns)
   scheduled_for TIMESTAMP NULL,  -- if NULL → process immediately
@@ -423,3 +521,45 @@ CREATE TABLE user_outage_notifications (
 );
 
 CREATE INDEX idx_user_outage_notifications_user_id ON user_outage_notifications(user_id);
+
+-- SMS campaigns (recipients stored on the campaign, processed in chunks)
+CREATE TYPE campaign_status_enum AS ENUM ('pending', 'processing', 'completed', 'partial', 'failed');
+
+CREATE TABLE sms_campaigns (
+    id SERIAL PRIMARY KEY,
+    uuid UUID NOT NULL DEFAULT uuid_generate_v4() UNIQUE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    sender_id INT NOT NULL REFERENCES sender_ids(id) ON DELETE CASCADE,
+    subscription_id INT REFERENCES user_subscriptions(id) ON DELETE SET NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    phone_numbers VARCHAR(15)[] NOT NULL,
+    parts_per_message INT NOT NULL DEFAULT 1,
+    chunk_size INT NOT NULL DEFAULT 500,
+    status campaign_status_enum NOT NULL DEFAULT 'pending',
+    total_recipients INT NOT NULL DEFAULT 0,
+    processed_count INT NOT NULL DEFAULT 0,
+    sent_count INT NOT NULL DEFAULT 0,
+    failed_count INT NOT NULL DEFAULT 0,
+    parts_reserved INT NOT NULL DEFAULT 0,
+    claimed_chunks INT[] NOT NULL DEFAULT '{}',  -- offsets of chunks taken by a worker
+    chunk_leases JSONB NOT NULL DEFAULT '{}',    -- chunks being sent: offset -> claimed_at, limit
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+CREATE INDEX idx_sms_campaigns_user_id ON sms_campaigns(user_id);
+
+-- Per-user daily rollup of sent messages and delivery reports (EAT days), maintained incrementally
+CREATE TABLE user_daily_stats (
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    messages INT NOT NULL DEFAULT 0,
+    parts INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    callbacks INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
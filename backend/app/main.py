@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -5,6 +7,23 @@ from fastapi.middleware.cors import CORSMiddleware
 from api.routes import subscription, sms_templates, sms, contacts, sender_id, cron, auth, plans, payments
 from api.routes import admin_auth as admin_auth_routes
 from api.routes import admin as admin_routes
+from services.http_client import init_http_client, close_http_client
+from services import live_events
+from services.partition_service import ensure_partitions_on_startup
+from api.deps import async_engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared pooled HTTP client for the SMS gateway (keep-alive across requests)
+    await init_http_client()
+    # Monthly partitions are kept by cron; this covers a cron run that was missed
+    await asyncio.to_thread(ensure_partitions_on_startup)
+    yield
+    await live_events.close()
+    await close_http_client()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="SEWMR SMS API",
@@ -12,6 +31,7 @@ app = FastAPI(
     description="Bulk SMS messaging platform API for Tanzania — manage contacts, sender IDs, templates, subscriptions, and send SMS at scale.",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # --- CORS Middleware ---
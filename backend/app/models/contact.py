@@ -1,5 +1,5 @@
 # backend/app/models/contact.py
-from sqlalchemy import Column, Integer, Text, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, Text, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -21,3 +21,6 @@ class Contact(Base):
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
     group = relationship("ContactGroup", backref="contacts", lazy="joined")
+
+# Indexes
+Index('idx_contacts_user_id_group_id_phone', Contact.user_id, Contact.group_id, Contact.phone)
@@ -43,6 +43,7 @@ class ScheduleStatusEnum(enum.Enum):
     failed = 'failed'
     cancelled = 'cancelled'
     partial = 'partial'
+    draft = 'draft'  # still being filled by create_schedule; never claimed
 
 class MessageStatusEnum(enum.Enum):
     pending = 'pending'
@@ -60,3 +61,10 @@ class SmsDeliveryStatusEnum(enum.Enum):
     failed = "failed"
     dnd = "dnd"
 
+
+class CampaignStatusEnum(enum.Enum):
+    pending = "pending"
+    processing = "processing"
+    completed = "completed"
+    partial = "partial"
+    failed = "failed"
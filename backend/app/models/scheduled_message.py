@@ -1,5 +1,5 @@
 # backend/app/models/scheduled_message.py
-from sqlalchemy import Column, Integer, Text, ForeignKey, Enum, DateTime, String
+from sqlalchemy import Column, Integer, Text, ForeignKey, Enum, DateTime, String, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -19,3 +19,6 @@ class SmsScheduledMessage(Base):
     remarks = Column(Text, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Indexes
+Index('idx_scheduled_messages_schedule_id_status', SmsScheduledMessage.schedule_id, SmsScheduledMessage.status)
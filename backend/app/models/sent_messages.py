@@ -1,16 +1,18 @@
 # backend/app/models/sms_message.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
 
 from db.base import Base
+from models.enums import SmsDeliveryStatusEnum
 
 class SentMessage(Base):
+    # Range-partitioned by month of sent_at; the table's primary key is (id, sent_at)
     __tablename__ = 'sent_messages'
 
     id = Column(Integer, primary_key=True)
-    uuid = Column(UUID(as_uuid=True), unique=True, nullable=False, default=uuid.uuid4)
+    uuid = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
     sender_alias = Column(String(11), nullable=False)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     phone_number = Column(String(15), nullable=False)
@@ -19,5 +21,11 @@ class SentMessage(Base):
     remarks = Column(Text, nullable=True)               # error messages or notes
     number_of_parts = Column(Integer, nullable=False, default=1)
     sent_at = Column(DateTime, nullable=False, server_default=func.now())
+    # Latest delivery report, maintained by /sms/webhook
+    delivery_status = Column(Enum(SmsDeliveryStatusEnum, name="sms_delivery_status_enum"), nullable=True)
+    delivered_at = Column(DateTime, nullable=True)      # when that report was received
 
-
+# Indexes
+Index('idx_sent_messages_uuid', SentMessage.uuid)
+Index('idx_sent_messages_message_id', SentMessage.message_id)
+Index('idx_sent_messages_user_id_sent_at', SentMessage.user_id, SentMessage.sent_at, SentMessage.id)
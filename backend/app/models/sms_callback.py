@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -8,10 +8,11 @@ from models.enums import SmsDeliveryStatusEnum
 
 
 class SmsCallback(Base):
+    # Range-partitioned by month of received_at; the table's primary key is (id, received_at)
     __tablename__ = 'sms_callbacks'
 
     id = Column(Integer, primary_key=True)
-    uuid = Column(UUID(as_uuid=True), unique=True, nullable=False, default=uuid.uuid4)
+    uuid = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
     message_id = Column(Text, nullable=False)
     phone = Column(String(15), nullable=False)
     status = Column(Enum(SmsDeliveryStatusEnum, name="sms_delivery_status"), nullable=False, default=SmsDeliveryStatusEnum.pending)
@@ -21,3 +22,8 @@ class SmsCallback(Base):
     received_at = Column(DateTime, nullable=False, server_default=func.now())
     sender_alias = Column(Text)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+# Indexes
+Index('idx_sms_callbacks_uuid', SmsCallback.uuid)
+Index('idx_sms_callbacks_uid', SmsCallback.uid)
+Index('idx_sms_callbacks_user_id_message_id', SmsCallback.user_id, SmsCallback.message_id, SmsCallback.received_at)
@@ -0,0 +1,40 @@
+# backend/app/models/sms_campaign.py
+from sqlalchemy import Column, Integer, Text, String, ForeignKey, Enum, DateTime
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
+from sqlalchemy.sql import func
+import uuid
+
+from db.base import Base
+from models.enums import CampaignStatusEnum
+
+
+class SmsCampaign(Base):
+    __tablename__ = 'sms_campaigns'
+
+    id = Column(Integer, primary_key=True)
+    uuid = Column(UUID(as_uuid=True), unique=True, nullable=False, default=uuid.uuid4)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    sender_id = Column(Integer, ForeignKey('sender_ids.id', ondelete='CASCADE'), nullable=False)
+    subscription_id = Column(Integer, ForeignKey('user_subscriptions.id', ondelete='SET NULL'), nullable=True)
+    title = Column(Text, nullable=False)
+    message = Column(Text, nullable=False)
+    # Recipients stored compactly on the campaign row instead of one job row each
+    phone_numbers = Column(ARRAY(String(15)), nullable=False)
+    parts_per_message = Column(Integer, nullable=False, default=1)
+    chunk_size = Column(Integer, nullable=False, default=500)
+    status = Column(Enum(CampaignStatusEnum, name="campaign_status_enum"), nullable=False, default=CampaignStatusEnum.pending)
+    # Progress counters, updated atomically by each processed chunk
+    total_recipients = Column(Integer, nullable=False, default=0)
+    processed_count = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    parts_reserved = Column(Integer, nullable=False, default=0)
+    # Offsets of the chunks a worker has taken; a chunk is claimed once, before it is sent
+    claimed_chunks = Column(ARRAY(Integer), nullable=False, default=list, server_default="{}")
+    # Chunks being sent: offset -> {"claimed_at", "limit"}; removed when the chunk is recorded,
+    # expired ones are refunded by POST /cron/campaigns/reap
+    chunk_leases = Column(JSONB, nullable=False, default=dict, server_default="{}")
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime, nullable=True)
@@ -27,6 +27,9 @@ class SMSJob(Base):
     status = Column(Enum(MessageStatusEnum), nullable=False, default=MessageStatusEnum.pending)
     retries = Column(Integer, nullable=False, default=0)
     max_retries = Column(Integer, nullable=False, default=3)
+    next_retry_at = Column(DateTime, nullable=True)   # set while a backoff retry is scheduled
+    last_error_at = Column(DateTime, nullable=True)
+    reserved_parts = Column(Integer, nullable=False, default=0)   # credits held until sent or refunded
 
     scheduled_for = Column(DateTime, nullable=True)   # NULL means "send immediately"
     sent_at = Column(DateTime, nullable=True)
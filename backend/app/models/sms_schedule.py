@@ -1,5 +1,5 @@
 # backend/app/models/sms_schedule.py
-from sqlalchemy import Column, Integer, Text, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, Text, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -19,3 +19,6 @@ class SmsSchedule(Base):
     status = Column(Enum(ScheduleStatusEnum), default=ScheduleStatusEnum.pending)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Indexes
+Index('idx_sms_schedules_status_scheduled_for', SmsSchedule.status, SmsSchedule.scheduled_for)
@@ -0,0 +1,20 @@
+# backend/app/models/user_daily_stats.py
+from sqlalchemy import Column, Date, ForeignKey, Integer
+
+from db.base import Base
+
+
+class UserDailyStats(Base):
+    """
+    Per-user, per-day (EAT) message and delivery-report counters, incremented
+    as messages are sent and callbacks arrive. Feeds /auth/dashboard/stats.
+    """
+    __tablename__ = 'user_daily_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    messages = Column(Integer, nullable=False, default=0)    # sent messages
+    parts = Column(Integer, nullable=False, default=0)       # SMS parts (credits) of those messages
+    delivered = Column(Integer, nullable=False, default=0)   # delivery reports with a delivered status
+    failed = Column(Integer, nullable=False, default=0)      # delivery reports with a failed status
+    callbacks = Column(Integer, nullable=False, default=0)   # all delivery reports
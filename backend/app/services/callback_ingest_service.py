@@ -0,0 +1,307 @@
+# backend/app/services/callback_ingest_service.py
+"""
+Batched ingestion of gateway delivery reports (DLRs).
+
+`write_reports` stores any number of reports with a fixed number of
+statements: one user lookup for the callback uuids missing from the user id
+cache (services.user_cache), one multi-row INSERT into sms_callbacks, one
+UPDATE ... FROM (VALUES ...) that keeps the latest status on sent_messages,
+and one upsert of the daily stats.
+
+With SMS_DLR_BUFFERED the webhook does not write at all: it appends the
+report to the SMS_DLR_STREAM Redis stream (`enqueue`) and answers straight
+away. `run_flusher` (started with `python -m utils.worker --dlr`) reads the
+stream through a consumer group and writes whatever arrived in the last
+SMS_DLR_FLUSH_INTERVAL_MS, or SMS_DLR_BATCH_SIZE reports, whichever comes
+first, in one transaction. Entries are acknowledged only after the commit;
+entries of a flusher that died or a batch that failed stay pending and are
+claimed again, one report per transaction, once idle for
+SMS_DLR_RETRY_IDLE_MS. An entry that has been delivered SMS_DLR_MAX_DELIVERIES
+times (per XPENDING) without being stored is moved to
+SMS_DLR_DEAD_LETTER_STREAM instead of being claimed forever. Several
+flushers can run side by side.
+
+A report never overwrites the status of a newer one: sent_messages is only
+updated when the report was received at or after its delivered_at.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import DateTime, Integer, Text, cast, column, insert, or_, select, update, values
+from sqlalchemy.orm import Session
+
+from api.deps import SessionLocal
+from core.config import (
+    SMS_CALLBACK_PAYLOAD_MODE,
+    SMS_DELIVERY_REPORT_WINDOW_DAYS,
+    SMS_DLR_BATCH_SIZE,
+    SMS_DLR_DEAD_LETTER_STREAM,
+    SMS_DLR_FLUSH_INTERVAL_MS,
+    SMS_DLR_MAX_DELIVERIES,
+    SMS_DLR_RETRY_IDLE_MS,
+    SMS_DLR_STREAM,
+)
+from core.worker_config import redis_conn
+from models.enums import SmsDeliveryStatusEnum
+from models.sent_messages import SentMessage
+from models.sms_callback import SmsCallback
+from models.user import User
+from services import callback_payload_service, live_events, stats_service
+from services.user_cache import user_id_cache
+
+CONSUMER_GROUP = "dlr-flushers"
+
+_STATUSES = {status.value for status in SmsDeliveryStatusEnum}
+
+
+def parse_report(data: dict, user_uuid: Optional[str], received_at: datetime) -> Optional[dict]:
+    """Normalise a gateway callback body; None if it lacks message_id or phone."""
+    message_id = data.get("message_id")
+    phone = data.get("PhoneNumber") or data.get("phone")
+    if not message_id or not phone:
+        return None
+
+    status = (data.get("DLRStatus") or "").lower()
+    try:
+        user_uuid = str(uuid.UUID(user_uuid)) if user_uuid else None
+    except ValueError:
+        user_uuid = None
+    report = {
+        "message_id": str(message_id),
+        "phone": phone,
+        # An unrecognised status must not make the whole batch fail on the enum column
+        "status": status if status in _STATUSES else SmsDeliveryStatusEnum.unknown.value,
+        "uid": data.get("uid"),
+        "remarks": data.get("Remarks"),
+        "sender_alias": data.get("SenderId"),
+        "user_uuid": user_uuid,
+        "received_at": received_at,
+    }
+    if SMS_CALLBACK_PAYLOAD_MODE == "compact":
+        report["payload"] = callback_payload_service.extra_payload(data, report)
+    else:
+        report["payload"] = data
+    return report
+
+
+def _resolve_users(db: Session, user_uuids: set) -> Dict[str, int]:
+    """User ids of callback uuids, from the cache and one query for the rest."""
+    if not user_uuids:
+        return {}
+    user_ids, missing = user_id_cache.get_many(user_uuids)
+    if missing:
+        rows = db.execute(
+            select(User.uuid, User.id).where(User.uuid.in_([uuid.UUID(u) for u in missing]))
+        ).all()
+        resolved = {str(user_uuid): user_id for user_uuid, user_id in rows}
+        user_id_cache.put_many(resolved)
+        user_ids.update(resolved)
+    return user_ids
+
+
+def _update_sent_messages(db: Session, rows: List[dict]) -> None:
+    """Keep the latest reported status of each message on sent_messages, in one statement."""
+    latest: Dict[Tuple[str, Optional[int]], dict] = {}
+    for row in rows:
+        key = (row["message_id"], row["user_id"])
+        if key not in latest or row["received_at"] >= latest[key]["received_at"]:
+            latest[key] = row
+
+    reports = values(
+        column("message_id", Text),
+        column("user_id", Integer),
+        column("status", Text),
+        column("received_at", DateTime),
+        name="reports",
+    ).data([
+        (row["message_id"], row["user_id"], row["status"], row["received_at"])
+        for row in latest.values()
+    ])
+    user_id = cast(reports.c.user_id, Integer)
+    received_at = cast(reports.c.received_at, DateTime)
+    # The sent_at window limits the lookup to the most recent monthly partitions
+    oldest = min(row["received_at"] for row in rows)
+    db.execute(
+        update(SentMessage)
+        .where(
+            SentMessage.message_id == reports.c.message_id,
+            or_(user_id.is_(None), SentMessage.user_id == user_id),
+            SentMessage.sent_at >= oldest - timedelta(days=SMS_DELIVERY_REPORT_WINDOW_DAYS),
+            # A report retried or flushed late must not replace a newer status
+            or_(SentMessage.delivered_at.is_(None), SentMessage.delivered_at <= received_at),
+        )
+        .values(
+            delivery_status=cast(reports.c.status, SentMessage.delivery_status.type),
+            delivered_at=received_at,
+        )
+    )
+
+
+def write_reports(db: Session, reports: Sequence[dict]) -> List[dict]:
+    """
+    Store parsed reports (see `parse_report`). Does not commit; returns the
+    sms_callbacks rows written, for `live_events.publish_deliveries` after the commit.
+    """
+    if not reports:
+        return []
+    user_ids = _resolve_users(db, {r["user_uuid"] for r in reports if r["user_uuid"]})
+
+    rows = [
+        {
+            "message_id": r["message_id"],
+            "phone": r["phone"],
+            "status": r["status"],
+            "uid": r["uid"],
+            "remarks": r["remarks"],
+            "sender_alias": r["sender_alias"],
+            "payload": r["payload"],
+            "user_id": user_ids.get(r["user_uuid"]),
+            "received_at": r["received_at"],
+        }
+        for r in reports
+    ]
+    db.execute(insert(SmsCallback).values(rows))
+    _update_sent_messages(db, rows)
+    stats_service.record_callbacks(
+        db, [(row["user_id"], row["status"], row["received_at"].date()) for row in rows if row["user_id"]]
+    )
+    return rows
+
+
+# Redis stream buffer
+
+def enqueue(report: dict, connection=None, stream: str = SMS_DLR_STREAM) -> None:
+    """Append a parsed report to the stream; raises RedisError if Redis is unavailable."""
+    (connection or redis_conn).xadd(stream, {"report": json.dumps(report, default=str)})
+
+
+def _decode(fields: dict) -> dict:
+    report = json.loads(fields[b"report"] if b"report" in fields else fields["report"])
+    report["received_at"] = datetime.fromisoformat(report["received_at"])
+    return report
+
+
+def _ensure_group(connection, stream: str) -> None:
+    try:
+        connection.xgroup_create(stream, CONSUMER_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _read_batch(connection, stream: str, consumer: str, batch_size: int, interval_ms: int) -> list:
+    """New entries until `batch_size` have arrived or `interval_ms` has passed."""
+    deadline = time.monotonic() + interval_ms / 1000
+    entries = []
+    while len(entries) < batch_size:
+        block_ms = int((deadline - time.monotonic()) * 1000)
+        if block_ms <= 0:
+            break
+        response = connection.xreadgroup(
+            CONSUMER_GROUP, consumer, {stream: ">"}, count=batch_size - len(entries), block=block_ms
+        )
+        for _, stream_entries in response or []:
+            entries.extend(stream_entries)
+    return entries
+
+
+def _write_and_ack(connection, stream: str, entries: list) -> int:
+    with SessionLocal() as db:
+        rows = write_reports(db, [_decode(fields) for _, fields in entries])
+        db.commit()
+    entry_ids = [entry_id for entry_id, _ in entries]
+    connection.xack(stream, CONSUMER_GROUP, *entry_ids)
+    connection.xdel(stream, *entry_ids)
+    live_events.publish_deliveries(rows)
+    return len(rows)
+
+
+def flush(connection, stream: str, entries: list, one_by_one: bool = False) -> int:
+    """
+    Write stream entries and acknowledge them. With `one_by_one` each entry is
+    its own transaction, so a report that cannot be stored does not hold back
+    the others; failed entries stay pending and are retried later.
+    """
+    if not entries:
+        return 0
+    if not one_by_one:
+        try:
+            return _write_and_ack(connection, stream, entries)
+        except Exception as e:
+            print(f"DLR flusher: batch of {len(entries)} failed, will retry: {e}")
+            return 0
+
+    written = 0
+    for entry in entries:
+        try:
+            written += _write_and_ack(connection, stream, [entry])
+        except Exception as e:
+            print(f"DLR flusher: entry {entry[0]} failed, will retry: {e}")
+    return written
+
+
+def _dead_letter(connection, stream: str, consumer: str, entries: list,
+                 max_deliveries: int, dead_letter_stream: str) -> list:
+    """
+    Move claimed entries delivered `max_deliveries` times or more to the
+    dead-letter stream; returns the entries still worth retrying.
+    """
+    if not entries or max_deliveries <= 0:
+        return entries
+    # Claimed entries come back in id order and are now pending on this consumer
+    pending = connection.xpending_range(
+        stream, CONSUMER_GROUP, min=entries[0][0], max=entries[-1][0], count=len(entries), consumername=consumer
+    )
+    deliveries = {item["message_id"]: item["times_delivered"] for item in pending}
+
+    retry = []
+    for entry_id, fields in entries:
+        times = deliveries.get(entry_id, 0)
+        if times < max_deliveries:
+            retry.append((entry_id, fields))
+            continue
+        pipe = connection.pipeline()
+        pipe.xadd(dead_letter_stream, {**fields, "entry_id": entry_id, "deliveries": times})
+        pipe.xack(stream, CONSUMER_GROUP, entry_id)
+        pipe.xdel(stream, entry_id)
+        pipe.execute()
+        print(f"DLR flusher: entry {entry_id} failed {times} times, moved to {dead_letter_stream}")
+    return retry
+
+
+def run_flusher(
+    stop: threading.Event,
+    connection=None,
+    stream: str = SMS_DLR_STREAM,
+    batch_size: int = SMS_DLR_BATCH_SIZE,
+    interval_ms: int = SMS_DLR_FLUSH_INTERVAL_MS,
+    max_deliveries: int = SMS_DLR_MAX_DELIVERIES,
+    dead_letter_stream: str = SMS_DLR_DEAD_LETTER_STREAM,
+) -> int:
+    """Flush the stream until `stop` is set. Returns the number of reports written."""
+    connection = connection or redis_conn
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+    _ensure_group(connection, stream)
+    written = 0
+    while not stop.is_set():
+        try:
+            # Entries of failed batches or dead flushers, retried one report at a time
+            _, stale, *_ = connection.xautoclaim(
+                stream, CONSUMER_GROUP, consumer, min_idle_time=SMS_DLR_RETRY_IDLE_MS, count=batch_size
+            )
+            stale = _dead_letter(
+                connection, stream, consumer, [entry for entry in stale if entry[1]], max_deliveries, dead_letter_stream
+            )
+            written += flush(connection, stream, stale, one_by_one=True)
+            written += flush(connection, stream, _read_batch(connection, stream, consumer, batch_size, interval_ms))
+        except RedisError as e:
+            print(f"DLR flusher: Redis unavailable: {e}")
+            stop.wait(1)
+    return written
@@ -0,0 +1,108 @@
+# backend/app/services/callback_payload_service.py
+"""
+Compact storage of sms_callbacks.payload.
+
+Every delivery report used to keep the gateway's raw JSON, although its
+message id, phone, status, uid, remarks and sender already live in their
+own columns. With SMS_CALLBACK_PAYLOAD_MODE=compact only the rest is
+stored: a key is dropped when its value is a string that the column holds
+verbatim, so nothing is lost, and a payload left empty becomes NULL. The
+status column is lower-cased, so DLRStatus is only dropped when the gateway
+sent it lower-case too. (Rows compacted before db/migrations/011 lost the
+case of their DLRStatus.)
+
+`extra_payload` does this for new reports; `compact_stored` rewrites the
+existing rows in id ranges with the sms_callback_extra_payload() SQL
+function (db/migrations/007, 011), which applies the same rules. It runs in
+the worker (tasks.compact_callbacks_task), as it takes as long as the table
+is big. Postgres reuses the freed space after VACUUM; the table files only
+shrink with VACUUM FULL or pg_repack.
+"""
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from core.config import SMS_CALLBACK_COMPACT_BATCH_SIZE
+from models.sms_callback import SmsCallback
+from utils.timezone import now_eat
+
+# Gateway key -> column of sms_callbacks holding the same value
+EXTRACTED_KEYS = {
+    "message_id": "message_id",
+    "PhoneNumber": "phone",
+    "phone": "phone",
+    "DLRStatus": "status",
+    "uid": "uid",
+    "Remarks": "remarks",
+    "SenderId": "sender_alias",
+}
+
+_EXTRA_PAYLOAD_SQL = (
+    "sms_callback_extra_payload(payload, message_id, phone, status::text, uid, remarks, sender_alias)"
+)
+
+
+def _recoverable(value, stored: Optional[str]) -> bool:
+    return isinstance(value, str) and value == stored
+
+
+def extra_payload(payload, columns: dict):
+    """The keys of `payload` whose values are not already in `columns` (sms_callbacks column -> value)."""
+    if not isinstance(payload, dict):
+        return payload
+    extra = {
+        key: value
+        for key, value in payload.items()
+        if key not in EXTRACTED_KEYS or not _recoverable(value, columns.get(EXTRACTED_KEYS[key]))
+    }
+    return extra or None
+
+
+def storage_sizes(db: Session) -> dict:
+    """
+    Bytes of all sms_callbacks partitions (with indexes and TOAST) and of the
+    stored payloads. Reads every payload, so only run it from a job.
+    """
+    table_bytes = db.execute(text(
+        "SELECT coalesce(sum(pg_total_relation_size(inhrelid)), 0) FROM pg_inherits "
+        "WHERE inhparent = 'sms_callbacks'::regclass"
+    )).scalar()
+    payload_bytes, payloads = db.execute(text(
+        "SELECT coalesce(sum(pg_column_size(payload)), 0), count(payload) FROM sms_callbacks"
+    )).one()
+    return {"table_bytes": int(table_bytes), "payload_bytes": int(payload_bytes), "payloads": payloads}
+
+
+def compact_stored(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: int = SMS_CALLBACK_COMPACT_BATCH_SIZE,
+) -> int:
+    """
+    Strip the extracted keys from stored payloads, optionally only of reports
+    older than `older_than_days`. One UPDATE and commit per `batch_size` ids;
+    rows that are already compact are not rewritten. Returns the rows updated.
+    """
+    low, high = db.execute(select(func.min(SmsCallback.id), func.max(SmsCallback.id))).one()
+    if low is None:
+        return 0
+
+    conditions = [
+        "id >= :low AND id < :high",
+        "payload IS NOT NULL",
+        f"payload IS DISTINCT FROM {_EXTRA_PAYLOAD_SQL}",
+    ]
+    params = {}
+    if older_than_days is not None:
+        conditions.append("received_at < :before")
+        params["before"] = now_eat() - timedelta(days=older_than_days)
+    statement = text(f"UPDATE sms_callbacks SET payload = {_EXTRA_PAYLOAD_SQL} WHERE {' AND '.join(conditions)}")
+
+    updated = 0
+    batch_size = max(1, batch_size)
+    for start in range(low, high + 1, batch_size):
+        updated += db.execute(statement, {**params, "low": start, "high": start + batch_size}).rowcount
+        db.commit()
+    return updated
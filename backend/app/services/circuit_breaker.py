@@ -0,0 +1,118 @@
+# backend/app/services/circuit_breaker.py
+"""Error-rate circuit breaker shared by every process through Redis."""
+import time
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from core.config import (
+    API_ID,
+    SMS_CIRCUIT_FAILURE_RATE,
+    SMS_CIRCUIT_MIN_REQUESTS,
+    SMS_CIRCUIT_OPEN_SECONDS,
+    SMS_CIRCUIT_WINDOW_SECONDS,
+)
+from core.worker_config import redis_conn
+
+# Count one outcome in the current window and trip the breaker when the window
+# has enough calls and the failure ratio reaches the threshold. Returns 1 if
+# this call opened the circuit.
+_RECORD_LUA = """
+local failed = tonumber(ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'total', 1)
+if failed == 1 then
+    redis.call('HINCRBY', KEYS[1], 'failures', 1)
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+if failed == 0 or redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+local counts = redis.call('HMGET', KEYS[1], 'total', 'failures')
+local total = tonumber(counts[1]) or 0
+local failures = tonumber(counts[2]) or 0
+if total >= tonumber(ARGV[3]) and failures / total >= tonumber(ARGV[4]) then
+    redis.call('SET', KEYS[2], '1', 'PX', tonumber(ARGV[5]))
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+
+class CircuitBreaker:
+    """
+    Opens when the failure rate over a fixed window reaches `failure_rate`
+    (after at least `min_requests` calls) and stays open for `open_seconds`.
+    Once it closes, traffic resumes and the next window decides whether it
+    trips again. Allows calls if Redis is down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = SMS_CIRCUIT_FAILURE_RATE,
+        min_requests: int = SMS_CIRCUIT_MIN_REQUESTS,
+        window_seconds: int = SMS_CIRCUIT_WINDOW_SECONDS,
+        open_seconds: float = SMS_CIRCUIT_OPEN_SECONDS,
+        connection=None,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = max(1, min_requests)
+        self.window_seconds = max(1, window_seconds)
+        self.open_seconds = open_seconds
+        self.connection = connection or redis_conn
+        self.open_key = f"sms:circuit:{name}:open"
+        self._script = self.connection.register_script(_RECORD_LUA)
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_rate > 0 and self.open_seconds > 0
+
+    def _window_key(self) -> str:
+        return f"sms:circuit:{self.name}:window:{int(time.time()) // self.window_seconds}"
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit closes; 0.0 when calls are allowed."""
+        if not self.enabled:
+            return 0.0
+        try:
+            ttl_ms = self.connection.pttl(self.open_key)
+        except RedisError as e:
+            print(f"Circuit breaker {self.name} unavailable, allowing call: {e}")
+            return 0.0
+        return ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else 0.0
+
+    def allow(self) -> bool:
+        return self.retry_after() <= 0
+
+    def record(self, success: bool) -> None:
+        if not self.enabled:
+            return
+        try:
+            opened = self._script(
+                keys=[self._window_key(), self.open_key],
+                args=[
+                    0 if success else 1,
+                    self.window_seconds * 2,
+                    self.min_requests,
+                    self.failure_rate,
+                    int(self.open_seconds * 1000),
+                ],
+            )
+        except RedisError as e:
+            print(f"Circuit breaker {self.name} unavailable, outcome not recorded: {e}")
+            return
+        if opened:
+            print(f"Circuit breaker {self.name} opened for {self.open_seconds}s")
+
+
+_gateway_breaker: Optional[CircuitBreaker] = None
+
+
+def gateway_circuit_breaker() -> CircuitBreaker:
+    """Breaker for the SMS gateway account, shared by every SmsGatewayService."""
+    global _gateway_breaker
+    if _gateway_breaker is None:
+        _gateway_breaker = CircuitBreaker(f"gateway:{API_ID}")
+    return _gateway_breaker
@@ -0,0 +1,130 @@
+# backend/app/services/credit_service.py
+"""
+SMS credit reservation against the balance kept on the subscription row.
+
+`user_subscriptions.remaining_sms` (total_sms - used_sms) is the balance.
+Every debit is a single conditional UPDATE that adds to used_sms only if
+the balance still covers it, so concurrent senders can never overdraw and
+no lock is taken beyond the row lock of that one statement. Batches are
+reserved with one statement for the whole batch. Reading the balance is a
+primary key lookup.
+
+- reserve*: take credits before a message is sent or queued
+- commit_job: a queued SMSJob was sent, its reservation is spent
+- refund / refund_job: give credits back for messages that did not go out
+
+None of these functions commit; callers should commit straight after
+reserving so the row lock is released before the gateway is called. Async
+handlers can use them through `await db.run_sync(fn, ...)`.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from models.sms_job import SMSJob
+from models.user_subscription import UserSubscription
+
+# Batch reservations size themselves from a balance read; if a concurrent
+# debit got in between, they read it again
+_RESERVE_ATTEMPTS = 5
+
+
+def balance(db: Session, subscription_id: int) -> int:
+    """Current balance of a subscription (0 if it does not exist)."""
+    return db.execute(
+        select(UserSubscription.remaining_sms).where(UserSubscription.id == subscription_id)
+    ).scalar() or 0
+
+
+def user_credit_totals(db: Session, user_id: int, active_only: bool = True) -> Tuple[int, int, int, int]:
+    """(subscriptions, total purchased, used, remaining) across a user's subscriptions."""
+    query = select(
+        func.count(UserSubscription.id),
+        func.coalesce(func.sum(UserSubscription.total_sms), 0),
+        func.coalesce(func.sum(UserSubscription.used_sms), 0),
+        func.coalesce(func.sum(UserSubscription.remaining_sms), 0),
+    ).where(UserSubscription.user_id == user_id)
+    if active_only:
+        query = query.where(UserSubscription.status == "active")
+    count, purchased, used, remaining = db.execute(query).one()
+    return count, purchased, used, remaining
+
+
+def _debit(db: Session, subscription_id: int, parts: int) -> Optional[int]:
+    """Add `parts` to used_sms if the balance covers them. Returns the new balance, or None."""
+    return db.execute(
+        update(UserSubscription)
+        .where(UserSubscription.id == subscription_id, UserSubscription.remaining_sms >= parts)
+        .values(used_sms=func.coalesce(UserSubscription.used_sms, 0) + parts)
+        .returning(UserSubscription.remaining_sms)
+    ).scalar()
+
+
+def reserve(db: Session, subscription_id: int, parts: int) -> Optional[int]:
+    """Reserve `parts` credits. Returns the new remaining balance, or None if it is too low."""
+    return _debit(db, subscription_id, parts)
+
+
+def reserve_many(db: Session, subscription_id: int, parts_list: Sequence[int]) -> Tuple[List[bool], int]:
+    """
+    Reserve credits for several messages in input order, skipping any that no
+    longer fit. Returns (accepted flags, remaining).
+    """
+    remaining = balance(db, subscription_id)
+    for _ in range(_RESERVE_ATTEMPTS):
+        accepted, total = [], 0
+        for parts in parts_list:
+            fits = parts > 0 and total + parts <= remaining
+            accepted.append(fits)
+            if fits:
+                total += parts
+        if not total:
+            return accepted, remaining
+        new_remaining = _debit(db, subscription_id, total)
+        if new_remaining is not None:
+            return accepted, new_remaining
+        remaining = balance(db, subscription_id)
+    return [False] * len(parts_list), remaining
+
+
+def reserve_batch(db: Session, subscription_id: int, parts_per_message: int, count: int) -> Tuple[int, int]:
+    """
+    Reserve credits for as many of `count` identical messages as the balance
+    allows. Returns (reserved_count, remaining_sms).
+    """
+    remaining = balance(db, subscription_id)
+    for _ in range(_RESERVE_ATTEMPTS):
+        affordable = min(count, remaining // parts_per_message) if parts_per_message > 0 else count
+        if affordable <= 0:
+            return 0, remaining
+        new_remaining = _debit(db, subscription_id, affordable * parts_per_message)
+        if new_remaining is not None:
+            return affordable, new_remaining
+        remaining = balance(db, subscription_id)
+    return 0, remaining
+
+
+def refund(db: Session, subscription_id: int, parts: int) -> int:
+    """Return `parts` previously reserved credits. Returns the new remaining balance."""
+    if parts <= 0:
+        return balance(db, subscription_id)
+    remaining = db.execute(
+        update(UserSubscription)
+        .where(UserSubscription.id == subscription_id)
+        .values(used_sms=func.coalesce(UserSubscription.used_sms, 0) - parts)
+        .returning(UserSubscription.remaining_sms)
+    ).scalar()
+    return remaining or 0
+
+
+def commit_job(job: SMSJob) -> None:
+    """The job was sent: its reserved credits are spent and can no longer be refunded."""
+    job.reserved_parts = 0
+
+
+def refund_job(db: Session, job: SMSJob, subscription_id: Optional[int]) -> None:
+    """The job will not be sent: give back whatever it still holds."""
+    if job.reserved_parts and subscription_id:
+        refund(db, subscription_id, job.reserved_parts)
+    job.reserved_parts = 0
@@ -0,0 +1,60 @@
+# backend/app/services/dlr_dedup.py
+"""
+Drops repeated delivery reports at the edge of /sms/webhook.
+
+The gateway retries callbacks, and a retried report without a uid used to
+become one more sms_callbacks row plus a sent_messages update. Before a
+report is written or buffered, `first_seen` does SET NX on a key derived
+from (message_id, status, phone) that expires after SMS_DLR_DEDUP_TTL
+seconds; a report whose key already exists is a duplicate and is dropped.
+Redis is shared by every API host, unlike an in-process filter, so a
+retry is caught whichever host it reaches. The number of dropped reports
+(writes saved) is counted in Redis too.
+
+Fails open: if Redis is unavailable every report counts as new.
+"""
+import hashlib
+
+from redis.exceptions import RedisError
+
+from core.config import SMS_DLR_DEDUP_TTL
+from core.worker_config import redis_conn
+
+_KEY_PREFIX = "sms:dlr:seen:"
+_DROPPED_KEY = "sms:dlr:dedup:dropped"
+
+
+def _key(report: dict) -> str:
+    identity = "\x1f".join((report["message_id"], report["status"], report["phone"]))
+    return _KEY_PREFIX + hashlib.sha1(identity.encode()).hexdigest()
+
+
+def first_seen(report: dict, connection=None) -> bool:
+    """True the first time a (message_id, status, phone) is reported within the TTL."""
+    if SMS_DLR_DEDUP_TTL <= 0:
+        return True
+    connection = connection or redis_conn
+    try:
+        if connection.set(_key(report), 1, nx=True, ex=SMS_DLR_DEDUP_TTL):
+            return True
+        connection.incr(_DROPPED_KEY)
+        return False
+    except RedisError as e:
+        print(f"DLR dedup unavailable, accepting report: {e}")
+        return True
+
+
+def forget(report: dict, connection=None) -> None:
+    """Let a report through again, e.g. after writing it failed, so the gateway's retry is not dropped."""
+    if SMS_DLR_DEDUP_TTL <= 0:
+        return
+    try:
+        (connection or redis_conn).delete(_key(report))
+    except RedisError as e:
+        print(f"DLR dedup unavailable, could not forget report: {e}")
+
+
+def stats(connection=None) -> dict:
+    connection = connection or redis_conn
+    dropped = connection.get(_DROPPED_KEY)
+    return {"enabled": SMS_DLR_DEDUP_TTL > 0, "ttl_seconds": SMS_DLR_DEDUP_TTL, "duplicates_dropped": int(dropped or 0)}
@@ -0,0 +1,69 @@
+# backend/app/services/http_client.py
+"""Pooled httpx clients for outbound gateway calls, one per event loop."""
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+from core.config import (
+    SMS_HTTP2_ENABLED,
+    SMS_HTTP_KEEPALIVE_EXPIRY,
+    SMS_HTTP_MAX_CONNECTIONS,
+    SMS_HTTP_MAX_KEEPALIVE,
+    SMS_HTTP_TIMEOUT,
+)
+
+# One client per event loop: pooled connections belong to the loop that opened them
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _http2_supported() -> bool:
+    """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it."""
+    if not SMS_HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("SMS_HTTP2_ENABLED is set but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_supported(),
+        timeout=httpx.Timeout(SMS_HTTP_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SMS_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SMS_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SMS_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the running loop's client, creating it on first use. Every loop
+    gets its own client and keeps it until `close_http_client` is awaited on
+    that loop, so switching loops never drops a client with open connections.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = _clients[loop] = _build_client()
+    return client
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    return get_http_client()
+
+
+async def close_http_client() -> None:
+    """Close the running loop's client; await it before the loop is closed."""
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
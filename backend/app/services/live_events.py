@@ -0,0 +1,175 @@
+# backend/app/services/live_events.py
+"""
+Live per-user events over Redis pub/sub, streamed to browsers as
+Server-Sent Events by GET /sms/events.
+
+Writers publish after they commit:
+- "delivery": delivery status changes, one event per user per ingested
+  batch of reports ({"updates": [{message_id, phone, status, received_at}]})
+- "campaign": campaign progress after each chunk (same fields as
+  GET /sms/campaigns/{uuid})
+
+Each API process holds one pub/sub connection, read by one task that
+hands every event to the queues of the streams open for its user. The
+process subscribes only to the channels of the users it is streaming to,
+so an update costs one PUBLISH and no database reads, and open streams do
+not cost a Redis connection each. Pub/sub does not store messages: a
+client that reconnects should reload its page once and then rely on the
+stream. A stream too slow to keep up loses events rather than holding
+memory. Publishing fails open.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from redis.exceptions import RedisError
+
+from core.config import SMS_EVENTS_KEEPALIVE_SECONDS
+from core.worker_config import async_redis_conn, redis_conn
+
+
+def channel(user_id: int) -> str:
+    return f"sms:events:user:{user_id}"
+
+
+def publish(user_id: int, event: str, data: dict, connection=None) -> None:
+    """Send `event` to the user's open streams."""
+    try:
+        (connection or redis_conn).publish(channel(user_id), json.dumps({"event": event, "data": data}, default=str))
+    except RedisError as e:
+        print(f"Live events unavailable, {event} event for user {user_id} not published: {e}")
+
+
+def publish_deliveries(rows: list, connection=None) -> None:
+    """One "delivery" event per user for written delivery report rows (see callback_ingest_service)."""
+    by_user = {}
+    for row in rows:
+        if row["user_id"]:
+            by_user.setdefault(row["user_id"], []).append({
+                "message_id": row["message_id"],
+                "phone": row["phone"],
+                "status": row["status"].upper(),
+                "received_at": row["received_at"].isoformat(),
+            })
+    for user_id, updates in by_user.items():
+        publish(user_id, "delivery", {"updates": updates}, connection)
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# Events buffered per open stream before new ones are dropped
+_QUEUE_SIZE = 100
+
+
+class _Subscriber:
+    """The process's pub/sub connection and the queues of the streams it feeds."""
+
+    def __init__(self, connection=None):
+        self.connection = connection or async_redis_conn
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._queues: Dict[int, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def add(self, user_id: int) -> asyncio.Queue:
+        """A queue receiving the user's events, subscribing to the user's channel if needed."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.connection.pubsub()
+            if user_id not in self._queues:
+                await self._pubsub.subscribe(channel(user_id))
+                self._queues[user_id] = set()
+            self._queues[user_id].add(queue)
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+        return queue
+
+    async def remove(self, user_id: int, queue: asyncio.Queue) -> None:
+        """Stop feeding `queue`; unsubscribes from the user's channel after its last stream."""
+        async with self._lock:
+            queues = self._queues.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+                await self._pubsub.unsubscribe(channel(user_id))
+
+    def _dispatch(self, message: dict) -> None:
+        name = message["channel"]
+        user_id = int((name.decode() if isinstance(name, bytes) else name).rsplit(":", 1)[1])
+        payload = json.loads(message["data"])
+        for queue in self._queues.get(user_id, ()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                print(f"Live events: stream of user {user_id} is not keeping up, {payload['event']} event dropped")
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queues:
+                await asyncio.sleep(1)
+                continue
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    self._dispatch(message)
+            except RedisError as e:
+                # The pub/sub connection subscribes to its channels again when it reconnects
+                print(f"Live events subscriber lost Redis: {e}")
+                await asyncio.sleep(1)
+            except Exception as e:
+                print(f"Live events subscriber: could not dispatch an event: {e}")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        self._task = self._pubsub = None
+        self._queues.clear()
+
+
+_subscriber = _Subscriber()
+
+
+async def close() -> None:
+    """Close the process's subscription (application shutdown)."""
+    try:
+        await _subscriber.close()
+    except Exception as e:
+        print(f"Live events: error closing the subscriber: {e}")
+
+
+async def stream(user_id: int, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """SSE frames of the user's events until the client disconnects, with keep-alive comments."""
+    queue = await _subscriber.add(user_id)
+    try:
+        yield ": connected\n\n"
+        last_sent = time.monotonic()
+        while not await is_disconnected():
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                payload = None
+            if payload:
+                yield _sse(payload["event"], json.dumps(payload["data"]))
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SMS_EVENTS_KEEPALIVE_SECONDS:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        try:
+            await _subscriber.remove(user_id, queue)
+        except Exception as e:
+            # Runs as the client goes away; any error here must not escape the response
+            print(f"Live events stream for user {user_id}: could not unsubscribe: {e}")
@@ -0,0 +1,110 @@
+# backend/app/services/partition_service.py
+"""
+Maintenance of the monthly range partitions of sent_messages (sent_at) and
+sms_callbacks (received_at).
+
+- ensure_partitions: create the partitions for the current month and the
+  next SMS_PARTITION_MONTHS_AHEAD months, so inserts never miss a partition
+- apply_retention: detach (or drop) partitions whose month ended more than
+  SMS_PARTITION_RETENTION_MONTHS ago. Detached partitions stay behind as
+  standalone tables, to be archived (e.g. pg_dump) and dropped out of band.
+
+Partitions are named <table>_yYYYYmMM and created by the
+create_monthly_partition() SQL function from db/migrations/005. Rows of a
+month whose partition is missing land in <table>_default (migration 010)
+instead of failing, and are moved into the month's partition when it is
+created. The API and the workers also run `ensure_partitions_on_startup`,
+so a missed cron run is covered by the next deploy or restart.
+"""
+import re
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.deps import SessionLocal
+from core.config import (
+    SMS_PARTITION_MONTHS_AHEAD, SMS_PARTITION_RETENTION_ACTION, SMS_PARTITION_RETENTION_MONTHS
+)
+
+PARTITIONED_TABLES = ("sent_messages", "sms_callbacks")
+_PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partitions(db: Session, table: str) -> List[str]:
+    """Names of the partitions currently attached to `table`."""
+    return db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table ORDER BY child.relname"
+        ),
+        {"table": table},
+    ).scalars().all()
+
+
+def ensure_partitions(db: Session, months_ahead: int = SMS_PARTITION_MONTHS_AHEAD, today: date = None) -> List[str]:
+    """Create any missing partitions up to `months_ahead` months from now. Returns the names created."""
+    this_month = (today or date.today()).replace(day=1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = set(partitions(db, table))
+        for offset in range(max(0, months_ahead) + 1):
+            month = _add_months(this_month, offset)
+            name = db.execute(
+                text("SELECT create_monthly_partition(:table, :month)"),
+                {"table": table, "month": month},
+            ).scalar()
+            if name not in existing:
+                created.append(name)
+    db.commit()
+    return created
+
+
+def ensure_partitions_on_startup() -> None:
+    """`ensure_partitions` in its own session; logs instead of raising, so a start never fails on it."""
+    try:
+        with SessionLocal() as db:
+            created = ensure_partitions(db)
+        if created:
+            print(f"Created partitions: {', '.join(created)}")
+    except Exception as e:
+        print(f"Could not ensure partitions at startup: {e}")
+
+
+def apply_retention(
+    db: Session,
+    retention_months: int = SMS_PARTITION_RETENTION_MONTHS,
+    action: str = SMS_PARTITION_RETENTION_ACTION,
+    today: date = None,
+) -> List[str]:
+    """
+    Detach partitions older than `retention_months` full months ("detach"),
+    or detach and drop them ("drop"). A retention of 0 keeps everything.
+    Returns the names handled.
+    """
+    if retention_months <= 0:
+        return []
+    if action not in ("detach", "drop"):
+        raise ValueError(f"Unknown partition retention action: {action}")
+
+    cutoff = _add_months((today or date.today()).replace(day=1), -retention_months)
+    handled = []
+    for table in PARTITIONED_TABLES:
+        for name in partitions(db, table):
+            match = _PARTITION_SUFFIX.search(name)
+            if not match or date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+                continue
+            db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if action == "drop":
+                db.execute(text(f'DROP TABLE "{name}"'))
+            db.commit()
+            handled.append(name)
+    return handled
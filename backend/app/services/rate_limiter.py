@@ -0,0 +1,91 @@
+# backend/app/services/rate_limiter.py
+"""Distributed token-bucket rate limiting backed by Redis."""
+import asyncio
+import math
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from core.config import (
+    API_ID,
+    SMS_GATEWAY_RATE_BURST,
+    SMS_GATEWAY_RATE_LIMIT,
+    SMS_SENDER_RATE_BURST,
+    SMS_SENDER_RATE_LIMIT,
+)
+from core.worker_config import redis_conn
+
+# Refill and take tokens atomically. Uses Redis server time so every API host
+# and worker shares one clock. Returns "0" when the tokens were taken, else the
+# number of seconds to wait before enough tokens are available (nothing taken).
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket shared by every process through Redis: `rate` tokens per
+    second refill up to `burst`. Fails open (no limiting) if Redis is down, so
+    an outage of the limiter never stops sending.
+    """
+
+    def __init__(self, key: str, rate: float, burst: Optional[int] = None, connection=None):
+        self.key = key
+        self.rate = rate
+        self.burst = max(1, burst or math.ceil(rate))
+        self.connection = connection or redis_conn
+        self._script = self.connection.register_script(_TOKEN_BUCKET_LUA)
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """Take `tokens` if available. Returns 0.0 on success, else seconds to wait."""
+        try:
+            return float(self._script(keys=[self.key], args=[self.rate, self.burst, tokens]))
+        except RedisError as e:
+            print(f"Rate limiter {self.key} unavailable, not limiting: {e}")
+            return 0.0
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Wait until `tokens` have been taken; large requests are taken a burst at a
+        time. The Redis round-trip runs in a worker thread, off the event loop.
+        """
+        remaining = tokens
+        while remaining > 0:
+            step = min(remaining, self.burst)
+            wait = await asyncio.to_thread(self.try_acquire, step)
+            if wait <= 0:
+                remaining -= step
+            else:
+                await asyncio.sleep(wait)
+
+
+def gateway_limiters(sender_alias: Optional[str]) -> list:
+    """Limiters that apply to a send: the gateway account and, if configured, the sender alias."""
+    limiters = []
+    if SMS_GATEWAY_RATE_LIMIT > 0:
+        limiters.append(TokenBucketRateLimiter(
+            f"sms:ratelimit:gateway:{API_ID}", SMS_GATEWAY_RATE_LIMIT, SMS_GATEWAY_RATE_BURST,
+        ))
+    if SMS_SENDER_RATE_LIMIT > 0 and sender_alias:
+        limiters.append(TokenBucketRateLimiter(
+            f"sms:ratelimit:sender:{API_ID}:{sender_alias}", SMS_SENDER_RATE_LIMIT, SMS_SENDER_RATE_BURST,
+        ))
+    return limiters
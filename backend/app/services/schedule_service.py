@@ -0,0 +1,192 @@
+# backend/app/services/schedule_service.py
+"""
+Bulk creation of SMS schedules.
+
+Scheduled recipients are written to `scheduled_messages` with multi-row
+INSERTs of SMS_SCHEDULE_INSERT_CHUNK_SIZE rows, one transaction per chunk,
+instead of one ORM object (and possibly one commit) per recipient. The
+schedule row goes out with the first chunk as a `draft`, which claimers
+skip, and becomes `pending` in the transaction of the last chunk, so no
+message of a schedule is sent before all of them are stored. If a chunk
+fails the draft is deleted again (its messages cascade). Async handlers can
+call `create_schedule` through `await db.run_sync(...)`.
+
+Due messages are claimed by workers with `claim_due_messages` (row locks
+taken with SKIP LOCKED, so parallel workers never pick the same message)
+and schedule statuses are derived from one GROUP BY in
+`refresh_schedule_status`.
+"""
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from core.config import SMS_SCHEDULE_INSERT_CHUNK_SIZE
+from models.enums import MessageStatusEnum, ScheduleStatusEnum
+from models.scheduled_message import SmsScheduledMessage
+from models.sms_schedule import SmsSchedule
+
+
+def _chunks(messages: Iterable[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    chunk = []
+    for item in messages:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def create_schedule(
+    db: Session,
+    user_id: int,
+    sender_id: int,
+    title: str,
+    scheduled_for: datetime,
+    messages: Iterable[Tuple[str, str]],
+    now: datetime,
+    chunk_size: int = SMS_SCHEDULE_INSERT_CHUNK_SIZE,
+) -> Tuple[uuid.UUID, int]:
+    """
+    Create a pending schedule for (phone, message) pairs and commit it.
+    Returns (schedule uuid, number of scheduled messages). Raises ValueError
+    if there are no messages.
+    """
+    chunks = _chunks(messages, max(1, chunk_size))
+    chunk = next(chunks, None)
+    if chunk is None:
+        raise ValueError("A schedule needs at least one message")
+
+    schedule_uuid = uuid.uuid4()
+    schedule_id = db.execute(
+        insert(SmsSchedule).returning(SmsSchedule.id),
+        {
+            "uuid": schedule_uuid,
+            "user_id": user_id,
+            "sender_id": sender_id,
+            "title": title,
+            "scheduled_for": scheduled_for,
+            "status": ScheduleStatusEnum.draft.value,
+            "created_at": now,
+            "updated_at": now,
+        },
+    ).scalar_one()
+
+    total = 0
+    try:
+        while chunk is not None:
+            db.execute(
+                insert(SmsScheduledMessage).values([
+                    {
+                        "schedule_id": schedule_id,
+                        "phone_number": phone,
+                        "message": message,
+                        "status": MessageStatusEnum.pending.value,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for phone, message in chunk
+                ])
+            )
+            total += len(chunk)
+            chunk = next(chunks, None)
+            if chunk is None:
+                # Claimable only once the last chunk is stored
+                db.execute(
+                    update(SmsSchedule)
+                    .where(SmsSchedule.id == schedule_id)
+                    .values(status=ScheduleStatusEnum.pending.value)
+                )
+            db.commit()
+    except Exception:
+        db.rollback()
+        db.execute(
+            delete(SmsSchedule).where(
+                SmsSchedule.id == schedule_id, SmsSchedule.status == ScheduleStatusEnum.draft.value
+            )
+        )
+        db.commit()
+        raise
+
+    return schedule_uuid, total
+
+
+def due_messages_query(now: datetime, run_started: datetime, limit: int):
+    """
+    Up to `limit` pending or failed messages of due schedules, locked with
+    SKIP LOCKED. Messages touched since `run_started` are left for the next
+    run, so a failure is not retried within the same run.
+    """
+    return (
+        select(SmsScheduledMessage)
+        .join(SmsSchedule, SmsSchedule.id == SmsScheduledMessage.schedule_id)
+        .where(
+            SmsSchedule.status.in_([
+                ScheduleStatusEnum.pending.value,
+                ScheduleStatusEnum.partial.value,
+                ScheduleStatusEnum.failed.value,
+            ]),
+            SmsSchedule.scheduled_for <= now,
+            SmsScheduledMessage.status.in_([
+                MessageStatusEnum.pending.value,
+                MessageStatusEnum.failed.value,
+            ]),
+            SmsScheduledMessage.updated_at < run_started,
+        )
+        .order_by(SmsScheduledMessage.schedule_id, SmsScheduledMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=SmsScheduledMessage)
+    )
+
+
+def claim_due_messages(db: Session, now: datetime, run_started: datetime, limit: int) -> List[SmsScheduledMessage]:
+    """Claim a batch from `due_messages_query`; the row locks last until the caller commits."""
+    return db.execute(due_messages_query(now, run_started, limit)).scalars().all()
+
+
+def schedule_status(total: int, sent: int, failed: int) -> ScheduleStatusEnum:
+    """Schedule status from its message counts."""
+    if sent + failed == total:
+        if sent == total:
+            return ScheduleStatusEnum.sent
+        if failed == total:
+            return ScheduleStatusEnum.failed
+        return ScheduleStatusEnum.partial
+    if sent or failed:
+        return ScheduleStatusEnum.partial
+    return ScheduleStatusEnum.pending
+
+
+def status_counts_query(schedule_ids: Sequence[int]):
+    """(schedule_id, total, sent, failed) message counts per schedule."""
+    return (
+        select(
+            SmsScheduledMessage.schedule_id,
+            func.count(),
+            func.count().filter(SmsScheduledMessage.status == MessageStatusEnum.sent.value),
+            func.count().filter(SmsScheduledMessage.status == MessageStatusEnum.failed.value),
+        )
+        .where(SmsScheduledMessage.schedule_id.in_(schedule_ids))
+        .group_by(SmsScheduledMessage.schedule_id)
+    )
+
+
+def refresh_schedule_status(db: Session, schedule_ids: Sequence[int], now: datetime) -> Dict[int, ScheduleStatusEnum]:
+    """Recompute the status of the given schedules from one GROUP BY over their messages."""
+    if not schedule_ids:
+        return {}
+    counts = db.execute(status_counts_query(schedule_ids)).all()
+
+    statuses = {}
+    for schedule_id, total, sent, failed in counts:
+        status = schedule_status(total, sent, failed)
+        db.execute(
+            update(SmsSchedule)
+            .where(SmsSchedule.id == schedule_id)
+            .values(status=status.value, updated_at=now)
+        )
+        statuses[schedule_id] = status
+    return statuses
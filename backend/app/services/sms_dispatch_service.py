@@ -0,0 +1,68 @@
+# backend/app/services/sms_dispatch_service.py
+"""Bounded concurrent fan-out of gateway sends."""
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from core.config import SMS_BULK_CHUNK_SIZE, SMS_BULK_SEND_ENABLED, SMS_DISPATCH_CONCURRENCY
+from services.sms_gateway_service import SmsGatewayService
+
+
+class SmsDispatcher:
+    """
+    Sends many (phone, message) pairs through one SmsGatewayService with at
+    most `concurrency` requests in flight. Recipients sharing an identical
+    message are batched into multi-recipient submissions (send_bulk) when
+    SMS_BULK_SEND_ENABLED is set. Results are returned in input order; an
+    exception raised for a submission is returned in each of its slots
+    instead of cancelling the rest.
+    """
+
+    def __init__(
+        self,
+        sms_service: SmsGatewayService,
+        concurrency: Optional[int] = None,
+        bulk: Optional[bool] = None,
+    ):
+        self.sms_service = sms_service
+        self.concurrency = max(1, concurrency or SMS_DISPATCH_CONCURRENCY)
+        self.bulk = SMS_BULK_SEND_ENABLED if bulk is None else bulk
+
+    def _batches(self, messages: Sequence[Tuple[str, str]]) -> List[Tuple[List[int], str]]:
+        """Group input indices into submissions: (indices, message)."""
+        if not self.bulk:
+            return [([idx], msg) for idx, (_, msg) in enumerate(messages)]
+
+        by_message: Dict[str, List[int]] = {}
+        for idx, (_, msg) in enumerate(messages):
+            by_message.setdefault(msg, []).append(idx)
+
+        chunk_size = max(1, SMS_BULK_CHUNK_SIZE)
+        batches = []
+        for msg, indices in by_message.items():
+            for i in range(0, len(indices), chunk_size):
+                batches.append((indices[i:i + chunk_size], msg))
+        return batches
+
+    async def send_many(
+        self,
+        messages: Sequence[Tuple[str, str]],
+        **kwargs,
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Union[Dict[str, Any], BaseException, None]] = [None] * len(messages)
+
+        async def _submit(indices: List[int], message: str) -> None:
+            phones = [messages[idx][0] for idx in indices]
+            async with semaphore:
+                try:
+                    if len(phones) == 1:
+                        batch_results = [await self.sms_service.send_sms_with_parts_check(phones[0], message, **kwargs)]
+                    else:
+                        batch_results = await self.sms_service.send_bulk(phones, message, chunk_size=len(phones), **kwargs)
+                except Exception as e:
+                    batch_results = [e] * len(indices)
+            for idx, result in zip(indices, batch_results):
+                results[idx] = result
+
+        await asyncio.gather(*(_submit(indices, msg) for indices, msg in self._batches(messages)))
+        return results
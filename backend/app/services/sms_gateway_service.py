@@ -1,7 +1,14 @@
+import asyncio
+import re
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Sequence
 from fastapi import HTTPException
-from core.config import API_ID, API_PASSWORD, SMS_CALLBACK_URL
+from core.config import (
+    API_ID, API_PASSWORD, SMS_CALLBACK_URL, SMS_BULK_CHUNK_SIZE, SMS_DISPATCH_CONCURRENCY
+)
+from services.http_client import get_http_client
+from services.rate_limiter import gateway_limiters
+from services.circuit_breaker import gateway_circuit_breaker
 
 GSM_7BIT_BASIC = (
     "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1BÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?¡"
@@ -10,6 +17,11 @@ GSM_7BIT_BASIC = (
 )
 GSM_7BIT_EXTENDED = "^{}\\[~]|€"
 
+# Precompiled character-class lookups: one C-level scan per message instead
+# of a Python loop with a linear `in` search per character.
+_NON_GSM7_CHAR = re.compile("[^" + re.escape(GSM_7BIT_BASIC + GSM_7BIT_EXTENDED) + "]")
+_GSM7_EXTENDED_CHAR = re.compile("[" + re.escape(GSM_7BIT_EXTENDED) + "]")
+
 
 class SmsGatewayService:
     BASE_URL = "https://api.sprintsmsservice.com/api/SendSMS"
@@ -21,18 +33,16 @@ class SmsGatewayService:
         self.api_id = API_ID
         self.api_password = API_PASSWORD
         self.sender_id = sender_id
+        # Sender-alias bucket first, then the shared gateway account bucket
+        self.rate_limiters = list(reversed(gateway_limiters(sender_id)))
+        self.circuit_breaker = gateway_circuit_breaker()
 
     @staticmethod
     def count_gsm7_septets(message: str) -> Optional[int]:
-        count = 0
-        for ch in message:
-            if ch in GSM_7BIT_BASIC:
-                count += 1
-            elif ch in GSM_7BIT_EXTENDED:
-                count += 2
-            else:
-                return None
-        return count
+        if _NON_GSM7_CHAR.search(message):
+            return None
+        # Extended characters take an escape septet plus the character itself
+        return len(message) + len(_GSM7_EXTENDED_CHAR.findall(message))
 
     @staticmethod
     def get_sms_parts_and_length(message: str) -> tuple[int, int, str]:
@@ -49,7 +59,25 @@ class SmsGatewayService:
             parts = (length + 66) // 67
             return parts, 67, "UCS-2"
 
-    async def send_sms(
+    @staticmethod
+    def get_sms_parts_for_many(messages: Iterable[str]) -> List[tuple[int, int, str]]:
+        """
+        Batch form of get_sms_parts_and_length: one (parts, max_chars_per_part,
+        encoding) tuple per message, in input order. Runs of identical messages
+        (the usual non-personalized campaign) are only measured once.
+        """
+        measure = SmsGatewayService.get_sms_parts_and_length
+        results = []
+        previous = None
+        info = None
+        for message in messages:
+            if info is None or message != previous:
+                info = measure(message)
+                previous = message
+            results.append(info)
+        return results
+
+    def _build_payload(
         self,
         phone_number: str,
         message: str,
@@ -78,25 +106,75 @@ class SmsGatewayService:
             "pe_id": pe_id,
             "template_id": dlt_template_id,
         }
-        payload = {k: v for k, v in payload.items() if v is not None}
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(self.BASE_URL, json=payload, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-            except httpx.HTTPStatusError as e:
-                return {
-                    "success": False,
-                    "message": f"HTTP error: {e.response.status_code}",
-                    "data": {"details": e.response.text},
-                }
-            except httpx.RequestError as e:
-                return {
-                    "success": False,
-                    "message": "Request error: " + str(e),
-                    "data": None,
-                }
+        return {k: v for k, v in payload.items() if v is not None}
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST to the gateway. Returns {"success": True, "data": <json>} or an error
+        result. While the circuit breaker is open nothing is sent and the error
+        carries "retry_after" (seconds). The breaker's Redis calls run in worker
+        threads so they do not block the event loop.
+        """
+        retry_after = await asyncio.to_thread(self.circuit_breaker.retry_after)
+        if retry_after > 0:
+            return {
+                "success": False,
+                "message": "Gateway temporarily unavailable (circuit open)",
+                "data": None,
+                "retry_after": retry_after,
+            }
+
+        recipients = str(payload.get("phonenumber", "")).count(",") + 1
+        for limiter in self.rate_limiters:
+            await limiter.acquire(recipients)
+
+        client = get_http_client()
+        try:
+            response = await client.post(self.BASE_URL, json=payload)
+            response.raise_for_status()
+            await asyncio.to_thread(self.circuit_breaker.record, True)
+            return {"success": True, "data": response.json()}
+        except httpx.HTTPStatusError as e:
+            # Only server-side errors and throttling count against the gateway
+            status_code = e.response.status_code
+            await asyncio.to_thread(self.circuit_breaker.record, status_code < 500 and status_code != 429)
+            return {
+                "success": False,
+                "message": f"HTTP error: {status_code}",
+                "data": {"details": e.response.text},
+            }
+        except httpx.RequestError as e:
+            await asyncio.to_thread(self.circuit_breaker.record, False)
+            return {
+                "success": False,
+                "message": "Request error: " + str(e),
+                "data": None,
+            }
+
+    async def send_sms(
+        self,
+        phone_number: str,
+        message: str,
+        uid: Optional[str] = None,
+        callback_url: Optional[str] = None,
+        templateid: Optional[str] = None,
+        validity_seconds: int = 172800,
+        pe_id: Optional[str] = None,
+        dlt_template_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        payload = self._build_payload(
+            phone_number, message,
+            uid=uid,
+            callback_url=callback_url,
+            templateid=templateid,
+            validity_seconds=validity_seconds,
+            pe_id=pe_id,
+            dlt_template_id=dlt_template_id,
+        )
+        posted = await self._post(payload)
+        if not posted["success"]:
+            return posted
+        data = posted["data"]
 
         if data.get("status") == "S":
             return {
@@ -115,6 +193,120 @@ class SmsGatewayService:
                 "data": {"error": data.get("remarks", "Unknown error")},
             }
 
+    @staticmethod
+    def _bulk_message_ids(data: Any, chunk: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """
+        Attribute gateway message IDs to recipients of a multi-recipient submission.
+        Accepts a per-recipient list (keyed by phone or positional) or a
+        comma-separated message_id string. Returns None if it cannot be mapped.
+        """
+        entries = data
+        if isinstance(data, dict):
+            entries = data.get("messages") or data.get("data")
+            if not isinstance(entries, list):
+                message_id = data.get("message_id")
+                if message_id is None:
+                    return None
+                ids = [i.strip() for i in str(message_id).split(",")]
+                if len(ids) != len(chunk):
+                    return None
+                return dict(zip(chunk, ids))
+
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            return None
+
+        mapped = {}
+        for entry in entries:
+            phone = entry.get("phonenumber") or entry.get("PhoneNumber") or entry.get("mobile")
+            if phone is not None:
+                mapped[str(phone)] = entry.get("message_id")
+        if mapped:
+            return mapped
+        if len(entries) == len(chunk):
+            return {phone: entry.get("message_id") for phone, entry in zip(chunk, entries)}
+        return None
+
+    async def _send_bulk_chunk(self, chunk: List[str], message: str, **kwargs) -> List[Dict[str, Any]]:
+        if len(chunk) == 1:
+            return [await self.send_sms(chunk[0], message, **kwargs)]
+
+        posted = await self._post(self._build_payload(",".join(chunk), message, **kwargs))
+        if not posted["success"]:
+            return [posted] * len(chunk)
+        data = posted["data"]
+
+        status = data.get("status") if isinstance(data, dict) else None
+        if isinstance(data, dict) and status != "S":
+            failed = {
+                "success": False,
+                "message": "Failed to send message",
+                "data": {"error": data.get("remarks", "Unknown error")},
+            }
+            return [failed] * len(chunk)
+
+        # The gateway accepted the chunk, so it is never resubmitted. If the response
+        # cannot be attributed per recipient, the results carry only the batch id and
+        # are flagged unmatched_batch: their delivery reports cannot be matched
+        message_ids = self._bulk_message_ids(data, chunk)
+        batch_id = data.get("message_id") if isinstance(data, dict) else None
+        unmatched = message_ids is None
+        return [
+            {
+                "success": True,
+                "message": (
+                    "Message sent (gateway message id not matched to recipient)" if unmatched
+                    else "Message sent successfully"
+                ),
+                "data": {
+                    "message_id": None if unmatched else message_ids.get(phone),
+                    "batch_message_id": batch_id,
+                    "unmatched_batch": unmatched,
+                    "remarks": data.get("remarks") if isinstance(data, dict) else None,
+                },
+            }
+            for phone in chunk
+        ]
+
+    async def send_bulk(
+        self,
+        phone_numbers: Sequence[str],
+        message: str,
+        chunk_size: Optional[int] = None,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        """
+        Send one identical message to many recipients using multi-recipient
+        gateway submissions of at most `chunk_size` numbers each. Returns one
+        result per phone number, in input order, shaped like send_sms_with_parts_check.
+        """
+        parts, per_part_len, encoding = self.get_sms_parts_and_length(message)
+        chunk_size = max(1, chunk_size or SMS_BULK_CHUNK_SIZE)
+        phone_numbers = list(phone_numbers)
+        chunks = [phone_numbers[i:i + chunk_size] for i in range(0, len(phone_numbers), chunk_size)]
+        semaphore = asyncio.Semaphore(max(1, SMS_DISPATCH_CONCURRENCY))
+
+        async def _run(chunk: List[str]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._send_bulk_chunk(chunk, message, **kwargs)
+
+        chunk_results = await asyncio.gather(*(_run(chunk) for chunk in chunks))
+
+        results = []
+        for chunk_result in chunk_results:
+            for result in chunk_result:
+                result = dict(result)
+                result["data"] = dict(result.get("data") or {})
+                result["data"].update(
+                    {
+                        "num_parts": parts,
+                        "encoding": encoding,
+                        "max_chars_per_part": per_part_len,
+                        "message_length": len(message),
+                    }
+                )
+                results.append(result)
+        return results
+
     async def send_sms_with_parts_check(
         self,
         phone_number: str,
@@ -126,7 +318,7 @@ class SmsGatewayService:
             raise HTTPException(status_code=400, detail="Message contains unsupported characters")
 
         result = await self.send_sms(phone_number, message, **kwargs)
-        result["data"] = result.get("data", {})
+        result["data"] = result.get("data") or {}
         result["data"].update(
             {
                 "num_parts": parts,
@@ -0,0 +1,162 @@
+# backend/app/services/stats_service.py
+"""
+Per-user daily SMS counters for the dashboard.
+
+`user_daily_stats` holds one row per user and EAT day with the number of
+messages and parts sent and the delivery reports received (all, delivered,
+failed). Send paths call `record_sent` once per batch and delivery report
+ingestion calls `record_callbacks`, each an INSERT ... ON CONFLICT DO UPDATE
+that increments the rows, so /auth/dashboard/stats reads two rows instead of
+counting sent_messages and sms_callbacks on every request.
+
+`backfill` rebuilds days from sent_messages / sms_callbacks, for existing
+data or to repair drift, and commits per day. The other functions do not
+commit; async handlers can call them through `await db.run_sync(fn, ...)`.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.enums import SmsDeliveryStatusEnum
+from models.sent_messages import SentMessage
+from models.sms_callback import SmsCallback
+from models.user_daily_stats import UserDailyStats
+from utils.timezone import now_eat
+
+DELIVERED_STATUSES = [
+    SmsDeliveryStatusEnum.delivered.value,
+    SmsDeliveryStatusEnum.acknowledged.value,
+    SmsDeliveryStatusEnum.accepted.value,
+]
+
+FAILED_STATUSES = [
+    SmsDeliveryStatusEnum.undeliverable.value,
+    SmsDeliveryStatusEnum.expired.value,
+    SmsDeliveryStatusEnum.rejected.value,
+    SmsDeliveryStatusEnum.failed.value,
+]
+
+COUNTERS = ("messages", "parts", "delivered", "failed", "callbacks")
+
+
+def _status_value(status) -> Optional[str]:
+    return status.value if isinstance(status, SmsDeliveryStatusEnum) else status
+
+
+def _row(user_id: int, day: Optional[date], **counts: int) -> dict:
+    return {"user_id": user_id, "day": day or now_eat().date(), **{name: counts.get(name, 0) for name in COUNTERS}}
+
+
+def _increment(db: Session, rows: List[dict]) -> None:
+    """Add the counters of `rows` (at most one per user and day) in one multi-row upsert."""
+    if not rows:
+        return
+    # Same lock order in every writer, so concurrent batches cannot deadlock
+    rows = sorted(rows, key=lambda row: (row["user_id"], row["day"]))
+    stmt = insert(UserDailyStats).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+        set_={name: getattr(UserDailyStats, name) + getattr(stmt.excluded, name) for name in COUNTERS},
+    ))
+
+
+def record_sent(db: Session, user_id: int, messages: int, parts: int, day: Optional[date] = None) -> None:
+    """Count `messages` sent messages of `parts` total parts for the user (today in EAT by default)."""
+    if messages > 0:
+        _increment(db, [_row(user_id, day, messages=messages, parts=parts)])
+
+
+def record_callbacks(db: Session, reports: Iterable[Tuple[int, object, Optional[date]]]) -> None:
+    """Count delivery reports given as (user id, status, day) in one statement."""
+    totals: Dict[Tuple[int, date], dict] = {}
+    for user_id, status, day in reports:
+        row = _row(user_id, day)
+        row = totals.setdefault((row["user_id"], row["day"]), row)
+        status = _status_value(status)
+        row["callbacks"] += 1
+        row["delivered"] += int(status in DELIVERED_STATUSES)
+        row["failed"] += int(status in FAILED_STATUSES)
+    _increment(db, list(totals.values()))
+
+
+def record_callback(db: Session, user_id: int, status, day: Optional[date] = None) -> None:
+    """Count one delivery report with `status` for the user."""
+    record_callbacks(db, [(user_id, status, day)])
+
+
+def day_stats(db: Session, user_id: int, days: Sequence[date]) -> Dict[date, Dict[str, int]]:
+    """Counters of the given days for the user; days without a row are all zeros."""
+    rows = db.execute(
+        select(UserDailyStats).where(UserDailyStats.user_id == user_id, UserDailyStats.day.in_(days))
+    ).scalars().all()
+    stats = {day: dict.fromkeys(COUNTERS, 0) for day in days}
+    for row in rows:
+        stats[row.day] = {name: getattr(row, name) for name in COUNTERS}
+    return stats
+
+
+def _day_query(day: date):
+    """
+    (user_id, day, counters...) of one EAT day, aggregated from sent_messages
+    and sms_callbacks. sent_at / received_at are stored as naive EAT, like the
+    days record_sent / record_callbacks count into, so the day's bounds are EAT
+    midnights compared without conversion.
+    """
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    sent = (
+        select(
+            SentMessage.user_id.label("user_id"),
+            func.count().label("messages"),
+            func.coalesce(func.sum(SentMessage.number_of_parts), 0).label("parts"),
+            literal(0).label("delivered"),
+            literal(0).label("failed"),
+            literal(0).label("callbacks"),
+        )
+        .where(SentMessage.sent_at >= start, SentMessage.sent_at < end)
+        .group_by(SentMessage.user_id)
+    )
+    callbacks = (
+        select(
+            SmsCallback.user_id,
+            literal(0),
+            literal(0),
+            func.count().filter(SmsCallback.status.in_(DELIVERED_STATUSES)),
+            func.count().filter(SmsCallback.status.in_(FAILED_STATUSES)),
+            func.count(),
+        )
+        .where(SmsCallback.user_id.isnot(None), SmsCallback.received_at >= start, SmsCallback.received_at < end)
+        .group_by(SmsCallback.user_id)
+    )
+    both = union_all(sent, callbacks).subquery()
+    return select(
+        both.c.user_id,
+        literal(day).label("day"),
+        *(func.sum(both.c[name]).label(name) for name in COUNTERS),
+    ).group_by(both.c.user_id)
+
+
+def backfill(db: Session, since: date, until: Optional[date] = None) -> int:
+    """
+    Rebuild the rows of days `since`..`until` (default today), one statement
+    and commit per day. Existing rows of those days are overwritten, so
+    increments landing on a day while it is rebuilt can be lost; backfill
+    before relying on the rollup, or for days that are over. Returns the
+    number of days rebuilt.
+    """
+    until = until or now_eat().date()
+    day = since
+    rebuilt = 0
+    while day <= until:
+        stmt = insert(UserDailyStats).from_select(["user_id", "day", *COUNTERS], _day_query(day))
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+            set_={name: getattr(stmt.excluded, name) for name in COUNTERS},
+        ))
+        db.commit()
+        rebuilt += 1
+        day += timedelta(days=1)
+    return rebuilt
@@ -0,0 +1,165 @@
+# backend/app/services/user_cache.py
+"""
+User uuid -> id resolution cache for delivery report ingestion.
+
+Callbacks carry the user's uuid and the same few hundred tenants repeat
+for every report, so resolved ids are kept in a bounded in-process LRU for
+USER_CACHE_TTL seconds. With USER_CACHE_REDIS the mapping is also shared
+through Redis, so a new process or flusher warms up without going to
+Postgres.
+
+Invalidations go through Redis whether or not the mapping is shared: they
+bump a generation counter that every process compares at most once a
+second, dropping its local entries when it moved, so a deleted user is
+forgotten everywhere within a second. Only while Redis is unreachable can
+another process keep a deleted user's entry, until its TTL. Such an entry
+holds the id of a user that no longer exists, and writing a report with it
+violates the users foreign key of sms_callbacks: the write fails (the
+flusher retries the report on its own and eventually dead-letters it).
+Redis errors are logged and the cache falls back to in-process only.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from core.config import USER_CACHE_REDIS, USER_CACHE_REDIS_TTL, USER_CACHE_SIZE, USER_CACHE_TTL
+from core.worker_config import redis_conn
+
+_KEY_PREFIX = "sms:user-id:"
+_GENERATION_KEY = "sms:user-id:generation"
+_GENERATION_CHECK_SECONDS = 1.0
+
+
+class UserIdCache:
+    """Bounded LRU with per-entry TTL, optionally backed by Redis. Thread-safe."""
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_SIZE,
+        ttl: float = USER_CACHE_TTL,
+        use_redis: bool = USER_CACHE_REDIS,
+        redis_ttl: int = USER_CACHE_REDIS_TTL,
+        connection=None,
+    ):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self.connection = connection or redis_conn
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: Optional[bytes] = None
+        self._generation_checked_at = 0.0
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_generation(self) -> None:
+        now = time.monotonic()
+        if now - self._generation_checked_at < _GENERATION_CHECK_SECONDS:
+            return
+        self._generation_checked_at = now
+        generation = self.connection.get(_GENERATION_KEY)
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+
+    def _put_local(self, mapping: Dict[str, int]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for user_uuid, user_id in mapping.items():
+                self._entries[user_uuid] = (user_id, expires_at)
+                self._entries.move_to_end(user_uuid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, user_uuids: Iterable[str]) -> Tuple[Dict[str, int], Set[str]]:
+        """(ids found in the cache, uuids that have to be looked up)."""
+        try:
+            self._check_generation()
+        except RedisError as e:
+            print(f"User cache: Redis unavailable, cannot see invalidations: {e}")
+
+        found: Dict[str, int] = {}
+        missing: Set[str] = set()
+        now = time.monotonic()
+        with self._lock:
+            for user_uuid in set(user_uuids):
+                entry = self._entries.get(user_uuid)
+                if entry and entry[1] > now:
+                    self._entries.move_to_end(user_uuid)
+                    found[user_uuid] = entry[0]
+                    self.hits += 1
+                else:
+                    if entry:
+                        del self._entries[user_uuid]
+                    missing.add(user_uuid)
+
+        if missing and self.use_redis:
+            ordered = sorted(missing)
+            try:
+                cached = self.connection.mget([_KEY_PREFIX + u for u in ordered])
+            except RedisError as e:
+                print(f"User cache: Redis unavailable, using the local cache only: {e}")
+                cached = [None] * len(ordered)
+            from_redis = {u: int(value) for u, value in zip(ordered, cached) if value is not None}
+            if from_redis:
+                self._put_local(from_redis)
+                found.update(from_redis)
+                missing.difference_update(from_redis)
+                with self._lock:
+                    self.redis_hits += len(from_redis)
+
+        with self._lock:
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, mapping: Dict[str, int]) -> None:
+        """Remember ids resolved from the database."""
+        if not mapping:
+            return
+        self._put_local(mapping)
+        if self.use_redis:
+            try:
+                pipe = self.connection.pipeline(transaction=False)
+                for user_uuid, user_id in mapping.items():
+                    pipe.set(_KEY_PREFIX + user_uuid, user_id, ex=self.redis_ttl)
+                pipe.execute()
+            except RedisError as e:
+                print(f"User cache: Redis unavailable, not sharing resolved ids: {e}")
+
+    def invalidate(self, user_uuid: str) -> None:
+        """Forget a user (e.g. when it is deleted) in every process, through the generation counter."""
+        with self._lock:
+            self._entries.pop(user_uuid, None)
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            pipe.delete(_KEY_PREFIX + user_uuid)
+            pipe.incr(_GENERATION_KEY)
+            pipe.execute()
+        except RedisError as e:
+            print(f"User cache: Redis unavailable, {user_uuid} only invalidated locally: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "redis": self.use_redis,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else None,
+            }
+
+
+user_id_cache = UserIdCache()
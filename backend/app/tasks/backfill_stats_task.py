@@ -0,0 +1,25 @@
+# backend/app/tasks/backfill_stats_task.py
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func
+
+from api.deps import SessionLocal
+from models.sent_messages import SentMessage
+from services import stats_service
+
+
+def backfill_daily_stats_task(since: Optional[date] = None, until: Optional[date] = None) -> dict:
+    """Worker function: rebuild the daily stats rollup, from the oldest sent message's day by default."""
+    db = SessionLocal()
+    try:
+        if since is None:
+            oldest = db.query(func.min(SentMessage.sent_at)).scalar()
+            if oldest is None:
+                return {"days": 0}
+            since = oldest.date()
+        days = stats_service.backfill(db, since, until)
+        print(f"Backfilled daily stats for {days} days from {since}")
+        return {"since": since.isoformat(), "days": days}
+    finally:
+        db.close()
@@ -0,0 +1,17 @@
+# backend/app/tasks/compact_callbacks_task.py
+from typing import Optional
+
+from api.deps import SessionLocal
+from services import callback_payload_service
+
+
+def compact_callback_payloads_task(older_than_days: Optional[int] = None) -> dict:
+    """Worker function: compact stored delivery report payloads, then measure sms_callbacks once."""
+    db = SessionLocal()
+    try:
+        compacted = callback_payload_service.compact_stored(db, older_than_days)
+        sizes = callback_payload_service.storage_sizes(db)
+        print(f"Compacted {compacted} callback payloads; sms_callbacks now {sizes}")
+        return {"rows_compacted": compacted, "sizes": sizes}
+    finally:
+        db.close()
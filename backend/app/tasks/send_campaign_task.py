@@ -0,0 +1,319 @@
+# backend/app/tasks/send_campaign_task.py
+import asyncio
+import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from api.deps import SessionLocal
+from models.sms_campaign import SmsCampaign
+from models.sender_id import SenderId
+from models.user import User
+from models.sent_messages import SentMessage
+from models.enums import CampaignStatusEnum
+from services.sms_gateway_service import SmsGatewayService
+from services.sms_dispatch_service import SmsDispatcher
+from services import credit_service, live_events, stats_service
+from core.config import SMS_CALLBACK_URL, SMS_CAMPAIGN_CHUNK_LEASE_SECONDS
+from tasks.send_sms_task import maybe_run_async
+from utils.timezone import now_eat
+
+
+def send_campaign_chunk_task(campaign_id: int, offset: int, limit: int):
+    """Worker function to send one chunk of a campaign's recipients."""
+    db: Session = SessionLocal()
+    try:
+        return maybe_run_async(process_campaign_chunk, db, campaign_id, offset, limit)
+    finally:
+        db.close()
+
+
+def _claim_chunk(db: Session, campaign_id: int, offset: int, limit: int) -> Optional[dict]:
+    """
+    Take the chunk at `offset` and return what is needed to send it, or None
+    if the campaign is gone or the chunk was already taken (an RQ retry or a
+    duplicated job). Committed before anything is sent, so each chunk is
+    sent at most once. The claim holds a lease until `_record_chunk`; if the
+    worker dies first, `reap_expired_chunks` refunds the chunk.
+    """
+    claimed_at = now_eat().isoformat(timespec="microseconds")
+    lease = func.jsonb_build_object(str(offset), func.jsonb_build_object("claimed_at", claimed_at, "limit", limit))
+    campaign = db.execute(
+        update(SmsCampaign)
+        .where(SmsCampaign.id == campaign_id, ~SmsCampaign.claimed_chunks.any(offset))
+        .values(
+            claimed_chunks=func.array_append(SmsCampaign.claimed_chunks, offset),
+            chunk_leases=SmsCampaign.chunk_leases.op("||")(lease),
+        )
+        .returning(
+            SmsCampaign.uuid,
+            SmsCampaign.user_id,
+            SmsCampaign.sender_id,
+            SmsCampaign.subscription_id,
+            SmsCampaign.message,
+            SmsCampaign.parts_per_message,
+            # Postgres arrays are 1-based and slices are inclusive
+            SmsCampaign.phone_numbers[offset + 1:offset + limit].label("phones"),
+        )
+    ).first()
+    if not campaign:
+        db.rollback()
+        return None
+
+    db.execute(
+        update(SmsCampaign)
+        .where(SmsCampaign.id == campaign_id, SmsCampaign.status == CampaignStatusEnum.pending)
+        .values(status=CampaignStatusEnum.processing)
+    )
+    sender_alias = db.execute(select(SenderId.alias).where(SenderId.id == campaign.sender_id)).scalar()
+    user_uuid = db.execute(select(User.uuid).where(User.id == campaign.user_id)).scalar()
+    db.commit()
+    return {
+        **campaign._asdict(),
+        "offset": offset,
+        "phones": campaign.phones or [],
+        "sender_alias": sender_alias,
+        "user_uuid": user_uuid,
+    }
+
+
+def _release_lease(db: Session, campaign_id: int, offset: int) -> bool:
+    """Remove the chunk's lease; False if the reaper already took it."""
+    key = str(offset)
+    return db.execute(
+        update(SmsCampaign)
+        .where(SmsCampaign.id == campaign_id, SmsCampaign.chunk_leases.has_key(key))
+        .values(chunk_leases=SmsCampaign.chunk_leases.op("-")(key))
+        .returning(SmsCampaign.id)
+    ).first() is not None
+
+
+def _count_chunk(
+    db: Session,
+    campaign_id: int,
+    processed: int,
+    sent: int,
+    failed: int,
+    last_error: Optional[str],
+    now: datetime.datetime,
+) -> Tuple[object, CampaignStatusEnum]:
+    """Add a chunk to the progress counters (one UPDATE) and complete the campaign once all are counted."""
+    progress = db.execute(
+        update(SmsCampaign)
+        .where(SmsCampaign.id == campaign_id)
+        .values(
+            processed_count=SmsCampaign.processed_count + processed,
+            sent_count=SmsCampaign.sent_count + sent,
+            failed_count=SmsCampaign.failed_count + failed,
+            last_error=last_error if last_error else SmsCampaign.last_error,
+            updated_at=now,
+        )
+        .returning(
+            SmsCampaign.processed_count,
+            SmsCampaign.total_recipients,
+            SmsCampaign.sent_count,
+            SmsCampaign.failed_count,
+        )
+    ).first()
+
+    status = CampaignStatusEnum.processing
+    if progress and progress.processed_count >= progress.total_recipients:
+        if progress.failed_count == 0:
+            final_status = CampaignStatusEnum.completed
+        elif progress.sent_count == 0:
+            final_status = CampaignStatusEnum.failed
+        else:
+            final_status = CampaignStatusEnum.partial
+        db.execute(
+            update(SmsCampaign)
+            .where(SmsCampaign.id == campaign_id)
+            .values(status=final_status, completed_at=now)
+        )
+        status = final_status
+    return progress, status
+
+
+def _record_chunk(
+    db: Session,
+    campaign_id: int,
+    campaign: dict,
+    sent_rows: List[dict],
+    last_error: Optional[str],
+    store_messages: bool = True,
+):
+    """
+    Write the outcome of a sent chunk in one transaction: sent messages (one
+    multi-row insert), a refund for recipients that were not sent, and the
+    progress counters (one UPDATE). Returns (progress, status).
+
+    If the chunk's lease expired and the reaper already counted the chunk as
+    failed and refunded it, the recipients that were sent are moved back
+    from failed to sent and their credits debited again.
+    """
+    now = now_eat()
+    parts_per_message = campaign["parts_per_message"]
+    sent = len(sent_rows)
+    failed = len(campaign["phones"]) - sent
+    subscription_id = campaign["subscription_id"]
+
+    if sent_rows and store_messages:
+        db.execute(insert(SentMessage), sent_rows)
+        stats_service.record_sent(db, campaign["user_id"], sent, sent * parts_per_message)
+
+    if _release_lease(db, campaign_id, campaign["offset"]):
+        # Refund reserved credits for recipients that were not sent
+        if failed and subscription_id:
+            credit_service.refund(db, subscription_id, failed * parts_per_message)
+        progress, status = _count_chunk(db, campaign_id, len(campaign["phones"]), sent, failed, last_error, now)
+    else:
+        # Best effort: if the balance was spent meanwhile, these messages stay free
+        if sent and subscription_id:
+            credit_service.reserve(db, subscription_id, sent * parts_per_message)
+        progress, status = _count_chunk(db, campaign_id, 0, sent, -sent, last_error, now)
+
+    db.commit()
+    return progress, status
+
+
+def _record_failed_chunk(db: Session, campaign_id: int, campaign: dict, sent_rows: List[dict], error: str):
+    """
+    After an unexpected error: count the chunk as processed and refund what was
+    not sent, so the campaign can still complete. Messages that did go out
+    are counted as sent; their sent_messages rows are not retried, as writing
+    them may be what failed.
+    """
+    db.rollback()
+    return _record_chunk(db, campaign_id, campaign, sent_rows, error, store_messages=False)
+
+
+def _publish_progress(campaign: dict, progress, status: CampaignStatusEnum) -> None:
+    if progress:
+        live_events.publish(campaign["user_id"], "campaign", {
+            "campaign_uuid": str(campaign["uuid"]),
+            "status": status.value,
+            "total_recipients": progress.total_recipients,
+            "processed": progress.processed_count,
+            "sent": progress.sent_count,
+            "failed": progress.failed_count,
+        })
+
+
+async def process_campaign_chunk(db: Session, campaign_id: int, offset: int, limit: int):
+    """
+    Send recipients [offset, offset + limit) of a campaign. The chunk is
+    claimed before sending, sender, user and callback URL are resolved once
+    for it, and its outcome is written with one multi-row insert and one
+    UPDATE of the progress counters. Credits were reserved when the campaign
+    was created, so recipients that were not sent are refunded here, also
+    when the chunk fails part way. Database work runs in worker threads so it
+    does not block the event loop.
+    """
+    campaign = None
+    sent_rows: List[dict] = []
+    try:
+        campaign = await asyncio.to_thread(_claim_chunk, db, campaign_id, offset, limit)
+        if campaign is None:
+            return {"success": False, "error": "Campaign not found or chunk already claimed"}
+
+        phones = campaign["phones"]
+        if not phones:
+            return {"success": True, "sent": 0, "failed": 0}
+
+        now = now_eat()
+        last_error = None
+
+        if not campaign["sender_alias"] or not campaign["user_uuid"]:
+            last_error = "Sender or user no longer exists"
+        else:
+            callback_url = f"{SMS_CALLBACK_URL}?id={campaign['user_uuid']}" if SMS_CALLBACK_URL else None
+            results = await SmsDispatcher(SmsGatewayService(campaign["sender_alias"])).send_many(
+                [(phone, campaign["message"]) for phone in phones],
+                callback_url=callback_url,
+            )
+            for phone, result in zip(phones, results):
+                if isinstance(result, BaseException):
+                    last_error = str(result)
+                    continue
+                if not result.get("success"):
+                    last_error = result.get("message", "Unknown error")
+                    continue
+                message_id = (result.get("data") or {}).get("message_id")
+                sent_rows.append({
+                    "sender_alias": campaign["sender_alias"],
+                    "user_id": campaign["user_id"],
+                    "phone_number": phone,
+                    "message": campaign["message"],
+                    "message_id": str(message_id) if message_id else None,
+                    "number_of_parts": campaign["parts_per_message"],
+                    "sent_at": now,
+                })
+
+        progress, status = await asyncio.to_thread(_record_chunk, db, campaign_id, campaign, sent_rows, last_error)
+        _publish_progress(campaign, progress, status)
+        sent = len(sent_rows)
+        failed = len(phones) - sent
+        return {"success": failed == 0, "sent": sent, "failed": failed}
+
+    except Exception as e:
+        print(f"Campaign {campaign_id} chunk at {offset} failed: {e}")
+        if campaign is None or not campaign["phones"]:
+            await asyncio.to_thread(db.rollback)
+            return {"success": False, "error": str(e)}
+        try:
+            progress, status = await asyncio.to_thread(
+                _record_failed_chunk, db, campaign_id, campaign, sent_rows, f"Unexpected error: {e}"
+            )
+            _publish_progress(campaign, progress, status)
+        except Exception as record_error:
+            print(f"Campaign {campaign_id} chunk at {offset}: could not record the failure: {record_error}")
+        return {"success": False, "error": str(e)}
+
+
+def reap_expired_chunks(db: Session, lease_seconds: int = SMS_CAMPAIGN_CHUNK_LEASE_SECONDS) -> int:
+    """
+    Refund chunks claimed more than `lease_seconds` ago and never recorded (the
+    worker died or hit the job timeout), counting their recipients as failed so
+    the campaign completes. They are not sent again: some of their messages
+    may already have gone out. Returns the number of chunks reaped.
+    """
+    cutoff = (now_eat() - datetime.timedelta(seconds=lease_seconds)).isoformat(timespec="microseconds")
+    leased = db.execute(
+        select(SmsCampaign.id, SmsCampaign.chunk_leases)
+        .where(SmsCampaign.status == CampaignStatusEnum.processing, SmsCampaign.chunk_leases != {})
+    ).all()
+    db.rollback()
+
+    reaped = 0
+    for campaign_id, leases in leased:
+        for key, lease in leases.items():
+            if lease["claimed_at"] >= cutoff:
+                continue
+            offset, limit = int(key), int(lease["limit"])
+            # Conditional on the same lease, so a chunk recorded meanwhile is left alone
+            campaign = db.execute(
+                update(SmsCampaign)
+                .where(SmsCampaign.id == campaign_id, SmsCampaign.chunk_leases[key]["claimed_at"].astext == lease["claimed_at"])
+                .values(chunk_leases=SmsCampaign.chunk_leases.op("-")(key))
+                .returning(
+                    SmsCampaign.uuid,
+                    SmsCampaign.user_id,
+                    SmsCampaign.subscription_id,
+                    SmsCampaign.parts_per_message,
+                    func.cardinality(SmsCampaign.phone_numbers[offset + 1:offset + limit]).label("recipients"),
+                )
+            ).first()
+            if not campaign:
+                db.rollback()
+                continue
+            recipients = campaign.recipients or 0
+            if recipients and campaign.subscription_id:
+                credit_service.refund(db, campaign.subscription_id, recipients * campaign.parts_per_message)
+            progress, status = _count_chunk(
+                db, campaign_id, recipients, 0, recipients,
+                f"Chunk at {offset} was not recorded within {lease_seconds}s; its credits were refunded",
+                now_eat(),
+            )
+            db.commit()
+            _publish_progress({"uuid": campaign.uuid, "user_id": campaign.user_id}, progress, status)
+            reaped += 1
+    return reaped
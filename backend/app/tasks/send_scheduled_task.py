@@ -0,0 +1,268 @@
+# backend/app/tasks/send_scheduled_task.py
+import asyncio
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from api.deps import SessionLocal
+from models.scheduled_message import SmsScheduledMessage
+from models.sms_schedule import SmsSchedule
+from models.sender_id import SenderId
+from models.user import User
+from models.user_subscription import UserSubscription
+from models.sent_messages import SentMessage
+from models.enums import MessageStatusEnum
+from services.sms_gateway_service import SmsGatewayService
+from services.sms_dispatch_service import SmsDispatcher
+from services import credit_service, schedule_service, stats_service
+from core.config import SMS_CALLBACK_URL, SMS_SCHEDULE_CLAIM_BATCH_SIZE
+from utils.validation import validate_phone
+from tasks.send_sms_task import maybe_run_async
+
+
+def _eat_now() -> datetime.datetime:
+    return datetime.datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
+
+
+def send_scheduled_batch_task(run_started: datetime.datetime):
+    """Worker function to send due scheduled messages until none are left for this run."""
+    db: Session = SessionLocal()
+    try:
+        return maybe_run_async(process_scheduled_messages, db, run_started)
+    finally:
+        db.close()
+
+
+class _BatchProgress:
+    """What a schedule batch has done so far, so a failure part way can be recorded."""
+
+    def __init__(self, messages: List[SmsScheduledMessage]):
+        self.schedule_id = messages[0].schedule_id
+        self.message_ids = [sm.id for sm in messages]
+        self.subscription_id: Optional[int] = None
+        self.reserved_parts = 0
+        self.sent_ids: List[int] = []
+        self.sent_parts = 0
+        self.failed = 0
+
+
+async def process_scheduled_messages(db: Session, run_started: datetime.datetime):
+    """
+    Claim batches of due scheduled messages and send them until no claimable
+    message is left. A batch holds messages of one schedule; its rows stay
+    locked while they are sent, so workers running in parallel skip them
+    instead of sending them twice, and its outcome (message statuses, sent
+    messages, refunds, schedule status) is committed right after sending.
+    Database work runs in worker threads so it does not block the event loop.
+    """
+    context_cache: Dict[int, tuple] = {}
+    sent_total = 0
+    failed_total = 0
+    schedules_touched = set()
+
+    while True:
+        now = _eat_now()
+        progress = None
+        try:
+            messages = await asyncio.to_thread(_claim_schedule_batch, db, now, run_started)
+            if not messages:
+                break
+            progress = _BatchProgress(messages)
+            await _send_schedule_batch(db, progress.schedule_id, messages, now, context_cache, progress)
+        except Exception as e:
+            print(f"Scheduled send batch failed: {e}")
+            if progress is not None:
+                await asyncio.to_thread(_record_failed_batch, db, progress, now, str(e))
+            else:
+                await asyncio.to_thread(db.rollback)
+            return {"success": False, "sent": sent_total, "failed": failed_total, "error": str(e)}
+
+        sent_total += len(progress.sent_ids)
+        failed_total += progress.failed
+        schedules_touched.add(progress.schedule_id)
+
+    return {"success": True, "sent": sent_total, "failed": failed_total, "schedules": len(schedules_touched)}
+
+
+def _claim_schedule_batch(db: Session, now: datetime.datetime, run_started: datetime.datetime) -> List[SmsScheduledMessage]:
+    """
+    Claim a batch and keep the messages of its first schedule. Rows of other
+    schedules in the claim are left untouched and unlocked by the batch's
+    commit, for this or another worker to claim next.
+    """
+    claimed = schedule_service.claim_due_messages(db, now, run_started, SMS_SCHEDULE_CLAIM_BATCH_SIZE)
+    if not claimed:
+        db.rollback()
+        return []
+    schedule_id = claimed[0].schedule_id
+    return [sm for sm in claimed if sm.schedule_id == schedule_id]
+
+
+def _schedule_context(db: Session, schedule_id: int, cache: Dict[int, tuple]):
+    """(user id, sender alias, active subscription id, callback url) of a schedule, resolved once per task."""
+    if schedule_id not in cache:
+        sched = db.get(SmsSchedule, schedule_id)
+        sender = db.get(SenderId, sched.sender_id)
+        subscription_id = db.execute(
+            select(UserSubscription.id).where(
+                UserSubscription.user_id == sched.user_id,
+                UserSubscription.status == "active"
+            )
+        ).scalars().first()
+        user_uuid = db.execute(select(User.uuid).where(User.id == sched.user_id)).scalar()
+        callback_url = f"{SMS_CALLBACK_URL}?id={user_uuid}"
+        cache[schedule_id] = (sched.user_id, sender.alias if sender else None, subscription_id, callback_url)
+    return cache[schedule_id]
+
+
+def _mark_failed(sm: SmsScheduledMessage, remarks: str, now: datetime.datetime):
+    sm.status = MessageStatusEnum.failed.value
+    sm.remarks = remarks
+    sm.updated_at = now
+
+
+def _reserve(subscription_id: int, parts_list: List[int]) -> List[bool]:
+    # Short transaction of its own so the subscription row is released before
+    # the gateway is called; the claimed rows stay locked in the task's session
+    with SessionLocal() as credit_db:
+        accepted, _ = credit_service.reserve_many(credit_db, subscription_id, parts_list)
+        credit_db.commit()
+    return accepted
+
+
+async def _send_schedule_batch(
+    db: Session,
+    schedule_id: int,
+    messages: List[SmsScheduledMessage],
+    now: datetime.datetime,
+    cache: Dict[int, tuple],
+    progress: _BatchProgress,
+) -> None:
+    """Send one claimed batch of a schedule and commit its outcome."""
+    user_id, sender_alias, subscription_id, callback_url = await asyncio.to_thread(
+        _schedule_context, db, schedule_id, cache
+    )
+    progress.subscription_id = subscription_id
+
+    # Check subscription, sender and phone format up front
+    candidates: List[Tuple[SmsScheduledMessage, int]] = []
+    parts_info = SmsGatewayService.get_sms_parts_for_many(sm.message for sm in messages)
+    for sm, (parts_needed, _, _) in zip(messages, parts_info):
+        if not subscription_id:
+            _mark_failed(sm, "Insufficient SMS balance or no active subscription", now)
+        elif sender_alias is None:
+            _mark_failed(sm, "Sender ID not found", now)
+        elif not validate_phone(sm.phone_number):
+            _mark_failed(sm, "Invalid phone number format", now)
+        else:
+            candidates.append((sm, parts_needed))
+            continue
+        progress.failed += 1
+
+    eligible = []
+    if candidates:
+        accepted = await asyncio.to_thread(_reserve, subscription_id, [parts for _, parts in candidates])
+        for (sm, parts_needed), ok in zip(candidates, accepted):
+            if ok:
+                eligible.append((sm, parts_needed))
+                progress.reserved_parts += parts_needed
+            else:
+                _mark_failed(sm, "Insufficient SMS balance for message parts", now)
+                progress.failed += 1
+
+    results = []
+    if eligible:
+        results = await SmsDispatcher(SmsGatewayService(sender_alias)).send_many(
+            [(sm.phone_number, sm.message) for sm, _ in eligible],
+            callback_url=callback_url,
+        )
+
+    sent_rows = []
+    for (sm, parts_needed), send_result in zip(eligible, results):
+        if isinstance(send_result, BaseException):
+            _mark_failed(sm, f"Unexpected error: {str(send_result)}", now)
+            progress.failed += 1
+            continue
+        if not send_result.get("success", False):
+            _mark_failed(sm, f"Gateway error: {send_result.get('message', 'Unknown')}", now)
+            progress.failed += 1
+            continue
+
+        sm.status = MessageStatusEnum.sent.value
+        sm.sent_at = now
+        sm.updated_at = now
+        sm.remarks = None
+        progress.sent_ids.append(sm.id)
+        progress.sent_parts += parts_needed
+
+        gateway_data = send_result.get("data", {}) or {}
+        message_id = gateway_data.get("message_id") if isinstance(gateway_data, dict) else None
+        sent_rows.append({
+            "sender_alias": sender_alias,
+            "user_id": user_id,
+            "phone_number": sm.phone_number,
+            "number_of_parts": parts_needed,
+            "message": sm.message,
+            "message_id": str(message_id) if message_id else None,
+            "sent_at": now,
+        })
+
+    await asyncio.to_thread(_record_batch, db, schedule_id, user_id, sent_rows, progress, now)
+
+
+def _record_batch(
+    db: Session,
+    schedule_id: int,
+    user_id: int,
+    sent_rows: List[dict],
+    progress: _BatchProgress,
+    now: datetime.datetime,
+) -> None:
+    """Store a sent batch (statuses were set on the claimed objects) in one transaction and commit."""
+    if sent_rows:
+        db.execute(insert(SentMessage), sent_rows)
+        stats_service.record_sent(db, user_id, len(sent_rows), progress.sent_parts, now.date())
+
+    # Reserved credits of messages that did not go out
+    unused_parts = progress.reserved_parts - progress.sent_parts
+    if unused_parts:
+        credit_service.refund(db, progress.subscription_id, unused_parts)
+
+    schedule_service.refresh_schedule_status(db, [schedule_id], now)
+    db.commit()
+    progress.reserved_parts = progress.sent_parts = 0
+
+
+def _record_failed_batch(db: Session, progress: _BatchProgress, now: datetime.datetime, error: str) -> None:
+    """
+    After an unexpected error: messages that went out are marked sent (their
+    sent_messages rows are not retried, as writing them may be what failed),
+    the rest of the batch failed for the next run, and reserved credits of
+    unsent messages are refunded, so nothing is re-sent or left reserved.
+    """
+    try:
+        db.rollback()
+        if progress.sent_ids:
+            db.execute(
+                update(SmsScheduledMessage)
+                .where(SmsScheduledMessage.id.in_(progress.sent_ids))
+                .values(status=MessageStatusEnum.sent.value, sent_at=now, updated_at=now, remarks=None)
+            )
+        sent_ids = set(progress.sent_ids)
+        unsent_ids = [i for i in progress.message_ids if i not in sent_ids]
+        if unsent_ids:
+            db.execute(
+                update(SmsScheduledMessage)
+                .where(SmsScheduledMessage.id.in_(unsent_ids))
+                .values(status=MessageStatusEnum.failed.value, remarks=f"Unexpected error: {error}", updated_at=now)
+            )
+        unused_parts = progress.reserved_parts - progress.sent_parts
+        if unused_parts > 0 and progress.subscription_id:
+            credit_service.refund(db, progress.subscription_id, unused_parts)
+        schedule_service.refresh_schedule_status(db, [progress.schedule_id], now)
+        db.commit()
+    except Exception as record_error:
+        db.rollback()
+        print(f"Scheduled send: could not record the failed batch: {record_error}")
@@ -1,134 +1,236 @@
 
 # backend/app/tasks/send_sms_task.py
+import atexit
 import datetime
 import asyncio
+import random
+from typing import Optional
 from sqlalchemy.orm import Session
 from api.deps import SessionLocal
 from models.sms_job import SMSJob
 from models.sender_id import SenderId
 from models.user_subscription import UserSubscription
 from models.sent_messages import SentMessage
+from services.http_client import close_http_client
 from services.sms_gateway_service import SmsGatewayService
+from services import credit_service, stats_service
 from models.enums import MessageStatusEnum
-from core.config import SMS_CALLBACK_URL
+from core.config import SMS_CALLBACK_URL, SMS_RETRY_BASE_DELAY, SMS_RETRY_MAX_DELAY
 from core.worker_config import redis_conn
 from rq import Queue
+from utils.timezone import now_eat
 
-def _maybe_run_async(fn, *args, **kwargs):
+_worker_loop = None
+
+
+def _get_worker_loop():
+    """
+    One event loop per worker process, so the pooled gateway HTTP client
+    (bound to the loop that created it) is reused across jobs. Both workers
+    run jobs in their own process (SimpleWorker, or the async worker, which
+    awaits the coroutines directly), never in a forked work horse.
+    """
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop
+
+
+@atexit.register
+def _close_worker_loop():
+    """Close the loop's gateway client on the loop itself when the worker process exits."""
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.run_until_complete(close_http_client())
+        _worker_loop.close()
+
+
+def maybe_run_async(fn, *args, **kwargs):
     """Run async functions if coroutine, else normal function."""
-    try:
-        res = fn(*args, **kwargs)
-        if asyncio.iscoroutine(res):
-            return asyncio.run(res)
-        return res
-    except TypeError:
-        return asyncio.run(fn(*args, **kwargs))
+    res = fn(*args, **kwargs)
+    if asyncio.iscoroutine(res):
+        return _get_worker_loop().run_until_complete(res)
+    return res
+
+
+def retry_delay(retries: int) -> float:
+    """
+    Exponential backoff with jitter: SMS_RETRY_BASE_DELAY * 2^(retries-1),
+    capped at SMS_RETRY_MAX_DELAY, then randomised between half and the full
+    delay so jobs that failed together do not retry together.
+    """
+    delay = min(SMS_RETRY_MAX_DELAY, SMS_RETRY_BASE_DELAY * (2 ** max(0, retries - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+def _schedule_retry(sms_job_id: int, delay: float):
+    """Put the job in RQ's scheduled registry; a worker running the scheduler enqueues it when due."""
+    q = Queue("sms_queue", connection=redis_conn)
+    q.enqueue_in(datetime.timedelta(seconds=delay), send_sms_task, sms_job_id)
 
 
 def send_sms_task(sms_job_id: int):
     """Worker function to send SMS from queued job."""
     db: Session = SessionLocal()
     try:
-        # Fetch the job
-        job = db.query(SMSJob).filter(SMSJob.id == sms_job_id).first()
-        if not job:
-            return {"success": False, "error": "SMS job not found"}
-
-        if job.status != MessageStatusEnum.pending.value:
-            return {"success": False, "error": f"Job status is {job.status}"}
-
-        # Fetch sender & subscription
-        sender = db.query(SenderId).filter(SenderId.id == job.sender_id).first()
-        subscription = db.query(UserSubscription).filter(
-            UserSubscription.user_id == job.user_id,
-            UserSubscription.status == "active"
-        ).first()
-
-        if not sender or not subscription or subscription.remaining_sms <= 0:
-            job.status = MessageStatusEnum.failed.value
-            job.error_message = "Sender missing or insufficient SMS balance"
-            job.updated_at = datetime.datetime.utcnow()
-            db.add(job)
-            db.commit()
-            return {"success": False, "error": job.error_message}
+        return maybe_run_async(process_sms_job, db, sms_job_id)
+    finally:
+        db.close()
 
-        sms_service = SmsGatewayService(sender.alias)
 
-        # Calculate SMS parts
-        parts_needed, _, _ = sms_service.get_sms_parts_and_length(job.message)
-        if parts_needed > subscription.remaining_sms:
+def _fail(db: Session, job: SMSJob, subscription: Optional[UserSubscription], error: str) -> dict:
+    job.status = MessageStatusEnum.failed.value
+    job.error_message = error
+    job.updated_at = datetime.datetime.utcnow()
+    credit_service.refund_job(db, job, subscription.id if subscription else None)
+    db.add(job)
+    db.commit()
+    return {"success": False, "error": error}
+
+
+def _prepare_job(db: Session, sms_job_id: int):
+    """
+    Load a pending job with its sender and subscription and make sure its
+    parts are reserved. Returns (job, sender, subscription, parts_needed),
+    or a result dict if the job cannot be sent.
+    """
+    job = db.query(SMSJob).filter(SMSJob.id == sms_job_id).first()
+    if not job:
+        return {"success": False, "error": "SMS job not found"}
+
+    if job.status not in (MessageStatusEnum.pending, MessageStatusEnum.pending.value):
+        return {"success": False, "error": f"Job status is {job.status}"}
+
+    # Fetch sender & subscription
+    sender = db.query(SenderId).filter(SenderId.id == job.sender_id).first()
+    subscription = db.query(UserSubscription).filter(
+        UserSubscription.user_id == job.user_id,
+        UserSubscription.status == "active"
+    ).first()
+
+    if not sender or not subscription:
+        return _fail(db, job, subscription, "Sender missing or insufficient SMS balance")
+
+    # Calculate SMS parts
+    parts_needed, _, _ = SmsGatewayService.get_sms_parts_and_length(job.message)
+
+    # Jobs queued by the API carry a reservation; anything else reserves now
+    if not job.reserved_parts:
+        if credit_service.reserve(db, subscription.id, parts_needed) is None:
             job.status = MessageStatusEnum.failed.value
             job.error_message = "Insufficient balance at send time"
             job.updated_at = datetime.datetime.utcnow()
             db.add(job)
             db.commit()
             return {"success": False, "error": job.error_message}
+        job.reserved_parts = parts_needed
+        db.add(job)
+        db.commit()
+
+    return job, sender, subscription, parts_needed
+
+
+def _record_result(
+    db: Session,
+    job: SMSJob,
+    sender: SenderId,
+    subscription: UserSubscription,
+    parts_needed: int,
+    result: dict,
+) -> dict:
+    """Store the gateway's answer: a sent message, a scheduled retry or a failure."""
+    now = datetime.datetime.utcnow()
+    success = result.get("success", False) if isinstance(result, dict) else False
+    gateway_data = result.get("data", {}) if isinstance(result, dict) else {}
+
+    if success:
+        job.status = MessageStatusEnum.sent.value
+        job.sent_at = now
+        job.error_message = None
+        job.next_retry_at = None
+        credit_service.commit_job(job)
+        db.add(job)
+
+        # Log sent message, stamped in EAT like the other send paths and the daily stats
+        sent_at = now_eat()
+        db.add(SentMessage(
+            sender_alias=sender.alias,
+            user_id=job.user_id,
+            phone_number=job.phone_number,
+            message=job.message,
+            message_id=str(gateway_data.get("message_id")) if gateway_data else None,
+            number_of_parts=parts_needed,
+            sent_at=sent_at
+        ))
+        stats_service.record_sent(db, job.user_id, 1, parts_needed, sent_at.date())
+
+        db.commit()
+        return {"success": True}
+
+    job.error_message = (gateway_data or {}).get("error") or result.get("message") or str(result)
+    job.last_error_at = now
+    job.updated_at = now
+
+    # Circuit open: nothing was sent, so wait for it to close without using up a retry
+    retry_after = result.get("retry_after")
+    if retry_after:
+        delay = retry_after + random.uniform(0, SMS_RETRY_BASE_DELAY)
+    else:
+        job.retries = (job.retries or 0) + 1
+        delay = retry_delay(job.retries)
+
+    if job.retries < (job.max_retries or 3):
+        # Stays pending until the scheduled retry runs
+        job.next_retry_at = now + datetime.timedelta(seconds=delay)
+        db.add(job)
+        db.commit()
+        _schedule_retry(job.id, delay)
+    else:
+        job.status = MessageStatusEnum.failed.value
+        job.next_retry_at = None
+        credit_service.refund_job(db, job, subscription.id)
+        db.add(job)
+        db.commit()
+
+    return {"success": False, "error": job.error_message}
+
+
+def _fail_after_error(db: Session, job: Optional[SMSJob], subscription: Optional[UserSubscription], error: str):
+    """Fallback failure marking after an unexpected error."""
+    try:
+        db.rollback()
+        _fail(db, job, subscription, error)
+    except Exception:
+        pass
+
+
+async def process_sms_job(db: Session, sms_job_id: int):
+    """
+    Send one queued SMSJob and record the outcome. Shared by the RQ task above
+    and the long-lived async worker (utils/worker.py), which awaits it directly.
+    The database work runs in worker threads (the session is only ever used
+    by one of them at a time) so it does not block the event loop while
+    other jobs are waiting on the gateway.
+    """
+    job = None
+    subscription = None
+    try:
+        prepared = await asyncio.to_thread(_prepare_job, db, sms_job_id)
+        if isinstance(prepared, dict):
+            return prepared
+        job, sender, subscription, parts_needed = prepared
 
         # Build callback
         callback_url = f"{SMS_CALLBACK_URL}?id={job.user_id}" if SMS_CALLBACK_URL else None
 
         # Send SMS
-        try:
-            result = _maybe_run_async(
-                sms_service.send_sms_with_parts_check,
-                job.phone_number,
-                job.message,
-                callback_url=callback_url
-            )
-        except AttributeError:
-            result = _maybe_run_async(sms_service.send_sms, job.phone_number, job.message)
-
-        now = datetime.datetime.utcnow()
-        success = result.get("success", False) if isinstance(result, dict) else False
-        gateway_data = result.get("data", {}) if isinstance(result, dict) else {}
-
-        if success:
-            job.status = MessageStatusEnum.sent.value
-            job.sent_at = now
-            job.error_message = None
-            db.add(job)
-
-            # Log sent message
-            db.add(SentMessage(
-                sender_alias=sender.alias,
-                user_id=job.user_id,
-                phone_number=job.phone_number,
-                message=job.message,
-                message_id=str(gateway_data.get("message_id")) if gateway_data else None,
-                number_of_parts=parts_needed,
-                sent_at=now
-            ))
-
-            db.commit()
-            return {"success": True}
-
-        else:
-            # Mark failed, increase retries
-            job.status = MessageStatusEnum.failed.value
-            job.error_message = gateway_data.get("message") if gateway_data else str(result)
-            job.retries = (job.retries or 0) + 1
-            job.updated_at = now
-            db.add(job)
-            db.commit()
+        result = await SmsGatewayService(sender.alias).send_sms_with_parts_check(
+            job.phone_number,
+            job.message,
+            callback_url=callback_url
+        )
 
-            # Requeue if retries left
-            if job.retries < (job.max_retries or 3):
-                q = Queue("sms_queue", connection=redis_conn)
-                q.enqueue(send_sms_task, job.id)
-
-            return {"success": False, "error": job.error_message}
+        return await asyncio.to_thread(_record_result, db, job, sender, subscription, parts_needed, result)
 
     except Exception as e:
-        # Fallback failure marking
-        try:
-            job.status = MessageStatusEnum.failed.value
-            job.error_message = str(e)
-            job.updated_at = datetime.datetime.utcnow()
-            db.add(job)
-            db.commit()
-        except Exception:
-            pass
+        await asyncio.to_thread(_fail_after_error, db, job, subscription, str(e))
         return {"success": False, "error": str(e)}
-
-    finally:
-        db.close()
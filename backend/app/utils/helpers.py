@@ -1,8 +1,11 @@
 # backend/app/utils/helpers.py
 
+import base64
 import csv
 import io
+import json
 import os
+from datetime import datetime
 from typing import List, Optional
 from fastapi import HTTPException, UploadFile
 import openpyxl
@@ -159,4 +162,20 @@ def generate_messages(template_msg: str, columns: List[TemplateColumn], rows: Li
             phone = str(row[phone_col_pos-1]).strip()
 
         messages.append((msg, phone))
-    return messages
\ No newline at end of file
+    return messages
+
+
+def encode_cursor(sent_at: datetime, row_id: int) -> str:
+    """Opaque keyset pagination token for a (timestamp, id) position."""
+    raw = json.dumps([sent_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> TypingTuple[datetime, int]:
+    """Inverse of encode_cursor; a malformed token is a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sent_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(sent_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
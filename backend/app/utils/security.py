@@ -3,6 +3,8 @@ import hmac
 import os
 import jwt
 from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import pytz
 from models.api_access_tokens import ApiAccessToken
@@ -87,3 +89,34 @@ def verify_api_token(db: Session, raw_token: str) -> User | None:
 
     # Return the user
     return db.query(User).filter_by(id=token_obj.user_id).first()
+
+
+async def verify_api_token_async(db: AsyncSession, raw_token: str) -> User | None:
+    """Same as verify_api_token, for async route handlers."""
+    token_hash = hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+    token_obj = (await db.execute(
+        select(ApiAccessToken).filter_by(token_hash=token_hash, revoked=False)
+    )).scalars().first()
+
+    if not token_obj:
+        return None
+
+    now = datetime.now(pytz.timezone("Africa/Nairobi")).replace(tzinfo=None)
+
+    # Extend by 1 day if it's a different day than last_used
+    if not token_obj.last_used or token_obj.last_used.date() != now.date():
+        if token_obj.expires_at:
+            token_obj.expires_at += timedelta(days=1)
+        else:
+            token_obj.expires_at = now + timedelta(days=1)
+
+    # Update last_used to now
+    token_obj.last_used = now
+    await db.commit()
+
+    # Check if token is expired
+    if token_obj.expires_at and token_obj.expires_at <= now:
+        return None
+
+    # Return the user
+    return (await db.execute(select(User).filter_by(id=token_obj.user_id))).scalars().first()
@@ -1,11 +1,233 @@
 # backend/app/utils/worker.py
-from rq import Worker, Queue
+import asyncio
+import importlib
+import os
+import signal
+import sys
+import threading
+import traceback
+
+# Workers get the small "worker" DB pool profile unless one is set explicitly;
+# must happen before core.config is imported
+os.environ.setdefault("DB_ENGINE_PROFILE", "worker")
+
+from rq import SimpleWorker, Queue
+from rq.defaults import DEFAULT_FAILURE_TTL, DEFAULT_RESULT_TTL
+from rq.job import Job, JobStatus
+from rq.registry import FailedJobRegistry, FinishedJobRegistry, StartedJobRegistry
+from rq.results import Result
+from rq.scheduler import RQScheduler
 from core.worker_config import redis_conn
+from core.config import (
+    SMS_WORKER_MODE, SMS_WORKER_BATCH_SIZE, SMS_WORKER_CONCURRENCY, SMS_WORKER_POLL_INTERVAL
+)
+
+# RQ task name -> coroutine awaited natively by the async worker as fn(db, *args)
+ASYNC_TASKS = {
+    "tasks.send_sms_task.send_sms_task": ("tasks.send_sms_task", "process_sms_job"),
+    "tasks.send_campaign_task.send_campaign_chunk_task": ("tasks.send_campaign_task", "process_campaign_chunk"),
+    "tasks.send_scheduled_task.send_scheduled_batch_task": ("tasks.send_scheduled_task", "process_scheduled_messages"),
+}
+
 
 def run_worker():
+    """
+    Jobs run one at a time in this process (SimpleWorker, no fork per job), so
+    the event loop and pooled gateway client of tasks.send_sms_task are reused
+    across jobs and closed when the worker exits.
+    """
     q = Queue("sms_queue", connection=redis_conn)
-    worker = Worker([q], connection=redis_conn)
-    worker.work()
+    worker = SimpleWorker([q], connection=redis_conn)
+    # The scheduler moves delayed retries (enqueue_in) onto the queue when due
+    worker.work(with_scheduler=True)
+
+
+def _job_started(rq_job: Job, q: Queue) -> None:
+    """
+    Put the job in the queue's StartedJobRegistry, as RQ's own worker does. If
+    this process dies mid-job, RQ's registry cleanup moves it to failed.
+    """
+    with redis_conn.pipeline() as pipe:
+        rq_job.set_status(JobStatus.STARTED, pipeline=pipe)
+        StartedJobRegistry(queue=q).add(rq_job, (rq_job.timeout or Queue.DEFAULT_TIMEOUT) + 60, pipeline=pipe)
+        pipe.execute()
+
+
+def _job_finished(rq_job: Job, q: Queue, return_value=None) -> None:
+    result_ttl = DEFAULT_RESULT_TTL if rq_job.result_ttl is None else rq_job.result_ttl
+    with redis_conn.pipeline() as pipe:
+        StartedJobRegistry(queue=q).remove(rq_job, pipeline=pipe)
+        rq_job.set_status(JobStatus.FINISHED, pipeline=pipe)
+        if result_ttl != 0:
+            FinishedJobRegistry(queue=q).add(rq_job, result_ttl, pipeline=pipe)
+            # Kept for job.return_value(), as RQ's own worker does
+            Result.create(rq_job, Result.Type.SUCCESSFUL, ttl=result_ttl, return_value=return_value, pipeline=pipe)
+        rq_job.cleanup(result_ttl, pipeline=pipe, remove_from_queue=False)
+        pipe.execute()
+
+
+def _job_failed(rq_job: Job, q: Queue, exc_string: str) -> None:
+    """Retry the job if it has retries left (RQ's Retry), otherwise keep it in the FailedJobRegistry."""
+    with redis_conn.pipeline() as pipe:
+        StartedJobRegistry(queue=q).remove(rq_job, pipeline=pipe)
+        if rq_job.retries_left:
+            rq_job.retry(q, pipe)
+        else:
+            rq_job.set_status(JobStatus.FAILED, pipeline=pipe)
+            FailedJobRegistry(queue=q).add(
+                rq_job, ttl=rq_job.failure_ttl or DEFAULT_FAILURE_TTL, exc_string=exc_string, pipeline=pipe
+            )
+        pipe.execute()
+
+
+async def _run_rq_job(rq_job: Job, q: Queue, semaphore: asyncio.Semaphore):
+    """
+    Run one dequeued RQ job: known SMS tasks are awaited on this loop, anything
+    else runs in a thread. Releases the slot its caller acquired from `semaphore`.
+    """
+    from api.deps import SessionLocal
+
+    try:
+        try:
+            _job_started(rq_job, q)
+            return_value = None
+            target = ASYNC_TASKS.get(rq_job.func_name)
+            if target:
+                module_name, coroutine_name = target
+                coroutine_fn = getattr(importlib.import_module(module_name), coroutine_name)
+                db = SessionLocal()
+                try:
+                    await coroutine_fn(db, *rq_job.args)
+                finally:
+                    await asyncio.to_thread(db.close)
+            else:
+                return_value = await asyncio.to_thread(rq_job.perform)
+        except Exception as e:
+            print(f"Async worker: job {rq_job.id} failed: {e}")
+            try:
+                _job_failed(rq_job, q, traceback.format_exc())
+            except Exception as registry_error:
+                print(f"Async worker: could not record failure of job {rq_job.id}: {registry_error}")
+        else:
+            try:
+                _job_finished(rq_job, q, return_value)
+            except Exception as registry_error:
+                print(f"Async worker: could not record completion of job {rq_job.id}: {registry_error}")
+    finally:
+        semaphore.release()
+
+
+def _enqueue_due_jobs(scheduler: RQScheduler):
+    """
+    Move due scheduled jobs (delayed retries) onto the queue. Only the process
+    holding RQ's scheduler lock does this, as with `worker.work(with_scheduler=True)`.
+    """
+    try:
+        if not scheduler.acquired_locks:
+            scheduler.acquire_locks()
+        if scheduler.acquired_locks:
+            scheduler.enqueue_scheduled_jobs()
+            scheduler.heartbeat()
+    except Exception as e:
+        print(f"Async worker: scheduled job check failed: {e}")
+
+
+async def _dequeue_and_run(
+    q: Queue, stop: asyncio.Event, batch_size: int, semaphore: asyncio.Semaphore, running: set
+):
+    """
+    Start up to `batch_size` jobs, each as soon as a slot is free, so a long
+    job only holds its own slot while the others keep being refilled.
+    """
+    started = 0
+    while started < batch_size and not stop.is_set():
+        await semaphore.acquire()
+        # Queue.dequeue_any skips ids of jobs that were deleted or canceled while queued
+        dequeued = Queue.dequeue_any([q], None, connection=redis_conn)
+        if dequeued is None:
+            semaphore.release()
+            break
+        task = asyncio.create_task(_run_rq_job(dequeued[0], q, semaphore))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        started += 1
+
+    if not started:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=SMS_WORKER_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _async_worker_loop(q: Queue, stop: asyncio.Event, batch_size: int, concurrency: int):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    scheduler = RQScheduler([q], connection=redis_conn)
+    running: set = set()
+    try:
+        while not stop.is_set():
+            _enqueue_due_jobs(scheduler)
+            await _dequeue_and_run(q, stop, batch_size, semaphore, running)
+    finally:
+        # Let jobs already started finish before the worker exits
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        if scheduler.acquired_locks:
+            scheduler.release_locks()
+
+
+async def _run_async_worker(batch_size: int, concurrency: int):
+    from services.http_client import init_http_client, close_http_client
+
+    q = Queue("sms_queue", connection=redis_conn)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await init_http_client()
+    print(f"Async SMS worker started (batch={batch_size}, concurrency={concurrency})")
+    try:
+        await _async_worker_loop(q, stop, batch_size, concurrency)
+    finally:
+        await close_http_client()
+        print("Async SMS worker stopped")
+
+
+def run_async_worker(batch_size: int = SMS_WORKER_BATCH_SIZE, concurrency: int = SMS_WORKER_CONCURRENCY):
+    """
+    Persistent worker: one process, one event loop, one pooled DB engine and
+    HTTP client. Runs up to `concurrency` jobs from sms_queue at once, starting
+    a new one whenever one finishes (checking for due retries at least every
+    `batch_size` jobs), instead of one at a time. Jobs go
+    through RQ's started/finished/failed registries like with `run_worker`,
+    and failed jobs stay in the FailedJobRegistry (or are retried by RQ).
+    """
+    asyncio.run(_run_async_worker(batch_size, concurrency))
+
+
+def run_dlr_flusher():
+    """
+    Delivery report flusher: writes the reports the webhook buffered in the
+    Redis stream to Postgres in batches (see services.callback_ingest_service).
+    """
+    from services import callback_ingest_service
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    print("DLR flusher started")
+    written = callback_ingest_service.run_flusher(stop)
+    print(f"DLR flusher stopped after writing {written} delivery reports")
+
 
 if __name__ == "__main__":
-    run_worker()
+    from services.partition_service import ensure_partitions_on_startup
+
+    ensure_partitions_on_startup()
+    if "--dlr" in sys.argv[1:] or SMS_WORKER_MODE == "dlr":
+        run_dlr_flusher()
+    elif "--async" in sys.argv[1:] or SMS_WORKER_MODE == "async":
+        run_async_worker()
+    else:
+        run_worker()
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# The application is imported the way it runs, from backend/app (`from models... import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
@@ -0,0 +1,235 @@
+# backend/tests/test_query_plans.py
+"""
+Query-plan regression tests for the hot read paths.
+
+Builds sent_messages, sms_callbacks, contacts, sms_schedules and
+scheduled_messages in a scratch schema, seeds them, runs ANALYZE and then
+EXPLAINs the queries the routes and workers issue. sent_messages and
+sms_callbacks are partitioned by month with a DEFAULT partition and carry
+the indexes of db/migrations/005, as in production; the other tables get
+the shipped index migration (db/migrations/004_hot_path_indexes.sql). Each
+query fails if it plans a sequential scan on the table it is meant to
+reach through an index, or on any of its partitions.
+
+Needs a local, throwaway Postgres database and is skipped unless
+QUERY_PLAN_DATABASE_URL is set (QUERY_PLAN_ROWS scales the seed data); the
+scratch schema is dropped afterwards. From backend/:
+
+    QUERY_PLAN_DATABASE_URL=postgresql+psycopg2://localhost/sewmrsms_plans python -m pytest tests/test_query_plans.py
+"""
+import os
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL")
+if not DATABASE_URL:
+    pytest.skip("QUERY_PLAN_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import create_engine, desc, func, select, text, tuple_  # noqa: E402
+
+from models.contact import Contact  # noqa: E402
+from models.contact_group import ContactGroup  # noqa: E402,F401  target of Contact.group, needed to configure mappers
+from models.enums import ScheduleStatusEnum  # noqa: E402
+from models.sent_messages import SentMessage  # noqa: E402
+from models.sms_callback import SmsCallback  # noqa: E402
+from models.sms_schedule import SmsSchedule  # noqa: E402
+from services import schedule_service  # noqa: E402
+
+ROWS = int(os.getenv("QUERY_PLAN_ROWS", "200000"))
+USERS = 100
+SCHEMA = "query_plan_test"
+INDEX_MIGRATION = Path(__file__).resolve().parent.parent / "app" / "db" / "migrations" / "004_hot_path_indexes.sql"
+
+PARTITIONED_TABLES = {"sent_messages": "sent_at", "sms_callbacks": "received_at"}
+FIRST_MONTH = date(2025, 1, 1)
+
+# Columns the queries touch; enum columns are plain text here, constraints are left out
+TABLES = """
+CREATE TABLE sent_messages (
+  id SERIAL, uuid UUID, sender_alias VARCHAR(11) NOT NULL, user_id INT NOT NULL,
+  phone_number VARCHAR(15) NOT NULL, message TEXT NOT NULL, message_id VARCHAR(100), remarks TEXT,
+  number_of_parts INT NOT NULL DEFAULT 1, sent_at TIMESTAMP NOT NULL,
+  delivery_status TEXT, delivered_at TIMESTAMP,
+  PRIMARY KEY (id, sent_at)
+) PARTITION BY RANGE (sent_at);
+CREATE INDEX idx_sent_messages_message_id ON sent_messages(message_id);
+CREATE INDEX idx_sent_messages_user_id_sent_at ON sent_messages(user_id, sent_at, id);
+CREATE TABLE sent_messages_default PARTITION OF sent_messages DEFAULT;
+CREATE TABLE sms_callbacks (
+  id SERIAL, uuid UUID, message_id TEXT NOT NULL, phone VARCHAR(15) NOT NULL,
+  status TEXT NOT NULL, uid TEXT, remarks TEXT, payload JSONB, received_at TIMESTAMP NOT NULL,
+  sender_alias TEXT, user_id INT,
+  PRIMARY KEY (id, received_at)
+) PARTITION BY RANGE (received_at);
+CREATE INDEX idx_sms_callbacks_user_id_message_id ON sms_callbacks(user_id, message_id, received_at);
+CREATE TABLE sms_callbacks_default PARTITION OF sms_callbacks DEFAULT;
+CREATE TABLE contacts (
+  id SERIAL PRIMARY KEY, uuid UUID, user_id INT NOT NULL, name TEXT, phone VARCHAR(15) NOT NULL,
+  email TEXT, group_id INT, is_blacklisted BOOLEAN DEFAULT FALSE,
+  created_at TIMESTAMP NOT NULL DEFAULT now(), updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE TABLE sms_schedules (
+  id SERIAL PRIMARY KEY, uuid UUID, user_id INT NOT NULL, sender_id INT NOT NULL, title TEXT NOT NULL,
+  scheduled_for TIMESTAMP NOT NULL, status TEXT,
+  created_at TIMESTAMP NOT NULL DEFAULT now(), updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE TABLE scheduled_messages (
+  id SERIAL PRIMARY KEY, schedule_id INT NOT NULL, phone_number VARCHAR(15) NOT NULL,
+  message TEXT NOT NULL, status TEXT, sent_at TIMESTAMP, remarks TEXT,
+  created_at TIMESTAMP NOT NULL DEFAULT now(), updated_at TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+# :rows scales everything; user 1..:users own the rows round-robin. Only the last
+# 1% of schedules is still pending, as in production where most have been sent.
+SEED = """
+INSERT INTO sent_messages (sender_alias, user_id, phone_number, message, message_id, sent_at, delivery_status, delivered_at)
+SELECT 'SEWMR', 1 + i % :users, '2557' || lpad(i::text, 8, '0'), 'Hello', 'm' || i,
+       TIMESTAMP '2025-01-01' + i * INTERVAL '1 minute', 'delivered',
+       TIMESTAMP '2025-01-01' + i * INTERVAL '1 minute' + INTERVAL '5 seconds'
+FROM generate_series(1, :rows) AS i;
+
+INSERT INTO sms_callbacks (message_id, phone, status, received_at, user_id)
+SELECT 'm' || i, '2557' || lpad(i::text, 8, '0'), 'delivered',
+       TIMESTAMP '2025-01-01' + i * INTERVAL '1 minute', 1 + i % :users
+FROM generate_series(1, :rows) AS i;
+
+INSERT INTO contacts (user_id, phone, group_id)
+SELECT 1 + i % :users, '2557' || lpad(i::text, 8, '0'), i % 50
+FROM generate_series(1, :rows / 2) AS i;
+
+INSERT INTO sms_schedules (user_id, sender_id, title, scheduled_for, status)
+SELECT 1 + i % :users, 1, 'Schedule ' || i, TIMESTAMP '2025-01-01' + i * INTERVAL '1 hour',
+       CASE WHEN i > :rows / 10 * 99 / 100 THEN 'pending' ELSE 'sent' END
+FROM generate_series(1, :rows / 10) AS i;
+
+INSERT INTO scheduled_messages (schedule_id, phone_number, message, status, created_at, updated_at)
+SELECT 1 + i % (:rows / 10), '2557' || lpad(i::text, 8, '0'), 'Hello',
+       CASE WHEN 1 + i % (:rows / 10) > :rows / 10 * 99 / 100 THEN 'pending' ELSE 'sent' END,
+       TIMESTAMP '2025-01-01', TIMESTAMP '2025-01-01'
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def hot_queries(rows: int):
+    """(name, statement, table that must not be sequentially scanned)."""
+    user_id = 7
+    now = datetime(2025, 1, 1) + timedelta(minutes=rows)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    due_schedules = [ScheduleStatusEnum.pending.value, ScheduleStatusEnum.partial.value, ScheduleStatusEnum.failed.value]
+    history = (
+        select(SentMessage)
+        .where(SentMessage.user_id == user_id)
+        .order_by(desc(SentMessage.sent_at), desc(SentMessage.id))
+        .limit(51)
+    )
+    return [
+        ("history first page", history, "sent_messages"),
+        (
+            "history next page",
+            history.where(tuple_(SentMessage.sent_at, SentMessage.id) < tuple_(now - timedelta(days=7), rows // 2)),
+            "sent_messages",
+        ),
+        (
+            "dashboard messages today",
+            select(func.count(SentMessage.id)).where(SentMessage.user_id == user_id, SentMessage.sent_at >= today_start),
+            "sent_messages",
+        ),
+        (
+            "latest callback of a message",
+            select(SmsCallback.status)
+            .where(SmsCallback.user_id == user_id, SmsCallback.message_id == "m1234")
+            .order_by(desc(SmsCallback.received_at))
+            .limit(1),
+            "sms_callbacks",
+        ),
+        (
+            "contact duplicate check",
+            select(Contact.id).where(Contact.user_id == user_id, Contact.group_id == 7, Contact.phone == "255700001234"),
+            "contacts",
+        ),
+        (
+            "due schedules",
+            select(func.count(SmsSchedule.id)).where(SmsSchedule.status.in_(due_schedules), SmsSchedule.scheduled_for <= now),
+            "sms_schedules",
+        ),
+        (
+            "claim due scheduled messages",
+            schedule_service.due_messages_query(now, now, 200),
+            "scheduled_messages",
+        ),
+        (
+            "schedule status counts",
+            schedule_service.status_counts_query([rows // 10, rows // 10 - 1]),
+            "scheduled_messages",
+        ),
+    ]
+
+
+def monthly_partitions(rows: int) -> list:
+    """DDL of the <table>_yYYYYmMM partitions covering the seeded months, named as create_monthly_partition() does."""
+    last = (datetime.combine(FIRST_MONTH, datetime.min.time()) + timedelta(minutes=rows)).date()
+    statements = []
+    start = FIRST_MONTH
+    while start <= last:
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        for table in PARTITIONED_TABLES:
+            statements.append(
+                f"CREATE TABLE {table}_y{start:%Y}m{start:%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        start = end
+    return statements
+
+
+def parent_table(relation: str) -> str:
+    """The partitioned table a partition belongs to, or `relation` itself."""
+    parent = re.sub(r"_(y\d{4}m\d{2}|default)$", "", relation)
+    return parent if parent in PARTITIONED_TABLES else relation
+
+
+def seq_scans(plan: dict) -> list:
+    """Tables read with a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan node; partitions count as their table."""
+    found = [parent_table(plan["Relation Name"])] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def migration_statements(path: Path) -> list:
+    sql = re.sub(r"--[^\n]*", "", path.read_text())
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+@pytest.fixture(scope="module")
+def conn():
+    """Connection to the seeded and analyzed scratch schema."""
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        try:
+            for statement in TABLES.split(";") + monthly_partitions(ROWS):
+                connection.execute(text(statement))
+            for statement in SEED.split(";"):
+                connection.execute(text(statement), {"rows": ROWS, "users": USERS})
+            # CREATE INDEX CONCURRENTLY has to run outside a transaction, one statement at a time;
+            # it cannot build on a partitioned table, whose indexes are declared in TABLES
+            for statement in migration_statements(INDEX_MIGRATION):
+                if not re.search(r"\bON (%s)\(" % "|".join(PARTITIONED_TABLES), statement):
+                    connection.exec_driver_sql(statement)
+            connection.execute(text("ANALYZE"))
+            yield connection
+        finally:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, statement, table", [pytest.param(*query, id=query[0]) for query in hot_queries(ROWS)])
+def test_hot_query_uses_an_index(conn, name, statement, table):
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    assert table not in seq_scans(plan[0]["Plan"]), f"{name} plans a sequential scan on {table}"
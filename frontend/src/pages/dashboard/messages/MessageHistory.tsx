@@ -29,8 +29,10 @@ interface SentMessage {
 interface PaginationInfo {
   page: number;
   limit: number;
-  total_count: number;
-  total_pages: number;
+  has_more: boolean;
+  next_cursor: string | null;
+  total_count: number | null;
+  total_pages: number | null;
 }
 
 const STATUS_OPTIONS = [
@@ -44,7 +46,7 @@ export default function MessageHistory() {
   const [messages, setMessages] = useState<SentMessage[]>([]);
   const [loading, setLoading] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
-  const [page, setPage] = useState(1);
+  const [totalCount, setTotalCount] = useState<number | null>(null);
   const [pagination, setPagination] = useState<PaginationInfo | null>(null);
   const [startDate, setStartDate] = useState<Date | undefined>();
   const [endDate, setEndDate] = useState<Date | undefined>();
@@ -53,7 +55,7 @@ export default function MessageHistory() {
   const { toast } = useToast();
   const scrollRef = useRef<HTMLDivElement>(null);
 
-  const fetchMessages = useCallback(async (pageNum: number, append = false) => {
+  const fetchMessages = useCallback(async (cursor: string | null, append = false) => {
     if (append) {
       setLoadingMore(true);
     } else {
@@ -61,10 +63,10 @@ export default function MessageHistory() {
     }
     
     try {
-      const params = new URLSearchParams({
-        page: String(pageNum),
-        limit: String(PAGE_SIZE),
-      });
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      // Only the first page asks for the exact total
+      if (cursor) params.set('cursor', cursor);
+      else params.set('include_total', 'true');
       if (statusFilter) params.set('status', statusFilter);
       if (startDate) params.set('start_date', startOfDay(startDate).toISOString());
       if (endDate) params.set('end_date', endOfDay(endDate).toISOString());
@@ -86,6 +88,7 @@ export default function MessageHistory() {
         setMessages(data);
       }
       setPagination(payload.pagination ?? null);
+      if (!append) setTotalCount(payload.pagination?.total_count ?? null);
     } catch (err: any) {
       toast({ title: 'Error', description: err?.message || 'Failed to fetch messages', variant: 'destructive' });
     } finally {
@@ -95,29 +98,40 @@ export default function MessageHistory() {
   }, [statusFilter, startDate, endDate, toast]);
 
   useEffect(() => {
-    fetchMessages(1, false);
+    fetchMessages(null, false);
+  }, []);
+
+  // Live delivery status updates for the messages already on screen
+  useEffect(() => {
+    const events = new EventSource('https://api.sewmrsms.co.tz/api/v1/sms/events', { withCredentials: true });
+    events.addEventListener('delivery', (event) => {
+      const { updates } = JSON.parse((event as MessageEvent).data) as {
+        updates: { message_id: string; status: string }[];
+      };
+      const latest = new Map(updates.map(u => [u.message_id, u.status]));
+      setMessages(prev => prev.map(m =>
+        m.message_id && latest.has(m.message_id) ? { ...m, status: latest.get(m.message_id)! } : m
+      ));
+    });
+    return () => events.close();
   }, []);
 
   const applyFilters = () => {
-    setPage(1);
     setMessages([]);
-    fetchMessages(1, false);
+    fetchMessages(null, false);
   };
 
   const resetFilters = () => {
     setStartDate(undefined);
     setEndDate(undefined);
     setStatusFilter(undefined);
-    setPage(1);
     setMessages([]);
-    fetchMessages(1, false);
+    fetchMessages(null, false);
   };
 
   const loadMore = () => {
-    if (pagination && page < pagination.total_pages && !loadingMore) {
-      const nextPage = page + 1;
-      setPage(nextPage);
-      fetchMessages(nextPage, true);
+    if (pagination?.has_more && pagination.next_cursor && !loadingMore) {
+      fetchMessages(pagination.next_cursor, true);
     }
   };
 
@@ -168,8 +182,8 @@ export default function MessageHistory() {
     description: "View, filter, and export your sent SMS messages."
   });
 
-  const totalCount = pagination?.total_count ?? messages.length;
-  const hasMore = pagination ? page < pagination.total_pages : false;
+  const displayedTotal = totalCount ?? messages.length;
+  const hasMore = pagination?.has_more ?? false;
 
   const getStatusVariant = (status: string) => {
     const s = status.toUpperCase();
@@ -260,10 +274,10 @@ export default function MessageHistory() {
             <div>
               <CardTitle className="text-base">Messages</CardTitle>
               <CardDescription className="text-xs">
-                Showing {messages.length} of {totalCount} messages
+                Showing {messages.length} of {displayedTotal} messages
               </CardDescription>
             </div>
-            <Button variant="ghost" size="sm" onClick={() => { setPage(1); setMessages([]); fetchMessages(1, false); }} disabled={loading}>
+            <Button variant="ghost" size="sm" onClick={() => { setMessages([]); fetchMessages(null, false); }} disabled={loading}>
               <RefreshCw className={cn("h-4 w-4", loading && "animate-spin")} />
             </Button>
           </div>
@@ -347,7 +361,7 @@ export default function MessageHistory() {
                         Loading...
                       </>
                     ) : (
-                      `Load More (${totalCount - messages.length} remaining)`
+                      `Load More (${displayedTotal - messages.length} remaining)`
                     )}
                   </Button>
                 </div>